@@ -0,0 +1,172 @@
+"""OpenAI Batch API embedding for large builds, resumable from on-disk state."""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+from hashlib import sha256
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+from openai import OpenAI
+
+from .embeddings import (
+    EmbeddingConfig,
+    EmbeddingError,
+    _decode_embedding,
+    _estimate_tokens,
+    embed_openai,
+    pack_batches,
+)
+
+
+ENDPOINT = "/v1/embeddings"
+COMPLETION_WINDOW = "24h"
+# The batch interface caps the embedding inputs a single batch may carry.
+MAX_FILE_INPUTS = 50_000
+FAILED = {"failed", "expired", "cancelled"}
+
+
+def _fingerprint(texts: Sequence[str], config: EmbeddingConfig) -> str:
+    digest = sha256(f"{config.model}|{config.dimensions}|{config.batch_size}|{config.batch_tokens}".encode("utf-8"))
+    for text in texts:
+        digest.update(sha256(text.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+def _save_state(path: Path, state: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _request(texts: Sequence[str], start: int, end: int, config: EmbeddingConfig) -> dict:
+    body: dict = {"model": config.model, "input": list(texts[start:end]), "encoding_format": "base64"}
+    if config.dimensions:
+        body["dimensions"] = config.dimensions
+    return {"custom_id": f"{start}-{end}", "method": "POST", "url": ENDPOINT, "body": body}
+
+
+def _write_requests(
+    work_dir: Path,
+    texts: Sequence[str],
+    config: EmbeddingConfig,
+    token_counts: Sequence[int],
+) -> list[dict]:
+    # One request per packed slice, grouped into files under the per-batch input cap.
+    groups: list[list[tuple[int, int]]] = [[]]
+    inputs = 0
+    for start, end in pack_batches(token_counts, config.batch_size, config.batch_tokens):
+        if groups[-1] and inputs + end - start > MAX_FILE_INPUTS:
+            groups.append([])
+            inputs = 0
+        groups[-1].append((start, end))
+        inputs += end - start
+    jobs = []
+    for i, spans in enumerate(groups):
+        name = f"requests-{i:03d}.jsonl"
+        with (work_dir / name).open("w", encoding="utf-8") as fh:
+            for start, end in spans:
+                fh.write(json.dumps(_request(texts, start, end, config)) + "\n")
+        jobs.append({"file": name})
+    return jobs
+
+
+def _ingest(path: Path, out: np.ndarray | None, filled: np.ndarray) -> np.ndarray | None:
+    # Copy each successful response into `out`, marking the rows it covers.
+    with path.open(encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                continue
+            start = int(record["custom_id"].split("-")[0])
+            for row in response["body"]["data"]:
+                vec = _decode_embedding(row["embedding"])
+                if out is None:
+                    out = np.empty((len(filled), vec.shape[0]), dtype="float32")
+                out[start + int(row["index"])] = vec
+                filled[start + int(row["index"])] = True
+    return out
+
+
+def embed_batch(
+    texts: Sequence[str],
+    config: EmbeddingConfig,
+    work_dir: Path,
+    token_counts: Sequence[int] | None = None,
+    poll_interval: float = 60.0,
+) -> np.ndarray:
+    # Every step is recorded in state.json before the next one starts, so an
+    # interrupted build resumes polling instead of submitting again.
+    texts = list(texts)
+    if token_counts is None:
+        token_counts = [_estimate_tokens(t) for t in texts]
+    state_path = work_dir / "state.json"
+    fingerprint = _fingerprint(texts, config)
+    state = json.loads(state_path.read_text(encoding="utf-8")) if state_path.exists() else {}
+    if state.get("fingerprint") != fingerprint:
+        # The inputs changed since the last attempt: its submissions are of no use.
+        shutil.rmtree(work_dir, ignore_errors=True)
+        work_dir.mkdir(parents=True)
+        state = {"fingerprint": fingerprint, "jobs": _write_requests(work_dir, texts, config, token_counts)}
+        _save_state(state_path, state)
+
+    client = OpenAI()
+    jobs = state["jobs"]
+    for job in jobs:
+        if "file_id" not in job:
+            with (work_dir / job["file"]).open("rb") as fh:
+                job["file_id"] = client.files.create(file=fh, purpose="batch").id
+            _save_state(state_path, state)
+        if "batch_id" not in job:
+            batch = client.batches.create(
+                input_file_id=job["file_id"],
+                endpoint=ENDPOINT,
+                completion_window=COMPLETION_WINDOW,
+            )
+            job["batch_id"] = batch.id
+            _save_state(state_path, state)
+
+    pending = [job for job in jobs if "result" not in job]
+    while pending:
+        for job in list(pending):
+            batch = client.batches.retrieve(job["batch_id"])
+            if batch.status in FAILED:
+                # Forget the batch so the next run submits the same file again.
+                del job["batch_id"]
+                _save_state(state_path, state)
+                raise EmbeddingError(
+                    f"Batch {batch.id} for {job['file']} ended {batch.status}. Rerun the build to resubmit it.",
+                    np.empty((0, 0), dtype="float32"),
+                )
+            if batch.status != "completed":
+                continue
+            name = job["file"].replace("requests-", "results-")
+            raw = client.files.content(batch.output_file_id).content if batch.output_file_id else b""
+            tmp = work_dir / (name + ".tmp")
+            tmp.write_bytes(raw)
+            os.replace(tmp, work_dir / name)
+            job["result"] = name
+            _save_state(state_path, state)
+            pending.remove(job)
+        if pending:
+            time.sleep(poll_interval)
+
+    out: np.ndarray | None = None
+    filled = np.zeros(len(texts), dtype=bool)
+    for job in jobs:
+        out = _ingest(work_dir / job["result"], out, filled)
+    # Requests the batch rejected or dropped are few; embed them synchronously.
+    missing = np.nonzero(~filled)[0]
+    if len(missing):
+        vectors = embed_openai([texts[i] for i in missing], config, [token_counts[i] for i in missing])
+        if out is None:
+            out = np.empty((len(texts), vectors.shape[1]), dtype="float32")
+        out[missing] = vectors
+    return out if out is not None else np.empty((0, 0), dtype="float32")
@@ -0,0 +1,153 @@
+"""Single-file packed index bundles with a JSON header and aligned sections."""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+from dataclasses import dataclass
+from hashlib import sha256
+from pathlib import Path
+from typing import Mapping
+
+import numpy as np
+
+
+MAGIC = b"TFIDFPK1"
+FORMAT_VERSION = 1
+# Sections start on 64-byte boundaries so memory-mapped arrays are aligned.
+ALIGN = 64
+_LEN = struct.Struct("<Q")
+_CHUNK = 1 << 20
+
+
+@dataclass(frozen=True)
+class Section:
+    offset: int
+    length: int
+    sha256: str
+
+
+@dataclass(frozen=True)
+class BundleHeader:
+    meta: dict
+    sections: dict[str, Section]
+
+
+def _pad(n: int) -> int:
+    return -n % ALIGN
+
+
+def _header_bytes(meta: dict, sections: Mapping[str, Section]) -> bytes:
+    payload = {
+        "format": FORMAT_VERSION,
+        "meta": meta,
+        "sections": {name: [s.offset, s.length, s.sha256] for name, s in sections.items()},
+    }
+    return json.dumps(payload, sort_keys=True).encode("utf-8")
+
+
+def write(files: Mapping[str, Path], meta: dict, out: Path) -> BundleHeader:
+    # Section offsets depend on the header size, so size the header first with
+    # placeholder digests of the final width, then patch it in place.
+    sizes = {name: path.stat().st_size for name, path in files.items()}
+    placeholder = {name: Section(0, size, "0" * 64) for name, size in sizes.items()}
+    reserve = len(_header_bytes(meta, placeholder)) + 32 * len(files) + 64
+    data_start = len(MAGIC) + _LEN.size + reserve
+    data_start += _pad(data_start)
+
+    sections: dict[str, Section] = {}
+    tmp = out.with_name(out.name + ".tmp")
+    with tmp.open("wb") as fh:
+        fh.seek(data_start)
+        for name, path in files.items():
+            offset = fh.tell()
+            digest = sha256()
+            with path.open("rb") as src:
+                while block := src.read(_CHUNK):
+                    digest.update(block)
+                    fh.write(block)
+            sections[name] = Section(offset, fh.tell() - offset, digest.hexdigest())
+            fh.write(b"\0" * _pad(fh.tell()))
+        header = _header_bytes(meta, sections)
+        if len(MAGIC) + _LEN.size + len(header) > data_start:
+            raise ValueError("Bundle header overflowed its reserved space.")
+        fh.seek(0)
+        fh.write(MAGIC + _LEN.pack(len(header)) + header)
+    os.replace(tmp, out)
+    return BundleHeader(meta=meta, sections=sections)
+
+
+def read_header(path: Path) -> BundleHeader:
+    with path.open("rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not an index bundle: {path}")
+        (length,) = _LEN.unpack(fh.read(_LEN.size))
+        payload = json.loads(fh.read(length))
+    if payload.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format: {payload.get('format')}")
+    sections = {name: Section(*entry) for name, entry in payload["sections"].items()}
+    return BundleHeader(meta=payload["meta"], sections=sections)
+
+
+def read_bytes(path: Path, section: Section) -> bytes:
+    with path.open("rb") as fh:
+        fh.seek(section.offset)
+        return fh.read(section.length)
+
+
+def load_npy(path: Path, section: Section) -> np.ndarray:
+    # Map an embedded .npy section without copying it into memory.
+    with path.open("rb") as fh:
+        fh.seek(section.offset)
+        version = np.lib.format.read_magic(fh)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(fh)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(fh)
+        data_offset = fh.tell()
+    if not shape or 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=data_offset, shape=shape, order="F" if fortran else "C")
+
+
+def verify(path: Path, header: BundleHeader | None = None) -> list[str]:
+    # Names of sections whose checksum does not match the header.
+    header = header or read_header(path)
+    bad = []
+    with path.open("rb") as fh:
+        for name, section in header.sections.items():
+            fh.seek(section.offset)
+            digest = sha256()
+            remaining = section.length
+            while remaining:
+                block = fh.read(min(_CHUNK, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                remaining -= len(block)
+            if remaining or digest.hexdigest() != section.sha256:
+                bad.append(name)
+    return bad
+
+
+def extract(path: Path, directory: Path, header: BundleHeader | None = None) -> list[Path]:
+    header = header or read_header(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    written = []
+    with path.open("rb") as fh:
+        for name, section in header.sections.items():
+            target = directory / name
+            tmp = target.with_name(target.name + ".tmp")
+            fh.seek(section.offset)
+            remaining = section.length
+            with tmp.open("wb") as out:
+                while remaining:
+                    block = fh.read(min(_CHUNK, remaining))
+                    if not block:
+                        raise ValueError(f"Bundle is truncated in section {name}.")
+                    out.write(block)
+                    remaining -= len(block)
+            os.replace(tmp, target)
+            written.append(target)
+    return written
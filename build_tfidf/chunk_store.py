@@ -0,0 +1,104 @@
+"""Chunk records with constant-time lookup by position or chunk id."""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+
+ID_DTYPE = np.dtype([("id", "S32"), ("pos", "<i8")])
+
+
+@dataclass(frozen=True)
+class ChunkStore:
+    records_path: Path
+    offsets: np.ndarray
+    ids: np.ndarray
+    # Byte offset of the records within records_path, non-zero inside a bundle.
+    base: int = 0
+    # Dense file id per position, so path-level ranking needs no record reads.
+    files: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+def sidecars(path: Path) -> tuple[Path, Path]:
+    return path.with_suffix(".offsets.npy"), path.with_suffix(".ids.npy")
+
+
+def files_path(path: Path) -> Path:
+    return path.with_suffix(".files.npy")
+
+
+def _replace_npy(path: Path, arr: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as fh:
+        np.save(fh, arr)
+    os.replace(tmp, path)
+
+
+def save(chunks: Sequence[dict], path: Path) -> None:
+    offsets = np.zeros(len(chunks) + 1, dtype="<i8")
+    ids = np.zeros(len(chunks), dtype=ID_DTYPE)
+    files = np.zeros(len(chunks), dtype="<i4")
+    file_ids: dict[str, int] = {}
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as fh:
+        for pos, chunk in enumerate(chunks):
+            line = json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n"
+            fh.write(line)
+            offsets[pos + 1] = offsets[pos] + len(line)
+            ids[pos] = (bytes.fromhex(chunk["sha256"]), pos)
+            files[pos] = file_ids.setdefault(chunk["path"], len(file_ids))
+    ids.sort(order="id")
+    offsets_path, ids_path = sidecars(path)
+    _replace_npy(offsets_path, offsets)
+    _replace_npy(ids_path, ids)
+    _replace_npy(files_path(path), files)
+    os.replace(tmp, path)
+
+
+def load(path: Path) -> ChunkStore | None:
+    offsets_path, ids_path = sidecars(path)
+    if not (path.exists() and offsets_path.exists() and ids_path.exists()):
+        return None
+    files = files_path(path)
+    return ChunkStore(
+        records_path=path,
+        offsets=np.load(offsets_path, mmap_mode="r"),
+        ids=np.load(ids_path, mmap_mode="r"),
+        files=np.load(files, mmap_mode="r") if files.exists() else None,
+    )
+
+
+def get_many(store: ChunkStore, positions: Sequence[int]) -> list[dict]:
+    out: list[dict] = []
+    with store.records_path.open("rb") as fh:
+        for pos in positions:
+            start, end = int(store.offsets[pos]), int(store.offsets[pos + 1])
+            fh.seek(store.base + start)
+            out.append(json.loads(fh.read(end - start)))
+    return out
+
+
+def get(store: ChunkStore, position: int) -> dict:
+    return get_many(store, [position])[0]
+
+
+def find(store: ChunkStore, chunk_id: str) -> int | None:
+    try:
+        key = bytes.fromhex(chunk_id)
+    except ValueError:
+        return None
+    keys = store.ids["id"]
+    i = int(np.searchsorted(keys, key))
+    # S32 drops trailing NUL bytes on read, so compare against the stripped key.
+    if i < len(keys) and keys[i] == key.rstrip(b"\x00"):
+        return int(store.ids["pos"][i])
+    return None
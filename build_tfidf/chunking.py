@@ -16,6 +16,11 @@ class Chunk:
     chunk_index: int
     text: str
     sha256: str
+    token_count: int = 0
+
+
+def chunk_id(path: Path | str, chunk_index: int, text: str) -> str:
+    return sha256(f"{path}:{chunk_index}:{text}".encode("utf-8")).hexdigest()
 
 
 def _heading_path(lines: list[str], idx: int) -> str:
@@ -52,6 +57,7 @@ def chunk_text(
         line_offsets.append(offset)
         offset += len(line) + 1
     chunks: list[Chunk] = []
+    heading_tokens: dict[str, int] = {}
     for chunk_index, token_slice in enumerate(_token_chunks(tokens, max_tokens, overlap)):
         if len(token_slice) > hard_cap:
             token_slice = token_slice[:hard_cap]
@@ -65,6 +71,17 @@ def chunk_text(
                 break
         heading = _heading_path(lines, line_idx)
         full_text = f"{heading}\n\n{chunk_text}".strip()
-        digest = sha256(f"{path}:{chunk_index}:{full_text}".encode("utf-8")).hexdigest()
-        chunks.append(Chunk(path=path, heading=heading, chunk_index=chunk_index, text=full_text, sha256=digest))
+        digest = chunk_id(path, chunk_index, full_text)
+        if heading not in heading_tokens:
+            heading_tokens[heading] = len(enc.encode(f"{heading}\n\n")) if heading else 0
+        chunks.append(
+            Chunk(
+                path=path,
+                heading=heading,
+                chunk_index=chunk_index,
+                text=full_text,
+                sha256=digest,
+                token_count=len(token_slice) + heading_tokens[heading],
+            )
+        )
     return chunks
@@ -7,10 +7,20 @@ import json
 import sys
 from pathlib import Path
 
+from . import query_cache
+from .dedupe import load_max_distance_from_env
 from .embeddings import load_config_from_env
+from .ingest import load_discovery_config_from_env
 from .index import build as build_index
 from .index import update as update_index
+from .index import QUERY_MODES, RankingConfig
 from .index import query as query_index
+from .rerank import DEFAULT_MMR_LAMBDA
+
+
+COMMANDS = {"build", "update", "query", "inspect", "cache", "eval", "export", "import", "migrate", "stats"}
+# Corpus size multiples shown by `stats`.
+PROJECTIONS = (10, 100)
 
 
 def _check_runtime() -> None:
@@ -22,7 +32,6 @@ def _check_runtime() -> None:
         import openai  # noqa: F401
         import tiktoken  # noqa: F401
         import pydantic  # noqa: F401
-        import rank_bm25  # noqa: F401
     except Exception as exc:
         raise SystemExit(
             "Missing required dependencies. Activate your venv and run: "
@@ -30,12 +39,21 @@ def _check_runtime() -> None:
         ) from exc
 
 
+def _positive_int(raw: str) -> int:
+    value = int(raw)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {raw}")
+    return value
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Semantic search for Markdown corpora.",
         epilog=(
             "Examples:\n"
             "  tfidf-search build --root /path/to/corpus\n"
+            "  tfidf-search build --search-dims 256\n"
+            "  tfidf-search build --batch-submit\n"
             "  tfidf-search query \"your query\"\n"
             "  tfidf-search \"your query\"  # shorthand\n"
             "  tfidf-search \"your query\" --open 1  # shorthand\n"
@@ -44,10 +62,20 @@ def build_parser() -> argparse.ArgumentParser:
             "  tfidf-search query \"your query\" --pbcopy 1\n"
             "  tfidf-search query \"your query\" --paths-only\n"
             "  tfidf-search update --remove-code\n"
+            "  tfidf-search update --git\n"
+            "  tfidf-search migrate --dimensions 256\n"
+            "  tfidf-search cache\n"
+            "  tfidf-search stats\n"
+            "  tfidf-search eval gold_queries.jsonl --sweep\n"
+            "  tfidf-search export index.tfpack\n"
+            "  tfidf-search import index.tfpack\n"
+            "  tfidf-search query \"your query\" --bundle index.tfpack\n"
             "\n"
             "Query options:\n"
             "  --top N --rerank-model MODEL --rerank-top N --all-chunks\n"
-            "  --open N --reveal N --pbcopy N --paths-only\n"
+            "  --open N --reveal N --pbcopy N --paths-only --no-cache --fresh\n"
+            "  --collapse-duplicates --mode auto --deadline-ms MS\n"
+            "  --rerank mmr --mmr-lambda 0.7\n"
         ),
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
@@ -56,32 +84,141 @@ def build_parser() -> argparse.ArgumentParser:
     b = sub.add_parser("build", help="build the index")
     b.add_argument("--root", default=".", help="root directory to scan")
     b.add_argument("--remove-code", action="store_true", help="strip code fences")
+    b.add_argument("--git", action="store_true", help="record the git commit for update --git")
+    b.add_argument(
+        "--search-dims",
+        type=_positive_int,
+        default=None,
+        help="search a renormalized vector prefix of this size, then re-score at full dimension",
+    )
+    b.add_argument(
+        "--batch-submit",
+        action="store_true",
+        help="embed through the OpenAI Batch API; rerun the same command to resume an interrupted build",
+    )
+    b.add_argument("--batch-poll", type=float, default=60.0, help="seconds between batch status checks")
 
     u = sub.add_parser("update", help="incrementally update the index")
     u.add_argument("--root", default=".", help="root directory to scan")
     u.add_argument("--remove-code", action="store_true", help="strip code fences")
+    u.add_argument("--git", action="store_true", help="detect changes with git diff instead of a full scan")
 
     q = sub.add_parser("query", help="query the index")
     q.add_argument("text", help="query text")
     q.add_argument("--top", type=int, default=10, help="number of results")
     q.add_argument("--rerank-model", default="", help="optional rerank model")
     q.add_argument("--rerank-top", type=int, default=30, help="rerank candidate count")
+    q.add_argument(
+        "--rerank",
+        choices=["none", "mmr"],
+        default="none",
+        help="local rerank stage; mmr diversifies results using stored vectors (runs before --rerank-model)",
+    )
+    q.add_argument(
+        "--mmr-lambda",
+        type=float,
+        default=DEFAULT_MMR_LAMBDA,
+        help="MMR weight on relevance versus novelty, from 0 to 1",
+    )
     q.add_argument("--all-chunks", action="store_true", help="show multiple chunks per file")
     q.add_argument("--open", dest="open_index", type=int, help="open result number in default app")
     q.add_argument("--reveal", dest="reveal_index", type=int, help="reveal result in Finder")
     q.add_argument("--pbcopy", dest="pbcopy_index", type=int, help="copy result path to clipboard")
     q.add_argument("--paths-only", action="store_true", help="print only file paths")
+    q.add_argument("--no-cache", action="store_true", help="skip the query result cache")
+    q.add_argument(
+        "--fresh",
+        action="store_true",
+        help="search files edited since the last update from an in-memory overlay",
+    )
+    q.add_argument(
+        "--collapse-duplicates",
+        action="store_true",
+        help="show one result per group of duplicate chunks",
+    )
+    q.add_argument("--bundle", default="", help="query a packed bundle in place instead of the data dir")
+    q.add_argument(
+        "--mode",
+        choices=QUERY_MODES,
+        default="hybrid",
+        help="ranking tier; auto answers from BM25 alone when its top hit is decisive",
+    )
+    q.add_argument(
+        "--deadline-ms",
+        type=float,
+        default=None,
+        help="fall back to lexical-only results if the query embedding takes longer than this",
+    )
+
+    mig = sub.add_parser("migrate", help="re-dimension the index from its stored vectors without re-embedding")
+    mig.add_argument(
+        "--dimensions",
+        type=_positive_int,
+        required=True,
+        help="new vector width; text-embedding-3 models only",
+    )
 
     insp = sub.add_parser("inspect", help="inspect a chunk by id")
     insp.add_argument("chunk_id", help="chunk id")
 
+    cache = sub.add_parser("cache", help="show query cache statistics")
+    cache.add_argument("--clear", action="store_true", help="drop cached results and reset counters")
+
+    st = sub.add_parser("stats", help="report index sizes and estimated query process memory")
+    st.add_argument("--dir", default="", help="index directory (default: the index data dir)")
+
+    ev = sub.add_parser("eval", help="measure retrieval quality and latency on gold queries")
+    ev.add_argument("gold", help="JSONL file with query and expected_paths per line")
+    ev.add_argument("--top", type=int, default=5, help="cutoff k for hit rate, recall, and nDCG")
+    ev.add_argument("--sweep", action="store_true", help="try fusion weights, modes, and candidate counts")
+    ev.add_argument("--target", type=float, default=0.8, help="hit rate the recommended configuration must reach")
+
+    exp = sub.add_parser("export", help="pack the index into one checksummed bundle file")
+    exp.add_argument("out", help="bundle file to write")
+
+    imp = sub.add_parser("import", help="verify a bundle and unpack it into the data dir")
+    imp.add_argument("bundle", help="bundle file to read")
+    imp.add_argument("--dir", default="", help="target directory (default: the index data dir)")
+
     return parser
 
 
+def _human(n: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(n) < 1024 or unit == "GiB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+def _print_stats(stats) -> None:
+    print(f"files={stats.files} chunks={stats.chunks} tokens={stats.tokens} slots={stats.slots}")
+    search = f", searched at {stats.search_dimensions}" if stats.search_dimensions < stats.dimensions else ""
+    print(f"vectors: {stats.slots} x {stats.dimensions} {stats.vector_dtype}{search}; faiss: {stats.faiss_type}")
+    print(f"lexical: vocab={stats.vocab} postings={stats.postings}")
+    print(f"{'component':<20} {'disk':>10} {'resident':>10} {'mapped':>10}")
+    for c in stats.components:
+        print(f"{c.name:<20} {_human(c.disk):>10} {_human(c.resident):>10} {_human(c.mapped):>10}")
+    print(f"{'total':<20} {_human(stats.disk):>10} {_human(stats.resident):>10}  (resident includes the runtime)")
+    for factor in PROJECTIONS:
+        disk, resident = stats.project(factor)
+        print(f"x{factor} corpus: ~{stats.chunks * factor} chunks, disk {_human(disk)}, resident {_human(resident)}")
+
+
+def _print_report(report) -> None:
+    k = report.top_k
+    lat = report.latency
+    print(
+        f"{report.settings.describe()}  hit@{k}={report.hit_rate:.3f} recall@{k}={report.recall:.3f} "
+        f"mrr={report.mrr:.3f} ndcg@{k}={report.ndcg:.3f}  "
+        f"p50={lat['total'][0]:.1f}ms p95={lat['total'][1]:.1f}ms"
+    )
+
+
 def _inject_shorthand_query(argv: list[str] | None) -> list[str]:
     if not argv:
         return []
-    if "--query" in argv and "query" not in argv and "build" not in argv and "update" not in argv and "inspect" not in argv:
+    if "--query" in argv and not COMMANDS.intersection(argv):
         idx = argv.index("--query")
         if idx + 1 >= len(argv):
             return ["query"]
@@ -95,7 +232,7 @@ def _inject_shorthand_query(argv: list[str] | None) -> list[str]:
         return ["query", value, *rest]
     if argv[0].startswith("-"):
         return argv
-    if argv[0] in {"build", "update", "query", "inspect"}:
+    if argv[0] in COMMANDS:
         return argv
     if any(token.startswith("-") for token in argv[1:]):
         return ["query", *argv]
@@ -115,24 +252,66 @@ def main(argv: list[str] | None = None) -> int:
     cfg = load_config_from_env()
 
     if args.cmd == "build":
-        build_index(Path(args.root), cfg, remove_code=args.remove_code)
+        build_index(
+            Path(args.root),
+            cfg,
+            remove_code=args.remove_code,
+            discovery=load_discovery_config_from_env(),
+            use_git=args.git,
+            search_dimensions=args.search_dims,
+            dedupe_distance=load_max_distance_from_env(),
+            batch_submit=args.batch_submit,
+            batch_poll=args.batch_poll,
+        )
         return 0
     if args.cmd == "query":
         query_text = args.text
         rerank_model = args.rerank_model.strip() or None
-        results = query_index(
-            query_text,
-            cfg,
-            top_k=args.top,
-            rerank_model=rerank_model,
-            rerank_top_n=args.rerank_top,
-            dedupe_by_path=not args.all_chunks,
-        )
+        ranking = RankingConfig(mmr_lambda=args.mmr_lambda if args.rerank == "mmr" else None)
+        details: dict = {}
+        if args.bundle and args.fresh:
+            raise SystemExit("--fresh compares against the data dir manifest and cannot be used with --bundle.")
+        if args.bundle:
+            from .searcher import Searcher
+
+            results = Searcher(args.bundle, cfg).search(
+                query_text,
+                top_k=args.top,
+                rerank_model=rerank_model,
+                rerank_top_n=args.rerank_top,
+                dedupe_by_path=not args.all_chunks,
+                collapse_duplicates=args.collapse_duplicates,
+                ranking=ranking,
+                mode=args.mode,
+                deadline_ms=args.deadline_ms,
+                details=details,
+            )
+        else:
+            results = query_index(
+                query_text,
+                cfg,
+                top_k=args.top,
+                rerank_model=rerank_model,
+                rerank_top_n=args.rerank_top,
+                dedupe_by_path=not args.all_chunks,
+                use_cache=not args.no_cache,
+                collapse_duplicates=args.collapse_duplicates,
+                ranking=ranking,
+                fresh=args.fresh,
+                mode=args.mode,
+                deadline_ms=args.deadline_ms,
+                details=details,
+            )
+        if "tier" in details:
+            # Keep --paths-only output pipeable; the tier goes to stderr there.
+            print(f"tier: {details['tier']}", file=sys.stderr if args.paths_only else sys.stdout)
         for idx, (chunk, score) in enumerate(results, start=1):
             if args.paths_only:
                 print(chunk["path"])
             else:
-                print(f"{idx:02d}. {chunk['path']}  (score={score:.4f})")
+                dupes = len(chunk.get("duplicates", []))
+                suffix = f"  [+{dupes} duplicates]" if dupes else ""
+                print(f"{idx:02d}. {chunk['path']}  (score={score:.4f}){suffix}")
         if args.open_index or args.reveal_index or args.pbcopy_index:
             import subprocess
 
@@ -159,17 +338,75 @@ def main(argv: list[str] | None = None) -> int:
                 subprocess.run(["pbcopy"], input=path, text=True, check=False)
         return 0
     if args.cmd == "update":
-        update_index(Path(args.root), cfg, remove_code=args.remove_code)
+        update_index(
+            Path(args.root),
+            cfg,
+            remove_code=args.remove_code,
+            discovery=load_discovery_config_from_env(),
+            use_git=args.git,
+            dedupe_distance=load_max_distance_from_env(),
+        )
+        return 0
+    if args.cmd == "migrate":
+        from .index import migrate
+
+        previous = migrate(args.dimensions)
+        print(f"Migrated index from {previous} to {args.dimensions} dimensions.")
         return 0
     if args.cmd == "inspect":
-        from .index import MANIFEST_PATH, _load_json
-
-        manifest = _load_json(MANIFEST_PATH)
-        for chunk in manifest.get("chunks", []):
-            if chunk["sha256"] == args.chunk_id:
-                print(json.dumps(chunk, indent=2))
-                return 0
-        raise SystemExit("Chunk not found.")
+        from .index import get_chunk
+
+        chunk = get_chunk(args.chunk_id)
+        if chunk is None:
+            raise SystemExit("Chunk not found.")
+        print(json.dumps(chunk, indent=2))
+        return 0
+    if args.cmd == "cache":
+        from .index import QUERY_CACHE_PATH
+
+        if args.clear:
+            query_cache.clear(QUERY_CACHE_PATH, reset_stats=True)
+        stats = query_cache.stats(QUERY_CACHE_PATH)
+        print(f"entries={stats.entries} hits={stats.hits} misses={stats.misses} hit_rate={stats.hit_rate:.1%}")
+        return 0
+    if args.cmd == "stats":
+        from .stats import collect
+
+        _print_stats(collect(Path(args.dir) if args.dir else None))
+        return 0
+    if args.cmd == "export":
+        from .index import export_bundle
+
+        header = export_bundle(Path(args.out))
+        total = sum(s.length for s in header.sections.values())
+        print(f"Wrote {args.out}: {len(header.sections)} sections, {total} bytes")
+        return 0
+    if args.cmd == "import":
+        from .index import import_bundle
+
+        written = import_bundle(Path(args.bundle), Path(args.dir) if args.dir else None)
+        print(f"Imported {len(written)} files into {written[0].parent}")
+        return 0
+    if args.cmd == "eval":
+        from . import evaluate
+
+        gold = evaluate.load_gold(Path(args.gold))
+        reports = evaluate.run(gold, cfg, top_k=args.top, sweep=args.sweep)
+        if not args.sweep:
+            report = reports[0]
+            _print_report(report)
+            for stage in evaluate.STAGES:
+                p50, p95 = report.latency[stage]
+                print(f"  {stage:<9} p50={p50:.2f}ms p95={p95:.2f}ms")
+            return 0
+        for report in sorted(reports, key=lambda r: (-r.hit_rate, -r.ndcg)):
+            _print_report(report)
+        best = evaluate.cheapest(reports, args.target)
+        if best is None:
+            print(f"No configuration reached hit@{args.top} >= {args.target:.0%}.")
+            return 1
+        print(f"Cheapest meeting hit@{args.top} >= {args.target:.0%}: {best.settings.describe()}")
+        return 0
     return 1
 
 
@@ -0,0 +1,133 @@
+"""SimHash near-duplicate detection for sharing one vector slot across chunks."""
+
+from __future__ import annotations
+
+import os
+import re
+from hashlib import blake2b, sha256
+from typing import Sequence
+
+import numpy as np
+
+
+# Chunks whose SimHash fingerprints differ in at most this many bits share a slot;
+# at 0 only chunks with identical text do.
+DEFAULT_MAX_DISTANCE = 0
+SHINGLE = 3
+
+WORD_RE = re.compile(r"\w+")
+
+
+class _WordHashes(dict):
+    def __missing__(self, word: str) -> int:
+        value = int.from_bytes(blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+        self[word] = value
+        return value
+
+
+_WORD_HASHES = _WordHashes()
+
+
+def _mix(z: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer, so combined word hashes spread over all 64 bits.
+    z = z ^ (z >> np.uint64(30))
+    z = z * np.uint64(0xBF58476D1CE4E5B9)
+    z = z ^ (z >> np.uint64(27))
+    z = z * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def simhash(text: str) -> int:
+    words = WORD_RE.findall(text.lower())
+    if not words:
+        return 0
+    h = np.array([_WORD_HASHES[w] for w in words], dtype="<u8")
+    # Word shingles: fold each window of SHINGLE word hashes into one feature.
+    features = h[: len(h) - SHINGLE + 1].copy() if len(h) >= SHINGLE else h[:1].copy()
+    for offset in range(1, min(SHINGLE, len(h))):
+        features = _mix(features) ^ h[offset : offset + len(features)]
+    features = _mix(features)
+    bits = np.unpackbits(features.view(np.uint8), bitorder="little").reshape(-1, 64)
+    majority = bits.sum(axis=0) * 2 > len(features)
+    return int(np.packbits(majority, bitorder="little").view("<u8")[0])
+
+
+def _bands(fingerprint: int, n_bands: int) -> list[tuple[int, int]]:
+    width = 64 // n_bands
+    out = []
+    for band in range(n_bands):
+        shift = band * width
+        bits = 64 - shift if band == n_bands - 1 else width
+        out.append((band, fingerprint >> shift & ((1 << bits) - 1)))
+    return out
+
+
+def assign_slots(
+    fingerprints: Sequence[int],
+    existing: Sequence[int],
+    max_distance: int = DEFAULT_MAX_DISTANCE,
+) -> tuple[list[int], list[int]]:
+    # Map each fingerprint to an existing slot within max_distance bits, or to a
+    # new slot numbered after `existing`. Returns (slot per input, new slot fingerprints).
+    slot_prints = list(existing)
+    if max_distance < 0:
+        start = len(slot_prints)
+        return list(range(start, start + len(fingerprints))), list(fingerprints)
+    # Pigeonhole: prints within d bits agree exactly on at least one of d + 1 bands.
+    n_bands = max_distance + 1
+    buckets: dict[tuple[int, int], list[int]] = {}
+    for slot, fp in enumerate(slot_prints):
+        for key in _bands(fp, n_bands):
+            buckets.setdefault(key, []).append(slot)
+
+    slots: list[int] = []
+    new_prints: list[int] = []
+    for fp in fingerprints:
+        keys = _bands(fp, n_bands)
+        match = None
+        for key in keys:
+            for slot in buckets.get(key, []):
+                if (slot_prints[slot] ^ fp).bit_count() <= max_distance:
+                    match = slot
+                    break
+            if match is not None:
+                break
+        if match is None:
+            match = len(slot_prints)
+            slot_prints.append(fp)
+            new_prints.append(fp)
+            for key in keys:
+                buckets.setdefault(key, []).append(match)
+        slots.append(match)
+    return slots, new_prints
+
+
+def assign_texts(
+    texts: Sequence[str],
+    existing_prints: Sequence[int],
+    existing_texts: Sequence[str],
+    max_distance: int = DEFAULT_MAX_DISTANCE,
+) -> tuple[list[int], list[int]]:
+    # Like assign_slots over the SimHash of each text, except that at distance 0
+    # slots are matched by a digest of the text: equal fingerprints do not mean
+    # equal text (case and punctuation are ignored, and unrelated edits collide).
+    prints = [simhash(t) for t in texts]
+    if max_distance != 0:
+        return assign_slots(prints, existing_prints, max_distance)
+    by_digest: dict[bytes, int] = {}
+    for slot, text in enumerate(existing_texts):
+        by_digest.setdefault(sha256(text.encode("utf-8")).digest(), slot)
+    slots: list[int] = []
+    new_prints: list[int] = []
+    for text, fp in zip(texts, prints):
+        key = sha256(text.encode("utf-8")).digest()
+        slot = by_digest.get(key)
+        if slot is None:
+            slot = by_digest[key] = len(existing_prints) + len(new_prints)
+            new_prints.append(fp)
+        slots.append(slot)
+    return slots, new_prints
+
+
+def load_max_distance_from_env() -> int:
+    return int(os.getenv("DEDUPE_DISTANCE", str(DEFAULT_MAX_DISTANCE)))
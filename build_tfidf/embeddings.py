@@ -2,13 +2,20 @@
 
 from __future__ import annotations
 
+import base64
 import os
+import random
 import time
+import urllib.error
 from dataclasses import dataclass
-from typing import Iterable
+from typing import Callable, Iterable, Sequence, TypeVar
 
+import numpy as np
+import openai
 from openai import OpenAI
 
+from . import local_embed
+
 
 @dataclass(frozen=True)
 class EmbeddingConfig:
@@ -19,6 +26,33 @@ class EmbeddingConfig:
     rpm_limit: int
     fallback_to_ollama: bool
     ollama_model: str
+    local_features: int = local_embed.DEFAULT_FEATURES
+    batch_tokens: int = 100_000
+    max_retries: int = 5
+    retry_backoff: float = 1.0
+
+
+# Upper bound on a single backoff sleep, in seconds.
+MAX_BACKOFF = 60.0
+
+T = TypeVar("T")
+
+
+class EmbeddingError(RuntimeError):
+    # Raised when a batch still fails after retries. `vectors` holds every
+    # vector completed before the failing batch, in input order.
+    def __init__(self, message: str, vectors: list[list[float]] | np.ndarray) -> None:
+        super().__init__(message)
+        self.vectors = vectors
+
+
+@dataclass(frozen=True)
+class Failover:
+    from_provider: str
+    to_provider: str
+    model: str
+    reason: str
+    completed: int
 
 
 def _rate_limit_sleep(last_call: float, rpm_limit: int) -> float:
@@ -32,39 +66,125 @@ def _rate_limit_sleep(last_call: float, rpm_limit: int) -> float:
     return time.time()
 
 
-def embed_openai(texts: Iterable[str], config: EmbeddingConfig) -> list[list[float]]:
-    client = OpenAI()
-    batch = []
-    out: list[list[float]] = []
+def _is_transient(exc: Exception) -> bool:
+    if isinstance(exc, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    if isinstance(exc, urllib.error.HTTPError):
+        return exc.code == 429 or exc.code >= 500
+    return isinstance(exc, (urllib.error.URLError, TimeoutError, ConnectionError))
+
+
+def _retry_after(exc: Exception) -> float:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or getattr(exc, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _backoff_delay(attempt: int, base: float) -> float:
+    # Full jitter keeps concurrent runs from retrying in lockstep.
+    return random.uniform(0, min(MAX_BACKOFF, base * 2**attempt))
+
+
+def _with_retry(call: Callable[[], T], config: EmbeddingConfig) -> T:
+    attempt = 0
+    while True:
+        try:
+            return call()
+        except Exception as exc:
+            if attempt >= config.max_retries or not _is_transient(exc):
+                raise
+            time.sleep(max(_backoff_delay(attempt, config.retry_backoff), _retry_after(exc)))
+            attempt += 1
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def pack_batches(
+    token_counts: Sequence[int],
+    max_inputs: int,
+    max_tokens: int,
+) -> list[tuple[int, int]]:
+    # Contiguous (start, end) slices, each under both the input and token caps.
+    # A single input larger than max_tokens still gets a batch of its own.
+    batches: list[tuple[int, int]] = []
+    start = 0
+    tokens = 0
+    for i, n in enumerate(token_counts):
+        if i > start and (i - start >= max_inputs or tokens + n > max_tokens):
+            batches.append((start, i))
+            start = i
+            tokens = 0
+        tokens += n
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
+
+
+def _decode_embedding(raw: str | Sequence[float]) -> np.ndarray:
+    # base64 rows are little-endian float32; servers that ignore
+    # encoding_format send plain float lists instead.
+    if isinstance(raw, str):
+        return np.frombuffer(base64.b64decode(raw), dtype="<f4")
+    return np.asarray(raw, dtype="float32")
+
+
+def embed_openai(
+    texts: Sequence[str],
+    config: EmbeddingConfig,
+    token_counts: Sequence[int] | None = None,
+) -> np.ndarray:
+    # Retries are handled per batch below, so the client's own retry loop is off.
+    # Construction fails without credentials, which callers treat like a failed batch.
+    try:
+        client = OpenAI(max_retries=0)
+    except openai.OpenAIError as exc:
+        raise EmbeddingError(f"OpenAI client unavailable: {exc}", np.empty((0, 0), dtype="float32")) from exc
+    if token_counts is None:
+        token_counts = [_estimate_tokens(t) for t in texts]
+    # Rows are decoded straight into one matrix, allocated once the first
+    # response shows the width.
+    out: np.ndarray | None = None
     last_call = 0.0
-    for text in texts:
-        batch.append(text)
-        if len(batch) >= config.batch_size:
+
+    for start, end in pack_batches(token_counts, config.batch_size, config.batch_tokens):
+        def _call() -> list:
+            nonlocal last_call
             last_call = _rate_limit_sleep(last_call, config.rpm_limit)
             resp = client.embeddings.create(
                 model=config.model,
-                input=batch,
+                input=list(texts[start:end]),
                 dimensions=config.dimensions,
+                encoding_format="base64",
             )
-            out.extend([row.embedding for row in resp.data])
-            batch = []
-    if batch:
-        last_call = _rate_limit_sleep(last_call, config.rpm_limit)
-        resp = client.embeddings.create(
-            model=config.model,
-            input=batch,
-            dimensions=config.dimensions,
-        )
-        out.extend([row.embedding for row in resp.data])
-    return out
+            # Rows carry their input index; a short or mislabelled response
+            # would otherwise leave rows unset or put vectors on the wrong text.
+            if sorted(row.index for row in resp.data) != list(range(end - start)):
+                raise ValueError(f"expected {end - start} embeddings, got indices {[row.index for row in resp.data]}")
+            return [(row.index, row.embedding) for row in resp.data]
+
+        try:
+            rows = _with_retry(_call, config)
+        except Exception as exc:
+            done = out[:start] if out is not None else np.empty((0, 0), dtype="float32")
+            raise EmbeddingError(f"OpenAI batch {start}:{end} failed: {exc}", done) from exc
+        for i, raw in rows:
+            vec = _decode_embedding(raw)
+            if out is None:
+                out = np.empty((len(texts), vec.shape[0]), dtype="float32")
+            out[start + i] = vec
+    return out if out is not None else np.empty((0, 0), dtype="float32")
 
 
 def embed_ollama(texts: Iterable[str], config: EmbeddingConfig) -> list[list[float]]:
     import json
     import urllib.request
 
-    out: list[list[float]] = []
-    for text in texts:
+    def _call(text: str) -> list[float]:
         payload = json.dumps({"model": config.ollama_model, "prompt": text}).encode("utf-8")
         req = urllib.request.Request(
             "http://localhost:11434/api/embeddings",
@@ -72,22 +192,40 @@ def embed_ollama(texts: Iterable[str], config: EmbeddingConfig) -> list[list[flo
             headers={"Content-Type": "application/json"},
         )
         with urllib.request.urlopen(req, timeout=60) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
-            out.append(data["embedding"])
+            return json.loads(resp.read().decode("utf-8"))["embedding"]
+
+    out: list[list[float]] = []
+    for i, text in enumerate(texts):
+        try:
+            out.append(_with_retry(lambda: _call(text), config))
+        except Exception as exc:
+            raise EmbeddingError(f"Ollama input {i} failed: {exc}", out) from exc
     return out
 
 
-def embed_texts(texts: Iterable[str], config: EmbeddingConfig) -> list[list[float]]:
+def embed_texts(
+    texts: Iterable[str],
+    config: EmbeddingConfig,
+    token_counts: Sequence[int] | None = None,
+    on_failover: Callable[[Failover], None] | None = None,
+) -> list[list[float]] | np.ndarray:
+    texts = list(texts)
     provider = config.provider.lower()
     if provider == "openai":
         try:
-            return embed_openai(texts, config)
-        except Exception:
-            if config.fallback_to_ollama:
-                return embed_ollama(texts, config)
-            raise
+            return embed_openai(texts, config, token_counts)
+        except EmbeddingError as exc:
+            if not config.fallback_to_ollama:
+                raise
+            # Vectors from different models are not comparable, so failover
+            # re-embeds the whole input with Ollama and reports it to the caller.
+            if on_failover is not None:
+                on_failover(Failover("openai", "ollama", config.ollama_model, str(exc), len(exc.vectors)))
+            return embed_ollama(texts, config)
     if provider == "ollama":
         return embed_ollama(texts, config)
+    if provider == "local":
+        return local_embed.embed(texts, local_embed.unfitted(config.local_features))
     raise ValueError(f"Unknown embedding provider: {config.provider}")
 
 
@@ -96,10 +234,17 @@ def load_config_from_env() -> EmbeddingConfig:
     model = os.getenv("OPENAI_MODEL", "text-embedding-3-large")
     dim_raw = os.getenv("DIMENSIONS", "")
     dimensions = int(dim_raw) if dim_raw else None
-    batch_size = int(os.getenv("BATCH_SIZE", "32"))
+    batch_size = int(os.getenv("BATCH_SIZE", "256"))
+    batch_tokens = int(os.getenv("BATCH_TOKENS", "100000"))
     rpm_limit = int(os.getenv("RPM_LIMIT", "60"))
+    max_retries = int(os.getenv("MAX_RETRIES", "5"))
+    retry_backoff = float(os.getenv("RETRY_BACKOFF", "1.0"))
     fallback_to_ollama = os.getenv("FALLBACK_TO_OLLAMA", "false").lower() == "true"
     ollama_model = os.getenv("OLLAMA_MODEL", "nomic-embed-text")
+    local_features = int(os.getenv("LOCAL_FEATURES", str(local_embed.DEFAULT_FEATURES)))
+    if provider.lower() == "local":
+        # The hashing scheme and width determine the vectors, so they name the model.
+        model = local_embed.model_name(local_features)
     return EmbeddingConfig(
         provider=provider,
         model=model,
@@ -108,4 +253,8 @@ def load_config_from_env() -> EmbeddingConfig:
         rpm_limit=rpm_limit,
         fallback_to_ollama=fallback_to_ollama,
         ollama_model=ollama_model,
+        local_features=local_features,
+        batch_tokens=batch_tokens,
+        max_retries=max_retries,
+        retry_backoff=retry_backoff,
     )
@@ -0,0 +1,190 @@
+"""Retrieval quality and latency evaluation against gold query sets."""
+
+from __future__ import annotations
+
+import json
+import math
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+from .embeddings import EmbeddingConfig
+from .index import LoadedIndex, QueryPlan, RankingConfig, embed_queries, load_index, search_plan
+
+
+STAGES = ("embed", "semantic", "lexical", "fuse", "hydrate", "total")
+SWEEP_WEIGHTS = [(1.0, 0.0), (0.7, 0.3), (0.5, 0.5), (0.3, 0.7), (0.0, 1.0)]
+SWEEP_FUSION = ["minmax", "rrf"]
+SWEEP_MULTIPLIERS = [2, 5, 10]
+SWEEP_OVERSAMPLE = [2, 4, 8]
+
+
+@dataclass(frozen=True)
+class GoldQuery:
+    query: str
+    expected_paths: list[str]
+    id: str = ""
+
+
+@dataclass(frozen=True)
+class EvalSettings:
+    weight_semantic: float
+    weight_lexical: float
+    ranking: RankingConfig = RankingConfig()
+
+    def describe(self) -> str:
+        return (
+            f"w={self.weight_semantic:.2f}/{self.weight_lexical:.2f} fusion={self.ranking.fusion} "
+            f"cand={self.ranking.candidate_multiplier}x oversample={self.ranking.prefix_oversample}x"
+        )
+
+
+@dataclass(frozen=True)
+class EvalReport:
+    settings: EvalSettings
+    top_k: int
+    queries: int
+    hit_rate: float
+    recall: float
+    mrr: float
+    ndcg: float
+    # stage -> (p50, p95) in milliseconds
+    latency: dict[str, tuple[float, float]]
+
+
+def load_gold(path: Path) -> list[GoldQuery]:
+    out: list[GoldQuery] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        rec = json.loads(line)
+        out.append(
+            GoldQuery(query=rec["query"], expected_paths=list(rec["expected_paths"]), id=str(rec.get("id", "")))
+        )
+    return out
+
+
+def score_query(paths: Sequence[str], expected: Sequence[str], k: int) -> tuple[float, float, float]:
+    # (recall@k, reciprocal rank, nDCG@k) with binary relevance; each expected
+    # path counts once, matched as a suffix of the result path.
+    found: set[str] = set()
+    gains: list[float] = []
+    for path in paths[:k]:
+        posix = Path(path).as_posix()
+        hit = next((e for e in expected if e not in found and posix.endswith(e)), None)
+        if hit is not None:
+            found.add(hit)
+        gains.append(1.0 if hit is not None else 0.0)
+    if not expected:
+        return 0.0, 0.0, 0.0
+    recall = len(found) / len(expected)
+    rr = next((1.0 / (i + 1) for i, g in enumerate(gains) if g), 0.0)
+    dcg = sum(g / math.log2(i + 2) for i, g in enumerate(gains))
+    idcg = sum(1.0 / math.log2(i + 2) for i in range(min(len(expected), k)))
+    return recall, rr, dcg / idcg
+
+
+def _percentiles(samples: list[float]) -> tuple[float, float]:
+    if not samples:
+        return 0.0, 0.0
+    p50, p95 = np.percentile(np.asarray(samples) * 1000.0, [50, 95])
+    return float(p50), float(p95)
+
+
+def evaluate(
+    loaded: LoadedIndex,
+    gold: Sequence[GoldQuery],
+    query_vecs: Sequence[np.ndarray],
+    embed_seconds: Sequence[float],
+    settings: EvalSettings,
+    top_k: int = 5,
+) -> EvalReport:
+    stages: dict[str, list[float]] = {stage: [] for stage in STAGES}
+    hits = recall = mrr = ndcg = 0.0
+    for rec, vec, embed_s in zip(gold, query_vecs, embed_seconds):
+        timings: dict[str, float] = {}
+        start = time.perf_counter()
+        results = search_plan(
+            loaded,
+            rec.query,
+            QueryPlan("hybrid", vector=vec),
+            top_k=top_k,
+            weight_semantic=settings.weight_semantic,
+            weight_lexical=settings.weight_lexical,
+            ranking=settings.ranking,
+            timings=timings,
+        )
+        timings["embed"] = embed_s
+        timings["total"] = embed_s + time.perf_counter() - start
+        for stage in STAGES:
+            stages[stage].append(timings.get(stage, 0.0))
+
+        r, rr, n = score_query([c["path"] for c, _ in results], rec.expected_paths, top_k)
+        hits += 1.0 if rr else 0.0
+        recall += r
+        mrr += rr
+        ndcg += n
+    count = max(len(gold), 1)
+    return EvalReport(
+        settings=settings,
+        top_k=top_k,
+        queries=len(gold),
+        hit_rate=hits / count,
+        recall=recall / count,
+        mrr=mrr / count,
+        ndcg=ndcg / count,
+        latency={stage: _percentiles(samples) for stage, samples in stages.items()},
+    )
+
+
+def sweep_settings(loaded: LoadedIndex) -> list[EvalSettings]:
+    prefix = loaded.vindex.dim < int(loaded.meta["embedding_dimensions"])
+    oversample = SWEEP_OVERSAMPLE if prefix else [RankingConfig().prefix_oversample]
+    return [
+        EvalSettings(ws, wl, RankingConfig(fusion, multiplier, over))
+        for ws, wl in SWEEP_WEIGHTS
+        for fusion in SWEEP_FUSION
+        for multiplier in SWEEP_MULTIPLIERS
+        for over in oversample
+    ]
+
+
+def run(
+    gold: Sequence[GoldQuery],
+    embed_config: EmbeddingConfig,
+    top_k: int = 5,
+    sweep: bool = False,
+    directory: Path | None = None,
+) -> list[EvalReport]:
+    loaded = load_index(directory)
+    # Query embeddings do not depend on the ranking knobs, so each is paid for once.
+    vecs = []
+    embed_seconds = []
+    for rec in gold:
+        start = time.perf_counter()
+        vecs.append(embed_queries(loaded, [rec.query], embed_config)[0])
+        embed_seconds.append(time.perf_counter() - start)
+    if sweep:
+        settings = sweep_settings(loaded)
+    else:
+        settings = [EvalSettings(float(loaded.meta["weight_semantic"]), float(loaded.meta["weight_lexical"]))]
+    return [evaluate(loaded, gold, vecs, embed_seconds, s, top_k) for s in settings]
+
+
+def cheapest(reports: Sequence[EvalReport], target: float) -> EvalReport | None:
+    # Among configurations whose hit rate meets the target, fewest candidates
+    # first (the deterministic cost), then p95 latency, then quality.
+    passing = [r for r in reports if r.hit_rate >= target]
+    if not passing:
+        return None
+    return min(
+        passing,
+        key=lambda r: (
+            r.settings.ranking.candidate_multiplier * r.settings.ranking.prefix_oversample,
+            r.latency["total"][1],
+            -r.ndcg,
+        ),
+    )
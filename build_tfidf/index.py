@@ -2,22 +2,54 @@
 
 from __future__ import annotations
 
+import io
 import json
-from dataclasses import asdict
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable
 
-from .chunking import Chunk, chunk_text
+import numpy as np
+
+from . import batch_embed, bundle, chunk_store, lexical_store, local_embed, query_cache
+from .chunking import Chunk, chunk_id, chunk_text
 from .cleaning import clean_text
-from .embeddings import EmbeddingConfig, embed_texts
-from .ingest import DEFAULT_EXCLUDE_DIRS, iter_markdown_files, read_text_strict, sha256_text
-from .manifest import ManifestEntry, build_manifest, load_manifest
-from .lexical import LexicalIndex, build_index as build_lexical, search as search_lexical
+from .dedupe import DEFAULT_MAX_DISTANCE, assign_texts, simhash
+from .embeddings import EmbeddingConfig, Failover, embed_texts
+from .ingest import (
+    DEFAULT_EXCLUDE_DIRS,
+    DiscoveredFile,
+    DiscoveryConfig,
+    discover_markdown_files,
+    read_text_strict,
+    sha256_text,
+)
+from .manifest import ChangeSet, ManifestEntry, build_manifest, load_manifest
+from .lexical import (
+    LexicalIndex,
+    match_constraints,
+    parse_query,
+    search as search_lexical,
+    with_overlay,
+)
 from .metadata import IndexMetadata, validate_signature
-from .rerank import RerankConfig, rerank
-from .scoring import fuse_scores
-from .vector_store import VectorIndex, build_index as build_vector, load as load_vector, save as save_vector, search
+from .rerank import RerankConfig, mmr, rerank
+from .scoring import boost_scores, fuse_scores, rrf_scores
+from .vcs import diff_since, dirty_paths, head_commit
+from .vector_store import (
+    VectorIndex,
+    build_index as build_vector,
+    load as load_vector,
+    load_bytes as load_vector_bytes,
+    rescore,
+    save as save_vector,
+    search,
+)
 
 
 DATA_DIR = Path("build_tfidf/data")
@@ -26,10 +58,55 @@ VECTORS_PATH = DATA_DIR / "vectors.npy"
 META_PATH = DATA_DIR / "metadata.json"
 MANIFEST_PATH = DATA_DIR / "manifest.json"
 LEX_PATH = DATA_DIR / "lexical.json"
+CHUNKS_PATH = DATA_DIR / "chunks.jsonl"
+QUERY_CACHE_PATH = DATA_DIR / "query_cache.json"
+LOCAL_MODEL_PATH = DATA_DIR / "local_model.npz"
+SLOTS_PATH = DATA_DIR / "slots.npz"
+# Request files and submission state of a `build --batch-submit` in progress.
+BATCH_DIR = DATA_DIR / "batch"
 
 
 SCHEMA_VERSION = 1
 CLEANING_RULES = "front_matter,optional_code_fences,normalize_whitespace"
+VECTOR_BACKEND = "faiss"
+# Candidates fetched from a prefix index per final semantic hit before exact re-scoring.
+PREFIX_OVERSAMPLE = 4
+# Added to the fused score of chunks that satisfy quoted-phrase and NEAR/k constraints.
+CONSTRAINT_BOOST = 1.0
+# With MMR ahead of the LLM reranker, the LLM sees this many MMR picks per result.
+MMR_LLM_FACTOR = 2
+FUSION_MODES = {"minmax": fuse_scores, "rrf": rrf_scores}
+QUERY_MODES = ("hybrid", "semantic", "lexical", "auto")
+# In auto mode BM25 answers alone when its best hit outscores the runner-up by this factor.
+DECISIVE_RATIO = 2.0
+# Models trained so that a renormalized prefix of a vector is a valid shorter embedding.
+TRUNCATABLE_MODELS = ("text-embedding-3-small", "text-embedding-3-large")
+# Their full widths, which identify OpenAI vectors in indexes that predate the
+# recorded provider.
+NATIVE_DIMENSIONS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072}
+
+
+@dataclass(frozen=True)
+class RankingConfig:
+    fusion: str = "minmax"
+    # Semantic and lexical candidates fetched per requested result.
+    candidate_multiplier: int = 5
+    prefix_oversample: int = PREFIX_OVERSAMPLE
+    # Set to diversify the rerank pool with MMR at this relevance weight.
+    mmr_lambda: float | None = None
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    # Tier a query is answered at: "hybrid", "semantic" or "lexical". The reason
+    # is "decisive" or "deadline" when auto mode or a deadline chose lexical.
+    tier: str
+    reason: str = ""
+    vector: np.ndarray | None = None
+    lexical: tuple[list[tuple[int, float]], set[int]] | None = None
+
+    def describe(self) -> str:
+        return f"{self.tier} ({self.reason})" if self.reason else self.tier
 
 
 def _ensure_data_dir() -> None:
@@ -44,22 +121,123 @@ def _load_json(path: Path) -> dict:
     return json.loads(path.read_text(encoding="utf-8"))
 
 
+def _embed(
+    texts: list[str],
+    embed_config: EmbeddingConfig,
+    fit: bool = False,
+    token_counts: list[int] | None = None,
+    on_failover: Callable[[Failover], None] | None = None,
+    local_model: local_embed.LocalModel | None = None,
+) -> np.ndarray:
+    if embed_config.provider.lower() == "local":
+        # The local provider's IDF weights and projection are fitted at build time
+        # and stored with the index so queries and updates embed identically.
+        if fit:
+            model = local_embed.fit(texts, embed_config.local_features, embed_config.dimensions)
+            local_embed.save(model, LOCAL_MODEL_PATH)
+        else:
+            model = local_model or local_embed.load(LOCAL_MODEL_PATH)
+        return local_embed.embed(texts, model)
+    vectors = embed_texts(texts, embed_config, token_counts=token_counts, on_failover=on_failover)
+    return np.asarray(vectors, dtype="float32")
+
+
+def index_config(meta: dict, embed_config: EmbeddingConfig) -> EmbeddingConfig:
+    # Updates and queries embed with the provider the index was built with and
+    # never fail over, since vectors from another model would not be comparable.
+    embed_config = replace(embed_config, fallback_to_ollama=False)
+    if meta.get("failover") and embed_config.provider.lower() == "openai":
+        embed_config = replace(embed_config, provider="ollama", ollama_model=str(meta["embedding_model"]))
+    if embed_config.provider.lower() == "openai" and _openai_model(meta):
+        # Request the index's width, which `migrate` may have set below the model default.
+        embed_config = replace(embed_config, dimensions=int(meta["embedding_dimensions"]))
+    return embed_config
+
+
+def _openai_model(meta: dict) -> bool:
+    provider = str(meta.get("embedding_provider", "openai")).lower()
+    return provider == "openai" and not meta.get("failover") and str(meta.get("embedding_model")) in TRUNCATABLE_MODELS
+
+
+def _truncatable(meta: dict) -> bool:
+    # Another provider may have built the index under an OpenAI model name, so
+    # without a recorded provider only a native-width index is known to be OpenAI's.
+    if not _openai_model(meta):
+        return False
+    if "embedding_provider" in meta:
+        return True
+    return int(meta["embedding_dimensions"]) == NATIVE_DIMENSIONS[str(meta["embedding_model"])]
+
+
+def _vector_backend(search_dimensions: int | None) -> str:
+    if search_dimensions:
+        return f"{VECTOR_BACKEND}:prefix={search_dimensions}"
+    return VECTOR_BACKEND
+
+
+def _prefix_dim(meta: dict) -> int | None:
+    _, _, option = str(meta.get("vector_backend", "")).partition(":prefix=")
+    return int(option) if option else None
+
+
+def _discover(root: Path, discovery: DiscoveryConfig | None) -> list[DiscoveredFile]:
+    if discovery is None:
+        discovery = DiscoveryConfig(exclude_dirs=frozenset(DEFAULT_EXCLUDE_DIRS))
+    return discover_markdown_files(
+        root,
+        discovery.exclude_dirs,
+        respect_gitignore=discovery.respect_gitignore,
+        workers=discovery.workers,
+    )
+
+
 def _build_chunks(
     paths: list[Path],
     remove_code: bool,
     chunk_size: int,
     chunk_overlap: int,
+    digests: dict[str, str] | None = None,
 ) -> list[Chunk]:
     all_chunks: list[Chunk] = []
     for path in paths:
         text = read_text_strict(path)
         if text is None:
             continue
+        if digests is not None:
+            digests[str(path)] = sha256_text(text)
         cleaned = clean_text(text, remove_code=remove_code)
         all_chunks.extend(chunk_text(path, cleaned, max_tokens=chunk_size, overlap=chunk_overlap))
     return all_chunks
 
 
+def _first_members(aliases: list[int], n_slots: int, offset: int = 0) -> list[int]:
+    # Position of the first chunk in each slot numbered offset..offset + n_slots - 1.
+    first = [-1] * n_slots
+    for pos, slot in enumerate(aliases):
+        idx = slot - offset
+        if 0 <= idx < n_slots and first[idx] < 0:
+            first[idx] = pos
+    return first
+
+
+def _save_slots(aliases: list[int], fingerprints: list[int]) -> None:
+    tmp = SLOTS_PATH.with_name(SLOTS_PATH.name + ".tmp")
+    with tmp.open("wb") as fh:
+        np.savez(
+            fh,
+            aliases=np.asarray(aliases, dtype="<i8"),
+            fingerprints=np.asarray(fingerprints, dtype="<u8"),
+        )
+    os.replace(tmp, SLOTS_PATH)
+
+
+def _load_slots(path: Path) -> tuple[np.ndarray, np.ndarray] | None:
+    if not path.exists():
+        return None
+    with np.load(path) as data:
+        return data["aliases"], data["fingerprints"]
+
+
 def build(
     root: Path,
     embed_config: EmbeddingConfig,
@@ -68,82 +246,392 @@ def build(
     weight_semantic: float = 0.7,
     weight_lexical: float = 0.3,
     remove_code: bool = False,
+    discovery: DiscoveryConfig | None = None,
+    use_git: bool = False,
+    search_dimensions: int | None = None,
+    dedupe_distance: int = DEFAULT_MAX_DISTANCE,
+    batch_submit: bool = False,
+    batch_poll: float = 60.0,
 ) -> None:
+    if search_dimensions is not None and search_dimensions <= 0:
+        raise SystemExit("--search-dims must be a positive number of dimensions.")
     _ensure_data_dir()
-    paths = iter_markdown_files(root, DEFAULT_EXCLUDE_DIRS)
-    all_chunks = _build_chunks(paths, remove_code, chunk_size, chunk_overlap)
+    if batch_submit and embed_config.provider.lower() != "openai":
+        raise SystemExit("--batch-submit requires EMBEDDING_PROVIDER=openai.")
+    git_state = _git_state(root) if use_git else {}
+    files = _discover(root, discovery)
+    digests: dict[str, str] = {}
+    all_chunks = _build_chunks([f.path for f in files], remove_code, chunk_size, chunk_overlap, digests)
 
     if not all_chunks:
         raise SystemExit("No chunks to index.")
 
-    vectors = embed_texts([c.text for c in all_chunks], embed_config)
-    if not vectors or not vectors[0]:
+    # Exact and near-duplicate chunks share one slot and its vector; every chunk
+    # keeps its own lexical row so terms unique to one copy stay searchable.
+    aliases, fingerprints = assign_texts([c.text for c in all_chunks], [], [], dedupe_distance)
+    slot_chunks = [all_chunks[pos] for pos in _first_members(aliases, len(fingerprints))]
+
+    failovers: list[Failover] = []
+    if batch_submit:
+        vectors = batch_embed.embed_batch(
+            [c.text for c in slot_chunks],
+            embed_config,
+            BATCH_DIR,
+            token_counts=[c.token_count for c in slot_chunks],
+            poll_interval=batch_poll,
+        )
+    else:
+        vectors = _embed(
+            [c.text for c in slot_chunks],
+            embed_config,
+            fit=True,
+            token_counts=[c.token_count for c in slot_chunks],
+            on_failover=failovers.append,
+        )
+    if vectors.ndim != 2 or not vectors.shape[0] or not vectors.shape[1]:
         raise SystemExit("Embedding provider returned no vectors.")
-    vindex = build_vector(vectors)
+    if search_dimensions and search_dimensions >= vectors.shape[1]:
+        search_dimensions = None
+    vindex = build_vector(vectors, prefix_dim=search_dimensions)
     save_vector(vindex, VEC_PATH)
     _save_vectors(vectors)
 
-    lex = build_lexical([c.text for c in all_chunks])
-    _save_json(LEX_PATH, {"texts": [c.text for c in all_chunks]})
+    lexical_store.write(LEX_PATH, [c.text for c in all_chunks])
+    _save_slots(aliases, fingerprints)
 
     meta = IndexMetadata(
         schema_version=SCHEMA_VERSION,
         created_at=datetime.now(timezone.utc).isoformat(),
-        embedding_model=embed_config.model,
-        embedding_dimensions=len(vectors[0]),
+        embedding_model=failovers[-1].model if failovers else embed_config.model,
+        embedding_dimensions=int(vectors.shape[1]),
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         cleaning_rules=f"{CLEANING_RULES}|remove_code={remove_code}",
-        vector_backend="faiss",
+        vector_backend=_vector_backend(search_dimensions),
         weight_semantic=weight_semantic,
         weight_lexical=weight_lexical,
     )
-    _save_json(META_PATH, meta.to_dict())
+    provider = failovers[-1].to_provider if failovers else embed_config.provider
+    failover = {"failover": asdict(failovers[-1])} if failovers else {}
+    _save_json(META_PATH, {**meta.to_dict(), "embedding_provider": provider, **failover})
 
     manifest_entries = []
     chunk_map: dict[str, list[int]] = {}
     for idx, c in enumerate(all_chunks):
         chunk_map.setdefault(str(c.path), []).append(idx)
-    for path in paths:
-        text = read_text_strict(path)
-        if text is None:
+    for f in files:
+        key = str(f.path)
+        if key not in digests:
             continue
-        digest = sha256_text(text)
         manifest_entries.append(
             ManifestEntry(
-                path=str(path),
-                sha256=digest,
-                mtime=path.stat().st_mtime,
-                chunk_indices=chunk_map.get(str(path), []),
+                path=key,
+                sha256=digests[key],
+                mtime=f.mtime,
+                chunk_indices=chunk_map.get(key, []),
+                size=f.size,
             )
         )
 
     manifest = {
         "chunks": [{**asdict(c), "path": str(c.path)} for c in all_chunks],
         **build_manifest(manifest_entries),
+        **git_state,
     }
     _save_json(MANIFEST_PATH, manifest)
+    chunk_store.save(manifest["chunks"], CHUNKS_PATH)
+    query_cache.clear(QUERY_CACHE_PATH)
+    if batch_submit:
+        shutil.rmtree(BATCH_DIR, ignore_errors=True)
 
 
-def _load_lexical() -> LexicalIndex:
-    data = _load_json(LEX_PATH)
-    texts = data["texts"]
-    return build_lexical(texts)
+def _save_vectors(vectors: np.ndarray) -> None:
+    arr = np.asarray(vectors, dtype="float32")
+    VECTORS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename so processes with the old file mapped keep a valid copy.
+    tmp = VECTORS_PATH.with_name(VECTORS_PATH.name + ".tmp")
+    with tmp.open("wb") as fh:
+        np.save(fh, arr)
+    os.replace(tmp, VECTORS_PATH)
 
 
-def _save_vectors(vectors: list[list[float]]) -> None:
-    import numpy as np
+def _load_vectors(mmap: bool = True) -> np.ndarray:
+    return np.load(VECTORS_PATH, mmap_mode="r" if mmap else None)
 
-    arr = np.array(vectors, dtype="float32")
-    VECTORS_PATH.parent.mkdir(parents=True, exist_ok=True)
-    np.save(VECTORS_PATH, arr)
+
+def migrate(dimensions: int) -> int:
+    # Re-dimension the index from its stored vectors instead of re-embedding.
+    # Returns the previous width.
+    meta = _load_json(META_PATH)
+    validate_signature(meta)
+    if not _truncatable(meta):
+        raise SystemExit(f"{meta['embedding_model']} vectors cannot be truncated. Rebuild to change dimensions.")
+    current = int(meta["embedding_dimensions"])
+    if not 0 < dimensions < current:
+        raise SystemExit(f"--dimensions must be between 1 and {current - 1} for this index.")
+    vectors = np.array(_load_vectors()[:, :dimensions], dtype="float32")
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    prefix_dim = _prefix_dim(meta)
+    if prefix_dim and prefix_dim >= dimensions:
+        prefix_dim = None
+    migrated = IndexMetadata(
+        schema_version=int(meta["schema_version"]),
+        created_at=str(meta.get("created_at", "")),
+        embedding_model=str(meta["embedding_model"]),
+        embedding_dimensions=dimensions,
+        chunk_size=int(meta["chunk_size"]),
+        chunk_overlap=int(meta["chunk_overlap"]),
+        cleaning_rules=str(meta["cleaning_rules"]),
+        vector_backend=_vector_backend(prefix_dim),
+        weight_semantic=float(meta["weight_semantic"]),
+        weight_lexical=float(meta["weight_lexical"]),
+    )
+    _save_vectors(vectors)
+    save_vector(build_vector(vectors, prefix_dim=prefix_dim), VEC_PATH)
+    _save_json(META_PATH, {**meta, **migrated.to_dict()})
+    query_cache.clear(QUERY_CACHE_PATH)
+    return current
 
 
-def _load_vectors() -> list[list[float]]:
-    import numpy as np
+def _resolve(path: Path, directory: Path | None) -> Path:
+    return path if directory is None else directory / path.name
 
-    arr = np.load(VECTORS_PATH)
-    return arr.tolist()
+
+def _find_chunk(store: chunk_store.ChunkStore | None, chunk_id: str, directory: Path | None) -> dict | None:
+    if store is not None:
+        pos = chunk_store.find(store, chunk_id)
+        return None if pos is None else chunk_store.get(store, pos)
+    manifest = _load_json(_resolve(MANIFEST_PATH, directory))
+    for chunk in manifest.get("chunks", []):
+        if chunk["sha256"] == chunk_id:
+            return chunk
+    return None
+
+
+def get_chunk(chunk_id: str, directory: Path | None = None) -> dict | None:
+    return _find_chunk(chunk_store.load(_resolve(CHUNKS_PATH, directory)), chunk_id, directory)
+
+
+def artifact_paths(directory: Path | None = None) -> list[Path]:
+    paths = [META_PATH, MANIFEST_PATH, VEC_PATH, VECTORS_PATH, LEX_PATH, CHUNKS_PATH, LOCAL_MODEL_PATH, SLOTS_PATH]
+    return [_resolve(p, directory) for p in paths]
+
+
+@dataclass(frozen=True)
+class Overlay:
+    # Files edited since the last update, chunked and embedded at query time.
+    # Overlay chunk j is position n_chunks + j, its lexical row, with its own slot n_slots + j.
+    n_chunks: int
+    n_slots: int
+    chunks: list[dict]
+    vectors: np.ndarray
+    # Indexed chunk positions of edited or deleted files, and the slots left with no other member.
+    stale: frozenset[int]
+    dead_slots: frozenset[int]
+
+
+@dataclass
+class LoadedIndex:
+    # Everything a query reads, opened once and read-only afterwards.
+    directory: Path | None
+    meta: dict
+    generation: str
+    vindex: VectorIndex
+    vectors: np.ndarray
+    lexical: LexicalIndex
+    chunks: chunk_store.ChunkStore | None
+    local_model: local_embed.LocalModel | None
+    # Slot of each chunk position and the positions grouped by slot; None when
+    # every chunk has its own slot.
+    slot_aliases: np.ndarray | None = None
+    slot_order: np.ndarray | None = None
+    slot_bounds: np.ndarray | None = None
+    # Set when serving straight from a packed bundle instead of a directory.
+    bundle_header: bundle.BundleHeader | None = None
+    bundle_path: Path | None = None
+    overlay: Overlay | None = None
+
+    @property
+    def n_slots(self) -> int:
+        return self.vindex.index.ntotal + (len(self.overlay.chunks) if self.overlay is not None else 0)
+
+    def slot(self, pos: int) -> int:
+        overlay = self.overlay
+        if overlay is not None and pos >= overlay.n_chunks:
+            return overlay.n_slots + pos - overlay.n_chunks
+        return pos if self.slot_aliases is None else int(self.slot_aliases[pos])
+
+    def members(self, slot: int) -> list[int]:
+        overlay = self.overlay
+        if overlay is not None and slot >= overlay.n_slots:
+            return [overlay.n_chunks + slot - overlay.n_slots]
+        if self.slot_order is None or self.slot_bounds is None:
+            members = [slot]
+        else:
+            members = self.slot_order[self.slot_bounds[slot] : self.slot_bounds[slot + 1]].tolist()
+        if overlay is not None:
+            members = [pos for pos in members if pos not in overlay.stale]
+        return members
+
+    def slot_vectors(self, slots: list[int]) -> np.ndarray:
+        overlay = self.overlay
+        if overlay is None:
+            return self.vectors[np.asarray(slots)]
+        return np.stack(
+            [overlay.vectors[s - overlay.n_slots] if s >= overlay.n_slots else self.vectors[s] for s in slots]
+        )
+
+    def file_ids(self, positions: list[int]) -> list:
+        # Overlay chunks have no file id in the sidecar, so compare paths throughout.
+        if self.overlay is None and self.chunks is not None and self.chunks.files is not None:
+            return self.chunks.files[positions].tolist()
+        return [c["path"] for c in self.get_chunks(positions)]
+
+    def get_chunks(self, positions: list[int]) -> list[dict]:
+        overlay = self.overlay
+        if overlay is not None:
+            base = overlay.n_chunks
+            indexed = [pos for pos in positions if pos < base]
+            found = dict(zip(indexed, self._indexed_chunks(indexed)))
+            return [dict(overlay.chunks[pos - base]) if pos >= base else found[pos] for pos in positions]
+        return self._indexed_chunks(positions)
+
+    def _indexed_chunks(self, positions: list[int]) -> list[dict]:
+        if self.chunks is not None:
+            return chunk_store.get_many(self.chunks, positions)
+        # Indexes built before the chunk store existed only have the manifest.
+        manifest = _load_json(_resolve(MANIFEST_PATH, self.directory))
+        return [manifest["chunks"][idx] for idx in positions]
+
+    def get_chunk(self, chunk_id: str) -> dict | None:
+        return _find_chunk(self.chunks, chunk_id, self.directory)
+
+
+def _slot_groups(slots: tuple[np.ndarray, np.ndarray] | None) -> dict[str, np.ndarray | None]:
+    if slots is None:
+        return {}
+    aliases, fingerprints = slots
+    order = np.argsort(aliases, kind="stable")
+    return {
+        "slot_aliases": aliases,
+        "slot_order": order,
+        "slot_bounds": np.searchsorted(aliases[order], np.arange(len(fingerprints) + 1)),
+    }
+
+
+def load_index(directory: Path | None = None, meta: dict | None = None) -> LoadedIndex:
+    if meta is None:
+        meta = _load_json(_resolve(META_PATH, directory))
+        validate_signature(meta)
+    model_path = _resolve(LOCAL_MODEL_PATH, directory)
+    return LoadedIndex(
+        directory=directory,
+        meta=meta,
+        generation=query_cache.index_generation(artifact_paths(directory), meta["index_signature"]),
+        vindex=load_vector(_resolve(VEC_PATH, directory)),
+        vectors=np.load(_resolve(VECTORS_PATH, directory), mmap_mode="r"),
+        lexical=lexical_store.load(_resolve(LEX_PATH, directory)),
+        chunks=chunk_store.load(_resolve(CHUNKS_PATH, directory)),
+        local_model=local_embed.load(model_path) if model_path.exists() else None,
+        **_slot_groups(_load_slots(_resolve(SLOTS_PATH, directory))),
+    )
+
+
+def _bundle_files(directory: Path | None = None) -> dict[str, Path]:
+    offsets_path, ids_path = chunk_store.sidecars(CHUNKS_PATH)
+    required = [META_PATH, MANIFEST_PATH, VEC_PATH, VECTORS_PATH, LEX_PATH, CHUNKS_PATH, offsets_path, ids_path]
+    optional = [SLOTS_PATH, LOCAL_MODEL_PATH, chunk_store.files_path(CHUNKS_PATH)]
+    files = {p.name: _resolve(p, directory) for p in required}
+    missing = [name for name, path in files.items() if not path.exists()]
+    if missing:
+        raise SystemExit(f"Index is incomplete, missing {missing}. Rebuild before exporting.")
+    files.update({p.name: _resolve(p, directory) for p in optional if _resolve(p, directory).exists()})
+    files.update({p.name: p for p in lexical_store.files(files[LEX_PATH.name])})
+    return files
+
+
+def export_bundle(out: Path, directory: Path | None = None) -> bundle.BundleHeader:
+    meta = _load_json(_resolve(META_PATH, directory))
+    validate_signature(meta)
+    return bundle.write(_bundle_files(directory), meta, out)
+
+
+def import_bundle(path: Path, directory: Path | None = None) -> list[Path]:
+    header = bundle.read_header(path)
+    validate_signature(header.meta)
+    bad = bundle.verify(path, header)
+    if bad:
+        raise SystemExit(f"Bundle checksum mismatch in {bad}.")
+    target = DATA_DIR if directory is None else directory
+    target.mkdir(parents=True, exist_ok=True)
+    # Unpack beside the target first so a truncated bundle leaves the old index intact.
+    staging = Path(tempfile.mkdtemp(prefix=".import-", dir=target))
+    try:
+        staged = bundle.extract(path, staging, header)
+        # Optional artifacts the bundle lacks (slot groups, file ids, a local
+        # model) and old lexical segments would otherwise pair with the new index.
+        records = _resolve(CHUNKS_PATH, directory)
+        lex = _resolve(LEX_PATH, directory)
+        stale = {
+            *artifact_paths(directory),
+            *chunk_store.sidecars(records),
+            chunk_store.files_path(records),
+            *target.glob(f"{lex.stem}.*.np[yz]"),
+        }
+        for old in stale:
+            if old.name not in header.sections:
+                old.unlink(missing_ok=True)
+        written = []
+        for part in staged:
+            os.replace(part, target / part.name)
+            written.append(target / part.name)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    query_cache.clear(_resolve(QUERY_CACHE_PATH, directory))
+    return written
+
+
+def load_bundle(path: Path, verify: bool = False) -> LoadedIndex:
+    # Serve from the bundle in place: arrays are memory-mapped at their section
+    # offsets, and the signature is checked from the header alone.
+    header = bundle.read_header(path)
+    meta = header.meta
+    validate_signature(meta)
+    if verify and bundle.verify(path, header):
+        raise SystemExit("Bundle checksum mismatch.")
+    sections = header.sections
+    offsets_path, ids_path = chunk_store.sidecars(CHUNKS_PATH)
+    files_section = sections.get(chunk_store.files_path(CHUNKS_PATH).name)
+
+    def _raw(p: Path | str) -> bytes | None:
+        section = sections.get(p if isinstance(p, str) else p.name)
+        return None if section is None else bundle.read_bytes(path, section)
+
+    slots_raw = _raw(SLOTS_PATH)
+    slots = None
+    if slots_raw is not None:
+        with np.load(io.BytesIO(slots_raw)) as data:
+            slots = data["aliases"], data["fingerprints"]
+    model_raw = _raw(LOCAL_MODEL_PATH)
+    return LoadedIndex(
+        directory=None,
+        meta=meta,
+        generation=query_cache.index_generation([path], meta["index_signature"]),
+        vindex=load_vector_bytes(_raw(VEC_PATH)),
+        vectors=bundle.load_npy(path, sections[VECTORS_PATH.name]),
+        lexical=lexical_store.load_from(json.loads(_raw(LEX_PATH)), _raw),
+        chunks=chunk_store.ChunkStore(
+            records_path=path,
+            offsets=bundle.load_npy(path, sections[offsets_path.name]),
+            ids=bundle.load_npy(path, sections[ids_path.name]),
+            base=sections[CHUNKS_PATH.name].offset,
+            files=bundle.load_npy(path, files_section) if files_section is not None else None,
+        ),
+        local_model=local_embed.load(io.BytesIO(model_raw)) if model_raw is not None else None,
+        **_slot_groups(slots),
+        bundle_header=header,
+        bundle_path=path,
+    )
 
 
 def query(
@@ -155,30 +643,372 @@ def query(
     rerank_model: str | None = None,
     rerank_top_n: int = 30,
     dedupe_by_path: bool = True,
+    use_cache: bool = True,
+    collapse_duplicates: bool = False,
+    ranking: RankingConfig | None = None,
+    mode: str = "hybrid",
+    deadline_ms: float | None = None,
+    details: dict | None = None,
+    fresh: bool = False,
 ) -> list[tuple[dict, float]]:
+    started = time.perf_counter()
+    ranking = ranking or RankingConfig()
+    if mode not in QUERY_MODES:
+        raise ValueError(f"Unknown query mode: {mode}")
     meta = _load_json(META_PATH)
     validate_signature(meta)
+    embed_config = index_config(meta, embed_config)
 
-    vindex = load_vector(VEC_PATH)
-    query_vec = embed_texts([query_text], embed_config)[0]
-    sem_hits = search(vindex, query_vec, top_k=top_k * 5)
-    sem_scores = {idx: score for idx, score in sem_hits if idx >= 0}
+    key = generation = None
+    # Fresh results depend on the working tree, which the cache key does not see.
+    if use_cache and not fresh:
+        generation = query_cache.index_generation(artifact_paths(), meta["index_signature"])
+        params = {
+            "top_k": top_k,
+            "weight_semantic": weight_semantic,
+            "weight_lexical": weight_lexical,
+            "rerank_model": rerank_model,
+            "rerank_top_n": rerank_top_n,
+            "dedupe_by_path": dedupe_by_path,
+            "collapse_duplicates": collapse_duplicates,
+            "mode": mode,
+            **asdict(ranking),
+            "provider": embed_config.provider,
+            "model": embed_config.model,
+            "dimensions": embed_config.dimensions,
+            "ollama_model": embed_config.ollama_model,
+        }
+        key = query_cache.cache_key(query_text, params, generation)
+        cached = query_cache.lookup(QUERY_CACHE_PATH, key, generation)
+        if cached is not None:
+            if details is not None:
+                details["tier"] = "cached"
+            return cached
 
-    lex_index = _load_lexical()
-    lex_hits = search_lexical(lex_index, query_text, top_k=top_k * 5)
-    lex_scores = {idx: score for idx, score in lex_hits}
+    # The embedding request is in flight while artifacts load and BM25 ranks.
+    # Auto mode waits, since a decisive BM25 hit makes the request unnecessary.
+    job = None if mode in ("lexical", "auto") else _EmbedJob([query_text], embed_config, started=started)
+    loaded = load_index(meta=meta)
+    if fresh:
+        loaded = with_fresh_overlay(loaded, embed_config)
+    plan = plan_queries(loaded, [query_text], mode, embed_config, deadline_ms, job, started=started)[0]
+    results = search_plan(
+        loaded,
+        query_text,
+        plan,
+        top_k=top_k,
+        weight_semantic=weight_semantic,
+        weight_lexical=weight_lexical,
+        rerank_model=rerank_model,
+        rerank_top_n=rerank_top_n,
+        dedupe_by_path=dedupe_by_path,
+        collapse_duplicates=collapse_duplicates,
+        ranking=ranking,
+    )
+    if details is not None:
+        details["tier"] = plan.describe()
+    # A deadline miss depends on provider latency, so its fallback is not cached.
+    if key is not None and plan.reason != "deadline":
+        query_cache.store(QUERY_CACHE_PATH, key, generation, results)
+    return results
 
-    fused = fuse_scores(sem_scores, lex_scores, weight_semantic, weight_lexical)
-    manifest = _load_json(MANIFEST_PATH)
 
-    results = []
-    for idx, score in fused[: max(top_k, rerank_top_n)]:
-        chunk = manifest["chunks"][idx]
-        results.append((chunk, score))
+def _dirty_entries(entries: list[dict]) -> tuple[list[dict], list[dict]]:
+    # (edited, deleted) manifest entries. A stat mismatch alone may be a touch,
+    # so edited files are confirmed by content hash.
+    edited: list[dict] = []
+    deleted: list[dict] = []
+    for entry in entries:
+        path = Path(entry["path"])
+        try:
+            st = path.stat()
+        except OSError:
+            deleted.append(entry)
+            continue
+        if st.st_mtime == entry["mtime"] and st.st_size == entry.get("size", -1):
+            continue
+        text = read_text_strict(path)
+        if text is None:
+            deleted.append(entry)
+        elif sha256_text(text) != entry["sha256"]:
+            edited.append(entry)
+    return edited, deleted
+
+
+def with_fresh_overlay(loaded: LoadedIndex, embed_config: EmbeddingConfig) -> LoadedIndex:
+    # A copy of `loaded` that masks chunks of files changed since the last update
+    # and searches their current contents from an in-memory overlay.
+    manifest = _load_json(_resolve(MANIFEST_PATH, loaded.directory))
+    edited, deleted = _dirty_entries(manifest.get("entries", []))
+    if not edited and not deleted:
+        return loaded
+    meta = loaded.meta
+    remove_code = str(meta["cleaning_rules"]).endswith("remove_code=True")
+    chunks = _build_chunks(
+        [Path(e["path"]) for e in edited],
+        remove_code,
+        int(meta["chunk_size"]),
+        int(meta["chunk_overlap"]),
+    )
+    n_chunks = len(manifest.get("chunks", []))
+    n_slots = loaded.vindex.index.ntotal
+    if chunks:
+        vectors = _embed(
+            [c.text for c in chunks],
+            embed_config,
+            token_counts=[c.token_count for c in chunks],
+            local_model=loaded.local_model,
+        )
+    else:
+        vectors = np.empty((0, loaded.vectors.shape[1]), dtype="float32")
+
+    stale = frozenset(pos for e in edited + deleted for pos in e["chunk_indices"])
+    dead = {loaded.slot(pos) for pos in stale}
+    dead = {slot for slot in dead if all(pos in stale for pos in loaded.members(slot))}
+    overlay = Overlay(
+        n_chunks=n_chunks,
+        n_slots=n_slots,
+        chunks=[{**asdict(c), "path": str(c.path)} for c in chunks],
+        vectors=vectors,
+        stale=stale,
+        dead_slots=frozenset(dead),
+    )
+    return replace(
+        loaded,
+        lexical=with_overlay(loaded.lexical, stale, [c.text for c in chunks], n_chunks),
+        overlay=overlay,
+    )
+
+
+class _EmbedJob:
+    # A query embedding running on a daemon thread, so an abandoned request
+    # holds up neither the query nor interpreter exit.
+    def __init__(
+        self,
+        texts: list[str],
+        embed_config: EmbeddingConfig,
+        local_model: local_embed.LocalModel | None = None,
+        started: float | None = None,
+    ) -> None:
+        self._done = threading.Event()
+        self._vectors: np.ndarray | None = None
+        self._error: BaseException | None = None
+        # `started` is the request's perf_counter() start, when it began earlier.
+        self._started = time.perf_counter() if started is None else started
+        threading.Thread(target=self._run, args=(texts, embed_config, local_model), daemon=True).start()
+
+    def _run(self, texts: list[str], embed_config: EmbeddingConfig, local_model) -> None:
+        try:
+            self._vectors = _embed(texts, embed_config, local_model=local_model)
+        except BaseException as exc:
+            self._error = exc
+        finally:
+            self._done.set()
+
+    def result(self, deadline_ms: float | None = None) -> np.ndarray | None:
+        # None when the deadline, counted from the start of the request, passes first.
+        timeout = None
+        if deadline_ms is not None:
+            timeout = max(deadline_ms / 1000.0 - (time.perf_counter() - self._started), 0.0)
+        if not self._done.wait(timeout):
+            return None
+        if self._error is not None:
+            raise self._error
+        return self._vectors
+
+
+def _rank_lexical(loaded: LoadedIndex, query_text: str) -> tuple[list[tuple[int, float]], set[int]]:
+    constraints = parse_query(query_text)
+    lex_index = loaded.lexical
+    # BM25 scores every document regardless of depth, so rank them once.
+    ranked = search_lexical(lex_index, query_text, top_k=lex_index.stats.n_docs)
+    boosted = match_constraints(lex_index, constraints) if constraints else set()
+    return ranked, boosted
+
+
+def _decisive(ranked: list[tuple[int, float]]) -> bool:
+    if not ranked or ranked[0][1] <= 0:
+        return False
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    return ranked[0][1] >= DECISIVE_RATIO * runner_up
+
+
+def plan_queries(
+    loaded: LoadedIndex,
+    queries: list[str],
+    mode: str,
+    embed_config: EmbeddingConfig,
+    deadline_ms: float | None = None,
+    job: _EmbedJob | None = None,
+    started: float | None = None,
+) -> list[QueryPlan]:
+    # Pick each query's tier and fetch the embeddings it needs in one call. Outside
+    # auto mode the call (`job` when the caller already started it) overlaps BM25.
+    # `deadline_ms` counts from `started`, the caller's perf_counter() at the
+    # start of the request, so loading and BM25 spend the same budget.
+    if mode not in QUERY_MODES:
+        raise ValueError(f"Unknown query mode: {mode}")
+    if mode == "lexical":
+        return [QueryPlan("lexical") for _ in queries]
+    if mode == "auto":
+        lexical = [_rank_lexical(loaded, q) for q in queries]
+        pending = [i for i in range(len(queries)) if not _decisive(lexical[i][0])]
+        if pending:
+            job = _EmbedJob([queries[i] for i in pending], embed_config, loaded.local_model, started)
+    else:
+        pending = list(range(len(queries)))
+        job = job or _EmbedJob(list(queries), embed_config, loaded.local_model, started)
+        lexical = [None if mode == "semantic" else _rank_lexical(loaded, q) for q in queries]
+    plans = [QueryPlan("lexical", "decisive", lexical=lex) for lex in lexical]
+    if job is None:
+        return plans
+    vectors = job.result(deadline_ms)
+    tier = "semantic" if mode == "semantic" else "hybrid"
+    for n, i in enumerate(pending):
+        if vectors is None:
+            plans[i] = QueryPlan("lexical", "deadline", lexical=lexical[i])
+        else:
+            plans[i] = QueryPlan(tier, vector=vectors[n], lexical=lexical[i])
+    return plans
+
+
+def _lap(timings: dict[str, float] | None, stage: str, start: float) -> float:
+    now = time.perf_counter()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + now - start
+    return now
+
+
+def _semantic_scores(
+    loaded: LoadedIndex,
+    query_vec: np.ndarray,
+    n_candidates: int,
+    oversample: int,
+) -> dict[int, float]:
+    vindex = loaded.vindex
+    overlay = loaded.overlay
+    dead = overlay.dead_slots if overlay is not None else frozenset()
+    fetch = n_candidates + len(dead)
+    if vindex.dim < int(loaded.meta["embedding_dimensions"]):
+        # Two-stage search: cheap prefix candidates, exact full-dimension re-score.
+        candidates = search(vindex, query_vec, top_k=fetch * oversample)
+        hits = rescore(loaded.vectors, query_vec, [idx for idx, _ in candidates])[:fetch]
+    else:
+        hits = search(vindex, query_vec, top_k=fetch)
+    scores = {idx: score for idx, score in hits if idx >= 0 and idx not in dead}
+    if overlay is None:
+        return scores
+    if len(overlay.vectors):
+        # Overlay vectors are few, so score them exactly against the query.
+        rows = overlay.vectors / np.maximum(np.linalg.norm(overlay.vectors, axis=1, keepdims=True), 1e-12)
+        vec = np.asarray(query_vec, dtype="float32")
+        sims = rows @ (vec / max(float(np.linalg.norm(vec)), 1e-12))
+        scores.update({overlay.n_slots + j: float(s) for j, s in enumerate(sims)})
+    return dict(sorted(scores.items(), key=lambda x: x[1], reverse=True)[:n_candidates])
+
+
+def _pick(
+    loaded: LoadedIndex,
+    fused: list[tuple[int, float]],
+    limit: int,
+    dedupe_by_path: bool,
+    collapse_duplicates: bool,
+) -> list[tuple[int, float, int]]:
+    # Walk fused chunks in score order until `limit` are chosen; with path
+    # dedupe, one chunk per file, and with collapsing, one chunk per slot.
+    picked: list[tuple[int, float, int]] = []
+    seen: set = set()
+    seen_slots: set[int] = set()
+    for pos, score in fused:
+        slot = loaded.slot(pos)
+        if collapse_duplicates:
+            if slot in seen_slots:
+                continue
+            seen_slots.add(slot)
+        if dedupe_by_path:
+            file_id = loaded.file_ids([pos])[0]
+            if file_id in seen:
+                continue
+            seen.add(file_id)
+        picked.append((pos, score, slot))
+        if len(picked) >= limit:
+            break
+    return picked
+
+
+def _search(
+    loaded: LoadedIndex,
+    query_text: str,
+    query_vec: np.ndarray | None,
+    top_k: int,
+    weight_semantic: float,
+    weight_lexical: float,
+    rerank_model: str | None,
+    rerank_top_n: int,
+    dedupe_by_path: bool,
+    collapse_duplicates: bool = False,
+    ranking: RankingConfig = RankingConfig(),
+    timings: dict[str, float] | None = None,
+    tier: str = "hybrid",
+    lexical: tuple[list[tuple[int, float]], set[int]] | None = None,
+) -> list[tuple[dict, float]]:
+    # Vector rows are slots, expanded to their chunks; lexical rows are chunks.
+    fuse = FUSION_MODES.get(ranking.fusion)
+    if fuse is None:
+        raise ValueError(f"Unknown fusion mode: {ranking.fusion}")
+    if tier == "lexical":
+        weight_semantic, weight_lexical = 0.0, 1.0
+    elif tier == "semantic":
+        weight_semantic, weight_lexical = 1.0, 0.0
+    # Candidate depth starts at top_k * multiplier and doubles only while path
+    # dedupe still has fewer than top_k distinct files and unseen candidates remain.
+    n_candidates = max(top_k * ranking.candidate_multiplier, 1)
+    use_mmr = ranking.mmr_lambda is not None
+    limit = max(top_k, rerank_top_n) if rerank_model or use_mmr else top_k
+    start = time.perf_counter()
+    if tier == "semantic":
+        lex_ranked, boosted = [], set()
+    else:
+        lex_ranked, boosted = lexical if lexical is not None else _rank_lexical(loaded, query_text)
+    n_ranked = max(loaded.n_slots, len(lex_ranked))
+    start = _lap(timings, "lexical", start)
+    while True:
+        sem_scores: dict[int, float] = {}
+        if tier != "lexical" and query_vec is not None:
+            slot_scores = _semantic_scores(loaded, query_vec, n_candidates, ranking.prefix_oversample)
+            sem_scores = {pos: score for slot, score in slot_scores.items() for pos in loaded.members(slot)}
+        start = _lap(timings, "semantic", start)
+
+        lex_scores = dict(lex_ranked[:n_candidates])
+        fused = fuse(sem_scores, lex_scores, weight_semantic, weight_lexical)
+        if boosted:
+            fused = boost_scores(fused, boosted, CONSTRAINT_BOOST)
+        picked = _pick(loaded, fused, limit, dedupe_by_path, collapse_duplicates)
+        start = _lap(timings, "fuse", start)
+        if len(picked) >= limit or n_candidates >= n_ranked:
+            break
+        n_candidates *= 2
+
+    chunks = loaded.get_chunks([pos for pos, _, _ in picked])
+    results = [(chunk, score) for chunk, (_, score, _) in zip(chunks, picked)]
+    if collapse_duplicates:
+        for (chunk, _), (pos, _, slot) in zip(results, picked):
+            others = [m for m in loaded.members(slot) if m != pos]
+            if others:
+                chunk["duplicates"] = [c["path"] for c in loaded.get_chunks(others)]
+    start = _lap(timings, "hydrate", start)
+
+    llm_pool = rerank_top_n
+    if use_mmr and results:
+        # One similarity matrix over the stored vectors of the pool's slots.
+        rows = loaded.slot_vectors([slot for _, _, slot in picked])
+        results = [results[i] for i in mmr([s for _, s in results], rows, ranking.mmr_lambda)]
+        llm_pool = min(rerank_top_n, MMR_LLM_FACTOR * top_k)
+        start = _lap(timings, "mmr", start)
 
     if rerank_model:
-        rerank_cfg = RerankConfig(model=rerank_model, top_n=rerank_top_n)
-        reranked = rerank(query_text, [c for c, _ in results[:rerank_top_n]], rerank_cfg)
+        rerank_cfg = RerankConfig(model=rerank_model, top_n=llm_pool)
+        reranked = rerank(query_text, [c for c, _ in results[:llm_pool]], rerank_cfg)
         reranked_ids = {c["sha256"] for c in reranked[:top_k]}
         reranked_set = [(c, s) for (c, s) in results if c["sha256"] in reranked_ids]
         if len(reranked_set) < top_k:
@@ -189,21 +1019,146 @@ def query(
                 if len(reranked_set) >= top_k:
                     break
         results = reranked_set
+        _lap(timings, "rerank", start)
+
+    # _pick already kept one chunk per file when dedupe_by_path is set.
+    return results[:top_k]
 
-    if not dedupe_by_path:
-        return results[:top_k]
 
-    seen = set()
-    deduped = []
-    for chunk, score in results:
-        path = chunk.get("path")
-        if path in seen:
+def search_plan(
+    loaded: LoadedIndex,
+    query_text: str,
+    plan: QueryPlan,
+    *,
+    top_k: int = 10,
+    weight_semantic: float | None = None,
+    weight_lexical: float | None = None,
+    rerank_model: str | None = None,
+    rerank_top_n: int = 30,
+    dedupe_by_path: bool = True,
+    collapse_duplicates: bool = False,
+    ranking: RankingConfig | None = None,
+    timings: dict[str, float] | None = None,
+) -> list[tuple[dict, float]]:
+    # Rank one planned query against a loaded index; unset weights come from its metadata.
+    return _search(
+        loaded,
+        query_text,
+        plan.vector,
+        top_k,
+        float(loaded.meta["weight_semantic"]) if weight_semantic is None else weight_semantic,
+        float(loaded.meta["weight_lexical"]) if weight_lexical is None else weight_lexical,
+        rerank_model,
+        rerank_top_n,
+        dedupe_by_path,
+        collapse_duplicates,
+        ranking or RankingConfig(),
+        timings=timings,
+        tier=plan.tier,
+        lexical=plan.lexical,
+    )
+
+
+def embed_queries(loaded: LoadedIndex, queries: list[str], embed_config: EmbeddingConfig) -> np.ndarray:
+    # Query vectors as the index would embed them, local model included.
+    return _embed(queries, index_config(loaded.meta, embed_config), local_model=loaded.local_model)
+
+
+def _scan_changes(root: Path, entries: dict[str, dict], discovery: DiscoveryConfig | None) -> ChangeSet:
+    current_files = _discover(root, discovery)
+    current_set = {str(f.path) for f in current_files}
+    changed: list[Path] = []
+    files: dict[str, tuple[str, float, int]] = {}
+
+    for f in current_files:
+        key = str(f.path)
+        prev = entries.get(key)
+        # Stat results from discovery let unchanged files skip the read and hash.
+        if prev and prev["mtime"] == f.mtime and prev.get("size", -1) == f.size:
+            files[key] = (prev["sha256"], f.mtime, f.size)
             continue
-        seen.add(path)
-        deduped.append((chunk, score))
-        if len(deduped) >= top_k:
-            break
-    return deduped
+        text = read_text_strict(f.path)
+        if text is None:
+            continue
+        sha = sha256_text(text)
+        files[key] = (sha, f.mtime, f.size)
+        if not prev or prev["sha256"] != sha or prev["mtime"] != f.mtime:
+            changed.append(f.path)
+
+    return ChangeSet(changed=changed, removed=set(entries) - current_set, renamed={}, files=files)
+
+
+def _git_changes(
+    root: Path,
+    entries: dict[str, dict],
+    manifest: dict,
+    discovery: DiscoveryConfig | None,
+) -> ChangeSet | None:
+    commit = manifest.get("git_commit")
+    if not commit:
+        return None
+    diff = diff_since(root, commit)
+    if diff is None:
+        return None
+    excludes = discovery.exclude_dirs if discovery else frozenset(DEFAULT_EXCLUDE_DIRS)
+
+    def _excluded(path: Path) -> bool:
+        try:
+            parts = path.relative_to(root).parts[:-1]
+        except ValueError:
+            return False
+        return any(part in excludes for part in parts)
+
+    files = {key: (e["sha256"], e["mtime"], e.get("size", -1)) for key, e in entries.items()}
+    removed: set[str] = set()
+    renamed: dict[str, str] = {}
+    # Files that were dirty when the index was written may have been reverted since.
+    candidates = set(diff.changed) | {Path(p) for p in manifest.get("git_dirty", [])}
+
+    for path in diff.deleted:
+        if files.pop(str(path), None) is not None:
+            removed.add(str(path))
+
+    for old, new in diff.renamed.items():
+        prev = entries.get(str(old))
+        if prev is None or str(new) in entries:
+            candidates.update({old, new})
+            continue
+        files.pop(str(old), None)
+        text = None if _excluded(new) else read_text_strict(new)
+        if text is not None and sha256_text(text) == prev["sha256"]:
+            st = new.stat()
+            renamed[str(old)] = str(new)
+            files[str(new)] = (prev["sha256"], st.st_mtime, st.st_size)
+        else:
+            removed.add(str(old))
+            candidates.add(new)
+
+    changed: list[Path] = []
+    for path in sorted(candidates):
+        key = str(path)
+        if _excluded(path) or not path.exists():
+            if files.pop(key, None) is not None:
+                removed.add(key)
+            continue
+        text = read_text_strict(path)
+        if text is None:
+            continue
+        sha = sha256_text(text)
+        st = path.stat()
+        files[key] = (sha, st.st_mtime, st.st_size)
+        prev = entries.get(key)
+        if not prev or prev["sha256"] != sha:
+            changed.append(path)
+
+    return ChangeSet(changed=changed, removed=removed - set(files), renamed=renamed, files=files)
+
+
+def _git_state(root: Path) -> dict:
+    commit = head_commit(root)
+    if not commit:
+        return {}
+    return {"git_commit": commit, "git_dirty": dirty_paths(root)}
 
 
 def update(
@@ -214,98 +1169,138 @@ def update(
     weight_semantic: float = 0.7,
     weight_lexical: float = 0.3,
     remove_code: bool = False,
+    discovery: DiscoveryConfig | None = None,
+    use_git: bool = False,
+    dedupe_distance: int = DEFAULT_MAX_DISTANCE,
 ) -> None:
     _ensure_data_dir()
+    prefix_dim = None
+    meta: dict = {}
     if META_PATH.exists():
         meta = _load_json(META_PATH)
         validate_signature(meta)
+        prefix_dim = _prefix_dim(meta)
         expected_rules = f"{CLEANING_RULES}|remove_code={remove_code}"
         if str(meta.get("cleaning_rules")) != expected_rules:
             raise SystemExit("Index config mismatch. Rebuild required.")
-    current_paths = iter_markdown_files(root, DEFAULT_EXCLUDE_DIRS)
     manifest = load_manifest(MANIFEST_PATH)
     entries = {e["path"]: e for e in manifest.get("entries", [])}
 
-    current_set = {str(p) for p in current_paths}
-    previous_set = set(entries.keys())
-
-    changed_paths: list[Path] = []
-    removed_paths = previous_set - current_set
-
-    for path in current_paths:
-        text = read_text_strict(path)
-        if text is None:
-            continue
-        sha = sha256_text(text)
-        mtime = path.stat().st_mtime
-        prev = entries.get(str(path))
-        if not prev or prev["sha256"] != sha or prev["mtime"] != mtime:
-            changed_paths.append(path)
-
     if not entries:
-        build(root, embed_config, chunk_size, chunk_overlap, weight_semantic, weight_lexical, remove_code)
+        build(
+            root,
+            embed_config,
+            chunk_size,
+            chunk_overlap,
+            weight_semantic,
+            weight_lexical,
+            remove_code,
+            discovery,
+            use_git,
+            dedupe_distance=dedupe_distance,
+        )
         return
+    embed_config = index_config(meta, embed_config)
+
+    changes = _git_changes(root, entries, manifest, discovery) if use_git else None
+    if changes is None:
+        changes = _scan_changes(root, entries, discovery)
+    git_state = _git_state(root) if use_git else {}
 
-    if not changed_paths and not removed_paths:
+    if changes.is_empty():
+        if git_state and git_state.get("git_commit") != manifest.get("git_commit"):
+            _save_json(MANIFEST_PATH, {**manifest, **git_state})
         return
 
     # Load existing artifacts
-    manifest = _load_json(MANIFEST_PATH)
     existing_chunks: list[dict] = manifest.get("chunks", [])
     existing_vectors = _load_vectors()
-    existing_texts = _load_json(LEX_PATH).get("texts", [])
+    slots = _load_slots(SLOTS_PATH)
+    if slots is None:
+        # Indexes built before slots existed have one slot per chunk.
+        slots = np.arange(len(existing_chunks)), np.array([simhash(c["text"]) for c in existing_chunks], dtype="<u8")
+    existing_aliases, existing_prints = slots
 
-    # Filter out removed or changed paths
-    remove_set = {str(p) for p in changed_paths} | set(removed_paths)
+    # Filter out removed or changed paths; renamed files keep their vectors
+    remove_set = {str(p) for p in changes.changed} | changes.removed
     kept_chunks = []
-    kept_vectors = []
-    kept_texts = []
+    kept_slots = []
+    # Lexical rows follow chunk positions: kept chunks are renumbered in order.
+    renumber_rows = np.full(len(existing_chunks), -1, dtype=np.int64)
     for idx, chunk in enumerate(existing_chunks):
         if chunk["path"] in remove_set:
             continue
+        renumber_rows[idx] = len(kept_chunks)
+        kept_slots.append(int(existing_aliases[idx]))
+        new_path = changes.renamed.get(chunk["path"])
+        if new_path is not None:
+            chunk = {
+                **chunk,
+                "path": new_path,
+                "sha256": chunk_id(new_path, chunk["chunk_index"], chunk["text"]),
+            }
         kept_chunks.append(chunk)
-        kept_vectors.append(existing_vectors[idx])
-        kept_texts.append(existing_texts[idx])
 
-    # Rebuild chunks for changed paths
-    new_chunks = _build_chunks(changed_paths, remove_code, chunk_size, chunk_overlap)
-    if new_chunks:
-        new_vectors = embed_texts([c.text for c in new_chunks], embed_config)
+    # Slots still referenced by a kept chunk survive, renumbered in order
+    live = np.unique(np.asarray(kept_slots, dtype=np.int64))
+    keep = np.zeros(len(existing_prints), dtype=bool)
+    keep[live] = True
+    renumber = np.full(len(existing_prints), -1, dtype=np.int64)
+    renumber[live] = np.arange(len(live))
+    aliases = renumber[np.asarray(kept_slots, dtype=np.int64)].tolist()
+    fingerprints = existing_prints[live].tolist()
+    slot_texts = [kept_chunks[pos]["text"] for pos in _first_members(aliases, len(fingerprints))]
+
+    # Rebuild chunks for changed paths; duplicates of existing slots reuse their vectors
+    new_chunks = _build_chunks(changes.changed, remove_code, chunk_size, chunk_overlap)
+    new_aliases, new_prints = assign_texts([c.text for c in new_chunks], fingerprints, slot_texts, dedupe_distance)
+    slot_chunks = [new_chunks[pos] for pos in _first_members(new_aliases, len(new_prints), len(fingerprints))]
+    dim = existing_vectors.shape[1]
+    if slot_chunks:
+        new_vectors = _embed(
+            [c.text for c in slot_chunks],
+            embed_config,
+            token_counts=[c.token_count for c in slot_chunks],
+        )
     else:
-        new_vectors = []
+        new_vectors = np.empty((0, dim), dtype="float32")
 
-    # Append new chunks and vectors
+    # Append new chunks, slots and vectors
     for c in new_chunks:
         kept_chunks.append({**asdict(c), "path": str(c.path)})
-        kept_texts.append(c.text)
-    kept_vectors.extend(new_vectors)
+    aliases.extend(new_aliases)
+    fingerprints.extend(new_prints)
+    all_vectors = np.concatenate([existing_vectors[keep], new_vectors.reshape(-1, dim)])
+    del existing_vectors
 
     # Persist updated artifacts
-    _save_vectors(kept_vectors)
-    vindex = build_vector(kept_vectors)
+    _save_vectors(all_vectors)
+    vindex = build_vector(all_vectors, prefix_dim=prefix_dim)
     save_vector(vindex, VEC_PATH)
-    _save_json(LEX_PATH, {"texts": kept_texts})
+    # Only the new chunks are tokenized; dropped chunks become lexical tombstones.
+    lexical_store.update(LEX_PATH, renumber_rows, [c.text for c in new_chunks])
+    _save_slots(aliases, fingerprints)
 
     # Rebuild manifest entries
     chunk_map: dict[str, list[int]] = {}
     for idx, c in enumerate(kept_chunks):
         chunk_map.setdefault(c["path"], []).append(idx)
     manifest_entries = []
-    for path in current_paths:
-        text = read_text_strict(path)
-        if text is None:
-            continue
-        digest = sha256_text(text)
+    for key, (digest, mtime, size) in sorted(changes.files.items()):
         manifest_entries.append(
             ManifestEntry(
-                path=str(path),
+                path=key,
                 sha256=digest,
-                mtime=path.stat().st_mtime,
-                chunk_indices=chunk_map.get(str(path), []),
+                mtime=mtime,
+                chunk_indices=chunk_map.get(key, []),
+                size=size,
             )
         )
     new_manifest = {
         "chunks": kept_chunks,
         **build_manifest(manifest_entries),
+        **git_state,
     }
     _save_json(MANIFEST_PATH, new_manifest)
+    chunk_store.save(kept_chunks, CHUNKS_PATH)
+    query_cache.clear(QUERY_CACHE_PATH)
@@ -2,11 +2,15 @@
 
 from __future__ import annotations
 
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from hashlib import sha256
 from pathlib import Path
 from typing import Iterable
 
+from .gitignore import IgnoreRule, is_ignored, load_gitignore
+
 
 DEFAULT_EXCLUDE_DIRS = {
     ".git",
@@ -32,14 +36,100 @@ class IngestedFile:
     sha256: str
 
 
-def iter_markdown_files(root: Path, exclude_dirs: Iterable[str] | None = None) -> list[Path]:
-    excludes = set(exclude_dirs or DEFAULT_EXCLUDE_DIRS)
-    paths: list[Path] = []
-    for path in root.rglob("*.md"):
-        if any(part in excludes for part in path.parts):
+@dataclass(frozen=True)
+class DiscoveredFile:
+    path: Path
+    mtime: float
+    size: int
+
+
+@dataclass(frozen=True)
+class DiscoveryConfig:
+    exclude_dirs: frozenset[str]
+    respect_gitignore: bool = True
+    workers: int = 1
+
+
+_DirTask = tuple[Path, str, tuple[IgnoreRule, ...]]
+
+
+def _scan_dir(
+    directory: Path,
+    rel: str,
+    rules: tuple[IgnoreRule, ...],
+    excludes: frozenset[str],
+    respect_gitignore: bool,
+) -> tuple[list[DiscoveredFile], list[_DirTask]]:
+    if respect_gitignore:
+        rules = rules + tuple(load_gitignore(directory, rel))
+    files: list[DiscoveredFile] = []
+    subdirs: list[_DirTask] = []
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return files, subdirs
+    for entry in entries:
+        name = entry.name
+        child_rel = f"{rel}/{name}" if rel else name
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if name in excludes:
+                    continue
+                if rules and is_ignored(rules, child_rel, is_dir=True):
+                    continue
+                subdirs.append((directory / name, child_rel, rules))
+                continue
+            if not name.endswith(".md") or not entry.is_file():
+                continue
+            if rules and is_ignored(rules, child_rel, is_dir=False):
+                continue
+            st = entry.stat()
+        except OSError:
             continue
-        paths.append(path)
-    return sorted(paths)
+        files.append(DiscoveredFile(path=directory / name, mtime=st.st_mtime, size=st.st_size))
+    return files, subdirs
+
+
+def discover_markdown_files(
+    root: Path,
+    exclude_dirs: Iterable[str] | None = None,
+    respect_gitignore: bool = True,
+    workers: int = 1,
+) -> list[DiscoveredFile]:
+    excludes = frozenset(exclude_dirs or DEFAULT_EXCLUDE_DIRS)
+    found: list[DiscoveredFile] = []
+    start: _DirTask = (root, "", ())
+    if workers <= 1:
+        stack = [start]
+        while stack:
+            files, subdirs = _scan_dir(*stack.pop(), excludes, respect_gitignore)
+            found.extend(files)
+            stack.extend(subdirs)
+    else:
+        # One task per directory keeps deep and shallow subtrees balanced across threads.
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {pool.submit(_scan_dir, *start, excludes, respect_gitignore)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    files, subdirs = fut.result()
+                    found.extend(files)
+                    for task in subdirs:
+                        pending.add(pool.submit(_scan_dir, *task, excludes, respect_gitignore))
+    return sorted(found, key=lambda f: f.path)
+
+
+def iter_markdown_files(root: Path, exclude_dirs: Iterable[str] | None = None) -> list[Path]:
+    return [f.path for f in discover_markdown_files(root, exclude_dirs)]
+
+
+def load_discovery_config_from_env() -> DiscoveryConfig:
+    raw = os.getenv("EXCLUDE_DIRS", "")
+    names = [name.strip() for name in raw.split(",") if name.strip()]
+    exclude_dirs = frozenset(names) if names else frozenset(DEFAULT_EXCLUDE_DIRS)
+    respect_gitignore = os.getenv("RESPECT_GITIGNORE", "true").lower() == "true"
+    workers = int(os.getenv("DISCOVERY_WORKERS", "1"))
+    return DiscoveryConfig(exclude_dirs=exclude_dirs, respect_gitignore=respect_gitignore, workers=workers)
 
 
 def read_text_strict(
@@ -1,36 +1,286 @@
-"""BM25 lexical index."""
+"""BM25 lexical index over immutable token segments."""
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import math
+from dataclasses import dataclass, field
 from typing import Iterable
 
 import re
 
-from rank_bm25 import BM25Okapi
+import numpy as np
+
+
+# Okapi BM25 parameters; negative IDFs (terms in over half the documents) are
+# floored at EPSILON times the mean IDF.
+K1 = 1.5
+B = 0.75
+EPSILON = 0.25
+
+
+@dataclass(frozen=True)
+class Segment:
+    vocab: list[str]
+    terms: dict[str, int]
+    # Term ids of every document, concatenated; doc i is tokens[offsets[i]:offsets[i + 1]].
+    tokens: np.ndarray
+    offsets: np.ndarray
+    # Postings of term t are post_docs/post_tfs[post_ptr[t]:post_ptr[t + 1]].
+    post_ptr: np.ndarray
+    post_docs: np.ndarray
+    post_tfs: np.ndarray
+    # Token positions of posting i are post_pos[pos_ptr[i]:pos_ptr[i + 1]];
+    # pos_ptr is the running sum of post_tfs and is not stored.
+    post_pos: np.ndarray
+    pos_ptr: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+@dataclass(frozen=True)
+class CorpusStats:
+    # Over live documents only, so scores match a from-scratch build.
+    n_docs: int = 0
+    total_len: int = 0
+    df: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def avgdl(self) -> float:
+        return self.total_len / self.n_docs if self.n_docs else 0.0
 
 
 @dataclass(frozen=True)
 class LexicalIndex:
-    bm25: BM25Okapi
-    tokens: list[list[str]]
+    segments: list[Segment]
+    # Per segment, the index doc id (vector slot) of each local doc; -1 is a tombstone.
+    doc_ids: list[np.ndarray]
+    stats: CorpusStats
+    idf_floor: float = 0.0
+
+
+@dataclass(frozen=True)
+class QueryConstraints:
+    text: str
+    phrases: list[list[str]] = field(default_factory=list)
+    near: list[tuple[str, str, int]] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.phrases or self.near)
 
 
 TOKEN_RE = re.compile(r"[a-z0-9]+")
+PHRASE_RE = re.compile(r'"([^"]+)"')
+NEAR_RE = re.compile(r"(\S+)\s+NEAR/(\d+)\s+(\S+)")
 
 
 def _tokenize(text: str) -> list[str]:
     return TOKEN_RE.findall(text.lower())
 
 
+def _pos_ptr(post_tfs: np.ndarray) -> np.ndarray:
+    ptr = np.zeros(len(post_tfs) + 1, dtype=np.int64)
+    np.cumsum(post_tfs, out=ptr[1:])
+    return ptr
+
+
+def posting_positions(tokens: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    # In-document position of every token, ordered by term, then doc, then position.
+    n_docs = max(len(offsets) - 1, 1)
+    doc = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+    order = np.argsort(tokens.astype(np.int64) * n_docs + doc, kind="stable")
+    return (np.arange(len(tokens), dtype=np.int64) - offsets[doc])[order].astype(np.int32)
+
+
+def make_segment(vocab: list[str], tokens: np.ndarray, offsets: np.ndarray) -> Segment:
+    n_docs = max(len(offsets) - 1, 1)
+    doc = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+    # One posting per (term, doc) pair, sorted by term then doc.
+    pairs, tfs = np.unique(tokens.astype(np.int64) * n_docs + doc, return_counts=True)
+    post_terms = pairs // n_docs
+    return Segment(
+        vocab=vocab,
+        terms={term: i for i, term in enumerate(vocab)},
+        tokens=tokens,
+        offsets=offsets,
+        post_ptr=np.searchsorted(post_terms, np.arange(len(vocab) + 1)),
+        post_docs=pairs % n_docs,
+        post_tfs=tfs.astype(np.int32),
+        post_pos=posting_positions(tokens, offsets),
+        pos_ptr=_pos_ptr(tfs),
+    )
+
+
+def segment_from_tokens(tokens: list[list[str]]) -> Segment:
+    lookup: dict[str, int] = {}
+    ids = [lookup.setdefault(tok, len(lookup)) for doc_tokens in tokens for tok in doc_tokens]
+    offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+    np.cumsum([len(doc_tokens) for doc_tokens in tokens], out=offsets[1:])
+    return make_segment(list(lookup), np.asarray(ids, dtype=np.int32), offsets)
+
+
+def adjust_stats(stats: CorpusStats, segment: Segment, local: np.ndarray, sign: int = 1) -> CorpusStats:
+    # Add (sign=1) or remove (sign=-1) the given local docs of one segment.
+    local = np.asarray(local, dtype=np.int64)
+    if not len(local):
+        return stats
+    post_terms = np.repeat(np.arange(len(segment.vocab)), np.diff(segment.post_ptr))
+    counts = np.bincount(post_terms[np.isin(segment.post_docs, local)], minlength=len(segment.vocab))
+    df = dict(stats.df)
+    for term_id in np.nonzero(counts)[0].tolist():
+        term = segment.vocab[term_id]
+        value = df.get(term, 0) + sign * int(counts[term_id])
+        if value > 0:
+            df[term] = value
+        else:
+            df.pop(term, None)
+    lengths = np.diff(segment.offsets)[local]
+    return CorpusStats(
+        n_docs=stats.n_docs + sign * len(local),
+        total_len=stats.total_len + sign * int(lengths.sum()),
+        df=df,
+    )
+
+
+def make_index(segments: list[Segment], doc_ids: list[np.ndarray], stats: CorpusStats) -> LexicalIndex:
+    floor = 0.0
+    if stats.df:
+        df = np.fromiter(stats.df.values(), dtype=np.float64, count=len(stats.df))
+        floor = EPSILON * float(np.mean(np.log(stats.n_docs - df + 0.5) - np.log(df + 0.5)))
+    return LexicalIndex(segments=segments, doc_ids=doc_ids, stats=stats, idf_floor=floor)
+
+
+def _idf(index: LexicalIndex, term: str) -> float:
+    df = index.stats.df.get(term, 0)
+    if not df:
+        return 0.0
+    value = math.log(index.stats.n_docs - df + 0.5) - math.log(df + 0.5)
+    return value if value >= 0 else index.idf_floor
+
+
+def _term_positions(index: LexicalIndex, term: str) -> dict[int, list[int]]:
+    # doc -> sorted token positions of `term`, read from the live postings.
+    out: dict[int, list[int]] = {}
+    for segment, ids in zip(index.segments, index.doc_ids):
+        term_id = segment.terms.get(term)
+        if term_id is None:
+            continue
+        for i in range(int(segment.post_ptr[term_id]), int(segment.post_ptr[term_id + 1])):
+            doc = int(ids[segment.post_docs[i]])
+            if doc >= 0:
+                out[doc] = segment.post_pos[segment.pos_ptr[i] : segment.pos_ptr[i + 1]].tolist()
+    return out
+
+
+def with_overlay(index: LexicalIndex, dead: Iterable[int], texts: list[str], first_id: int) -> LexicalIndex:
+    # Tombstone the `dead` doc ids and add `texts` as an in-memory segment with
+    # ids from first_id, keeping the corpus statistics exact.
+    dead_ids = np.fromiter(dead, dtype=np.int64)
+    stats = index.stats
+    doc_ids = []
+    for segment, ids in zip(index.segments, index.doc_ids):
+        gone = np.nonzero(np.isin(ids, dead_ids))[0]
+        stats = adjust_stats(stats, segment, gone, sign=-1)
+        masked = ids.copy()
+        masked[gone] = -1
+        doc_ids.append(masked)
+    segment = segment_from_tokens([_tokenize(t) for t in texts])
+    local = np.arange(len(segment), dtype=np.int64)
+    stats = adjust_stats(stats, segment, local)
+    return make_index([*index.segments, segment], [*doc_ids, local + first_id], stats)
+
+
 def build_index(texts: Iterable[str]) -> LexicalIndex:
-    tokens = [_tokenize(t) for t in texts]
-    bm25 = BM25Okapi(tokens)
-    return LexicalIndex(bm25=bm25, tokens=tokens)
+    segment = segment_from_tokens([_tokenize(t) for t in texts])
+    local = np.arange(len(segment), dtype=np.int64)
+    return make_index([segment], [local], adjust_stats(CorpusStats(), segment, local))
+
+
+def parse_query(query: str) -> QueryConstraints:
+    near: list[tuple[str, str, int]] = []
+    for left, k, right in NEAR_RE.findall(query):
+        left_toks, right_toks = _tokenize(left), _tokenize(right)
+        if left_toks and right_toks:
+            near.append((left_toks[-1], right_toks[0], int(k)))
+    text = NEAR_RE.sub(lambda m: f"{m.group(1)} {m.group(3)}", query)
+    phrases = [toks for toks in (_tokenize(p) for p in PHRASE_RE.findall(text)) if len(toks) > 1]
+    return QueryConstraints(text=text.replace('"', " "), phrases=phrases, near=near)
+
+
+def _phrase_docs(index: LexicalIndex, terms: list[str]) -> set[int]:
+    lists = [_term_positions(index, t) for t in terms]
+    if not all(lists):
+        return set()
+    docs = set.intersection(*(set(p) for p in sorted(lists, key=len)))
+    matched = set()
+    for doc in docs:
+        starts = set(lists[0][doc])
+        for offset, plist in enumerate(lists[1:], start=1):
+            starts &= {pos - offset for pos in plist[doc]}
+            if not starts:
+                break
+        if starts:
+            matched.add(doc)
+    return matched
+
+
+def _near_docs(index: LexicalIndex, left: str, right: str, k: int) -> set[int]:
+    a, b = _term_positions(index, left), _term_positions(index, right)
+    if not a or not b:
+        return set()
+    matched = set()
+    for doc in a.keys() & b.keys():
+        pa, pb = a[doc], b[doc]
+        i = j = 0
+        while i < len(pa) and j < len(pb):
+            if abs(pa[i] - pb[j]) <= k:
+                matched.add(doc)
+                break
+            if pa[i] < pb[j]:
+                i += 1
+            else:
+                j += 1
+    return matched
+
+
+def match_constraints(index: LexicalIndex, constraints: QueryConstraints) -> set[int]:
+    # Only the query's terms are read, straight from the stored positional postings.
+    matched: set[int] | None = None
+    for terms in constraints.phrases:
+        docs = _phrase_docs(index, terms)
+        matched = docs if matched is None else matched & docs
+    for left, right, k in constraints.near:
+        docs = _near_docs(index, left, right, k)
+        matched = docs if matched is None else matched & docs
+    return matched or set()
 
 
 def search(index: LexicalIndex, query: str, top_k: int) -> list[tuple[int, float]]:
-    q = _tokenize(query)
-    scores = index.bm25.get_scores(q)
-    ranked = sorted(enumerate(scores), key=lambda x: x[1], reverse=True)
-    return ranked[:top_k]
+    q = _tokenize(parse_query(query).text)
+    stats = index.stats
+    # Doc ids are dense unless tombstones leave gaps below an overlay's ids.
+    width = 1 + max((int(ids.max()) for ids in index.doc_ids if len(ids)), default=-1)
+    scores = np.zeros(max(width, stats.n_docs))
+    for term in q:
+        idf = _idf(index, term)
+        if not idf:
+            continue
+        # Walk each segment's postings for the term, skipping tombstoned docs.
+        for segment, ids in zip(index.segments, index.doc_ids):
+            term_id = segment.terms.get(term)
+            if term_id is None:
+                continue
+            span = slice(segment.post_ptr[term_id], segment.post_ptr[term_id + 1])
+            local = segment.post_docs[span]
+            docs = ids[local]
+            live = docs >= 0
+            tf = segment.post_tfs[span][live].astype(np.float64)
+            dl = (segment.offsets[local + 1] - segment.offsets[local])[live]
+            scores[docs[live]] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * dl / stats.avgdl))
+    if len(scores) == stats.n_docs:
+        order = np.argsort(-scores, kind="stable")[:top_k]
+    else:
+        live = np.concatenate([ids[ids >= 0] for ids in index.doc_ids])
+        live.sort()
+        order = live[np.argsort(-scores[live], kind="stable")[:top_k]]
+    return [(int(doc), float(scores[doc])) for doc in order]
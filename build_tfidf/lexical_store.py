@@ -0,0 +1,248 @@
+"""Segmented on-disk lexical index: immutable segments, tombstones and merges."""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+from pathlib import Path
+from typing import Callable, Iterable
+
+import numpy as np
+
+from .lexical import (
+    CorpusStats,
+    LexicalIndex,
+    Segment,
+    _pos_ptr,
+    _tokenize,
+    adjust_stats,
+    build_index,
+    make_index,
+    make_segment,
+    posting_positions,
+    segment_from_tokens,
+)
+
+
+FORMAT_VERSION = 2
+# Merge the small segments once there are more than this many...
+MAX_SEGMENTS = 8
+# ...and everything once this fraction of stored docs are tombstones.
+MAX_DEAD_FRACTION = 0.25
+
+
+def _segment_name(path: Path, seq: int) -> str:
+    return f"{path.stem}.{seq:05d}.npz"
+
+
+def _docs_name(path: Path, seq: int) -> str:
+    return f"{path.stem}.{seq:05d}.docs.npy"
+
+
+def _segment_bytes(segment: Segment) -> bytes:
+    buf = io.BytesIO()
+    vocab = "\n".join(segment.vocab).encode("utf-8")
+    np.savez(
+        buf,
+        vocab=np.frombuffer(vocab, dtype=np.uint8),
+        tokens=segment.tokens,
+        offsets=segment.offsets,
+        post_ptr=segment.post_ptr,
+        post_docs=segment.post_docs,
+        post_tfs=segment.post_tfs,
+        post_pos=segment.post_pos,
+    )
+    return buf.getvalue()
+
+
+def _load_segment(raw: bytes) -> Segment:
+    with np.load(io.BytesIO(raw)) as data:
+        blob = data["vocab"].tobytes().decode("utf-8")
+        vocab = blob.split("\n") if blob else []
+        tokens, offsets = data["tokens"], data["offsets"]
+        # Segments written before positions were stored derive them from the tokens.
+        post_pos = data["post_pos"] if "post_pos" in data.files else posting_positions(tokens, offsets)
+        return Segment(
+            vocab=vocab,
+            terms={term: i for i, term in enumerate(vocab)},
+            tokens=tokens,
+            offsets=offsets,
+            post_ptr=data["post_ptr"],
+            post_docs=data["post_docs"],
+            post_tfs=data["post_tfs"],
+            post_pos=post_pos,
+            pos_ptr=_pos_ptr(data["post_tfs"]),
+        )
+
+
+def _write_bytes(target: Path, raw: bytes) -> None:
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_bytes(raw)
+    os.replace(tmp, target)
+
+
+def _is_segmented(manifest: dict) -> bool:
+    return manifest.get("format") == FORMAT_VERSION
+
+
+def files(path: Path) -> list[Path]:
+    # Segment and doc id files the manifest at `path` refers to.
+    if not path.exists():
+        return []
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    if not _is_segmented(manifest):
+        return []
+    names = [entry["name"] for entry in manifest["segments"]] + [manifest["docs"]]
+    return [path.with_name(name) for name in names]
+
+
+def load_from(manifest: dict, read: Callable[[str], bytes]) -> LexicalIndex:
+    if not _is_segmented(manifest):
+        # lexical.json from before segments held the raw slot texts.
+        return build_index(manifest["texts"])
+    segments = [_load_segment(read(entry["name"])) for entry in manifest["segments"]]
+    all_ids = np.load(io.BytesIO(read(manifest["docs"])))
+    bounds = np.cumsum([0] + [len(s) for s in segments])
+    doc_ids = [all_ids[bounds[i] : bounds[i + 1]] for i in range(len(segments))]
+    stats = CorpusStats(n_docs=manifest["n_docs"], total_len=manifest["total_len"], df=manifest["df"])
+    return make_index(segments, doc_ids, stats)
+
+
+def load(path: Path) -> LexicalIndex:
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    return load_from(manifest, lambda name: path.with_name(name).read_bytes())
+
+
+def _commit(
+    path: Path,
+    seq: int,
+    segments: list[tuple[str, Segment]],
+    doc_ids: list[np.ndarray],
+    stats: CorpusStats,
+) -> None:
+    # Segment files are written once under new names; replacing the manifest is
+    # the commit point. A reader may have read the previous manifest without
+    # opening its files yet, so those stay until the commit after this one.
+    previous = {p.name for p in files(path)}
+    buf = io.BytesIO()
+    np.save(buf, np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int64))
+    docs = _docs_name(path, seq)
+    _write_bytes(path.with_name(docs), buf.getvalue())
+    manifest = {
+        "format": FORMAT_VERSION,
+        "next": seq + 1,
+        "segments": [
+            {"name": name, "docs": len(segment), "dead": int((ids < 0).sum())}
+            for (name, segment), ids in zip(segments, doc_ids)
+        ],
+        "docs": docs,
+        "n_docs": stats.n_docs,
+        "total_len": stats.total_len,
+        "df": stats.df,
+    }
+    _write_bytes(path, json.dumps(manifest).encode("utf-8"))
+    keep = {name for name, _ in segments} | {docs} | previous
+    for stale in path.parent.glob(f"{path.stem}.*.np[yz]"):
+        if stale.name not in keep:
+            stale.unlink(missing_ok=True)
+
+
+def _add_segment(path: Path, seq: int, tokens: list[list[str]]) -> tuple[str, Segment]:
+    segment = segment_from_tokens(tokens)
+    name = _segment_name(path, seq)
+    _write_bytes(path.with_name(name), _segment_bytes(segment))
+    return name, segment
+
+
+def _next_seq(path: Path) -> int:
+    if not path.exists():
+        return 1
+    return int(json.loads(path.read_text(encoding="utf-8")).get("next", 1))
+
+
+def write(path: Path, texts: Iterable[str]) -> None:
+    # A fresh store: one segment holding every slot in order. Numbering carries
+    # on from any previous store so readers never see a name reused.
+    seq = _next_seq(path)
+    name, segment = _add_segment(path, seq, [_tokenize(t) for t in texts])
+    ids = np.arange(len(segment), dtype=np.int64)
+    _commit(path, seq, [(name, segment)], [ids], adjust_stats(CorpusStats(), segment, ids))
+
+
+def _merge(segments: list[Segment], doc_ids: list[np.ndarray]) -> tuple[Segment, np.ndarray]:
+    # Live docs of the given segments, in doc id order, in one segment.
+    live = sorted(
+        (int(ids[local]), seg_no, local) for seg_no, ids in enumerate(doc_ids) for local in np.nonzero(ids >= 0)[0]
+    )
+    lookup: dict[str, int] = {}
+    remaps = [
+        np.asarray([lookup.setdefault(term, len(lookup)) for term in segment.vocab], dtype=np.int32)
+        for segment in segments
+    ]
+    parts = []
+    for _, seg_no, local in live:
+        segment = segments[seg_no]
+        parts.append(remaps[seg_no][segment.tokens[segment.offsets[local] : segment.offsets[local + 1]]])
+    lengths = [len(p) for p in parts]
+    offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    tokens = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32)
+    # Drop terms only tombstoned docs used.
+    used = np.unique(tokens)
+    vocab_all = list(lookup)
+    compact = np.full(len(vocab_all), -1, dtype=np.int32)
+    compact[used] = np.arange(len(used), dtype=np.int32)
+    merged = make_segment([vocab_all[i] for i in used.tolist()], compact[tokens], offsets)
+    return merged, np.asarray([doc for doc, _, _ in live], dtype=np.int64)
+
+
+def _plan_merge(segments: list[Segment], doc_ids: list[np.ndarray]) -> int | None:
+    # Index of the first segment to merge through the end, or None.
+    stored = sum(len(ids) for ids in doc_ids)
+    dead = sum(int((ids < 0).sum()) for ids in doc_ids)
+    if stored and dead / stored > MAX_DEAD_FRACTION:
+        return 0
+    if len(segments) <= MAX_SEGMENTS:
+        return None
+    # Fold the newer, smaller segments together; include the oldest once they outgrow it.
+    tail = sum(int((ids >= 0).sum()) for ids in doc_ids[1:])
+    return 0 if tail >= int((doc_ids[0] >= 0).sum()) else 1
+
+
+def update(path: Path, renumber: np.ndarray, new_texts: Iterable[str]) -> None:
+    # Apply an update that kept existing slot s as renumber[s] (-1 when dropped)
+    # and appended one slot per new text after the survivors.
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    if not _is_segmented(manifest):
+        write(path, manifest["texts"])
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    seq = int(manifest["next"])
+    index = load_from(manifest, lambda name: path.with_name(name).read_bytes())
+    stats = index.stats
+    segments = [(entry["name"], segment) for entry, segment in zip(manifest["segments"], index.segments)]
+    doc_ids = []
+    for (_, segment), ids in zip(segments, index.doc_ids):
+        moved = np.where(ids >= 0, renumber[np.maximum(ids, 0)], -1)
+        # Newly tombstoned docs leave the corpus statistics.
+        stats = adjust_stats(stats, segment, np.nonzero((ids >= 0) & (moved < 0))[0], sign=-1)
+        doc_ids.append(moved)
+
+    tokens = [_tokenize(t) for t in new_texts]
+    if tokens:
+        name, segment = _add_segment(path, seq, tokens)
+        first = int((renumber >= 0).sum())
+        ids = np.arange(first, first + len(tokens), dtype=np.int64)
+        stats = adjust_stats(stats, segment, np.arange(len(tokens)))
+        segments.append((name, segment))
+        doc_ids.append(ids)
+
+    start = _plan_merge([s for _, s in segments], doc_ids)
+    if start is not None:
+        merged, ids = _merge([s for _, s in segments[start:]], doc_ids[start:])
+        name = _segment_name(path, seq + 1)
+        _write_bytes(path.with_name(name), _segment_bytes(merged))
+        segments = segments[:start] + [(name, merged)]
+        doc_ids = doc_ids[:start] + [ids]
+        seq += 1
+    _commit(path, seq, segments, doc_ids, stats)
@@ -0,0 +1,149 @@
+"""Local hashed TF-IDF embeddings with an optional fitted projection."""
+
+from __future__ import annotations
+
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Sequence
+
+import numpy as np
+
+from .lexical import TOKEN_RE
+
+
+MODEL_VERSION = "hash-tfidf-v1"
+DEFAULT_FEATURES = 4096
+BATCH_SIZE = 512
+MAX_FIT_ROWS = 20_000
+SEED = 0
+# Bucket codes are cheap to recompute, so the caches are capped and simply
+# dropped when full; a long-lived process sees an unbounded stream of tokens.
+MAX_CACHED_TOKENS = 200_000
+MAX_CACHES = 4
+
+
+@dataclass(frozen=True)
+class LocalModel:
+    n_features: int
+    idf: np.ndarray
+    projection: np.ndarray | None = None
+
+    @property
+    def dim(self) -> int:
+        return self.n_features if self.projection is None else int(self.projection.shape[1])
+
+
+def model_name(n_features: int) -> str:
+    return f"{MODEL_VERSION}-f{n_features}"
+
+
+class _BucketCache(dict):
+    # token -> signed bucket code (bucket + 1, negated for the negative sign)
+    def __init__(self, n_features: int) -> None:
+        super().__init__()
+        self.n_features = n_features
+
+    def __missing__(self, token: str) -> int:
+        h = zlib.crc32(token.encode("utf-8"))
+        code = h % self.n_features + 1
+        if h & 0x80000000:
+            code = -code
+        if len(self) >= MAX_CACHED_TOKENS:
+            self.clear()
+        self[token] = code
+        return code
+
+
+_CACHES: dict[int, _BucketCache] = {}
+
+
+def _cache(n_features: int) -> _BucketCache:
+    cache = _CACHES.get(n_features)
+    if cache is None:
+        if len(_CACHES) >= MAX_CACHES:
+            _CACHES.clear()
+        cache = _CACHES[n_features] = _BucketCache(n_features)
+    return cache
+
+
+def _hashed_tf(texts: Sequence[str], n_features: int) -> np.ndarray:
+    cache = _cache(n_features)
+    lookup = cache.__getitem__
+    codes: list[int] = []
+    lengths = np.empty(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        toks = TOKEN_RE.findall(text.lower())
+        lengths[i] = len(toks)
+        codes.extend(map(lookup, toks))
+    signed = np.fromiter(codes, dtype=np.int64, count=len(codes))
+    docs = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+    flat = docs * n_features + (np.abs(signed) - 1)
+    counts = np.bincount(flat, weights=np.sign(signed), minlength=len(texts) * n_features)
+    tf = counts.reshape(len(texts), n_features).astype("float32")
+    # Sublinear term frequency, keeping the sign from the hashing trick.
+    mag = np.abs(tf)
+    np.log(mag, out=mag, where=mag > 0)
+    return np.where(tf != 0, np.sign(tf) * (1.0 + mag), 0.0).astype("float32")
+
+
+def _normalize(arr: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return arr / norms
+
+
+def _tfidf(texts: Sequence[str], n_features: int, idf: np.ndarray) -> np.ndarray:
+    return _normalize(_hashed_tf(texts, n_features) * idf)
+
+
+def unfitted(n_features: int = DEFAULT_FEATURES) -> LocalModel:
+    return LocalModel(n_features=n_features, idf=np.ones(n_features, dtype="float32"))
+
+
+def fit(texts: Sequence[str], n_features: int = DEFAULT_FEATURES, dimensions: int | None = None) -> LocalModel:
+    df = np.zeros(n_features, dtype=np.int64)
+    for start in range(0, len(texts), BATCH_SIZE):
+        df += np.count_nonzero(_hashed_tf(texts[start : start + BATCH_SIZE], n_features), axis=0)
+    idf = (np.log((1.0 + len(texts)) / (1.0 + df)) + 1.0).astype("float32")
+    if not dimensions or dimensions >= n_features:
+        return LocalModel(n_features=n_features, idf=idf)
+
+    # Randomized SVD on an evenly spaced sample keeps fitting fast and deterministic.
+    step = max(len(texts) // MAX_FIT_ROWS, 1)
+    sample = _tfidf(list(texts[::step][:MAX_FIT_ROWS]), n_features, idf)
+    rng = np.random.default_rng(SEED)
+    k = min(dimensions, *sample.shape)
+    omega = rng.standard_normal((n_features, k + 10)).astype("float32")
+    q, _ = np.linalg.qr(sample @ omega)
+    for _ in range(2):
+        q, _ = np.linalg.qr(sample.T @ q)
+        q, _ = np.linalg.qr(sample @ q)
+    _, _, vt = np.linalg.svd(q.T @ sample, full_matrices=False)
+    projection = np.zeros((n_features, dimensions), dtype="float32")
+    projection[:, :k] = vt[:k].T
+    return LocalModel(n_features=n_features, idf=idf, projection=projection)
+
+
+def embed(texts: Sequence[str], model: LocalModel) -> np.ndarray:
+    out = np.empty((len(texts), model.dim), dtype="float32")
+    for start in range(0, len(texts), BATCH_SIZE):
+        batch = _tfidf(texts[start : start + BATCH_SIZE], model.n_features, model.idf)
+        if model.projection is not None:
+            batch = _normalize(batch @ model.projection)
+        out[start : start + len(batch)] = batch
+    return out
+
+
+def save(model: LocalModel, path: Path) -> None:
+    arrays = {"n_features": np.array(model.n_features), "idf": model.idf}
+    if model.projection is not None:
+        arrays["projection"] = model.projection
+    with path.open("wb") as fh:
+        np.savez(fh, **arrays)
+
+
+def load(path: Path | BinaryIO) -> LocalModel:
+    with np.load(path) as data:
+        projection = data["projection"] if "projection" in data.files else None
+        return LocalModel(n_features=int(data["n_features"]), idf=data["idf"], projection=projection)
@@ -13,6 +13,19 @@ class ManifestEntry:
     sha256: str
     mtime: float
     chunk_indices: list[int]
+    size: int = -1
+
+
+@dataclass(frozen=True)
+class ChangeSet:
+    changed: list[Path]
+    removed: set[str]
+    renamed: dict[str, str]
+    # path -> (sha256, mtime, size) for every file that stays in the index
+    files: dict[str, tuple[str, float, int]]
+
+    def is_empty(self) -> bool:
+        return not (self.changed or self.removed or self.renamed)
 
 
 def build_manifest(entries: Iterable[ManifestEntry]) -> dict:
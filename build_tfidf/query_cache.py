@@ -0,0 +1,184 @@
+"""Query result cache keyed by index generation."""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass
+from hashlib import sha256
+from pathlib import Path
+from typing import Any, Iterable
+
+
+DEFAULT_MAX_ENTRIES = 256
+# The hit/miss log is folded into the cache file's counts at this size.
+MAX_EVENT_BYTES = 64 * 1024
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    entries: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def index_generation(artifacts: Iterable[Path], signature: str) -> str:
+    # Any rewrite of an artifact changes its mtime or size, so build and update
+    # invalidate cached results without having to coordinate with the cache.
+    parts = [signature]
+    for path in artifacts:
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        parts.append(f"{path.name}:{st.st_mtime_ns}:{st.st_size}")
+    return sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def cache_key(query_text: str, params: dict[str, Any], generation: str) -> str:
+    raw = json.dumps({"q": query_text, "p": params, "g": generation}, sort_keys=True)
+    return sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _read(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"hits": 0, "misses": 0}
+
+
+def _entries_dir(path: Path) -> Path:
+    # One file per cached query, so a miss writes only its own entry.
+    return path.with_name(path.stem)
+
+
+def _events_path(path: Path) -> Path:
+    return path.with_name(path.name + ".events")
+
+
+def _count_events(raw: bytes) -> tuple[int, int]:
+    return raw.count(b"h"), raw.count(b"m")
+
+
+def _write(target: Path, text: str) -> None:
+    # The cache is an optimization: a failed write loses entries, never a query.
+    tmp = None
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=target.parent, prefix=target.name + ".", suffix=".tmp", delete=False, encoding="utf-8"
+        ) as fh:
+            tmp = Path(fh.name)
+            fh.write(text)
+        os.replace(tmp, target)
+    except OSError:
+        if tmp is not None:
+            tmp.unlink(missing_ok=True)
+
+
+def _fold_events(path: Path) -> None:
+    # Move the log's counts into the cache file. Renaming the log first means
+    # only one process folds it; lookups meanwhile start a new log.
+    claimed = path.with_name(f"{_events_path(path).name}.{os.getpid()}.{uuid.uuid4().hex}")
+    try:
+        os.replace(_events_path(path), claimed)
+        hits, misses = _count_events(claimed.read_bytes())
+    except OSError:
+        return
+    data = _read(path)
+    counts = {"hits": int(data.get("hits", 0)) + hits, "misses": int(data.get("misses", 0)) + misses}
+    _write(path, json.dumps(counts))
+    claimed.unlink(missing_ok=True)
+
+
+def _record(path: Path, event: bytes) -> None:
+    # Lookups append one byte instead of rewriting the cache: appends this
+    # small do not interleave, so concurrent queries keep every count. The log
+    # is folded into the cache file once it reaches MAX_EVENT_BYTES.
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with _events_path(path).open("ab") as fh:
+            fh.write(event)
+            size = fh.tell()
+    except OSError:
+        return
+    if size >= MAX_EVENT_BYTES:
+        _fold_events(path)
+
+
+def lookup(path: Path, key: str, generation: str) -> list[tuple[dict, float]] | None:
+    # Reads only this query's entry; nothing but the hit/miss log is written.
+    try:
+        entry = json.loads((_entries_dir(path) / f"{key}.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        entry = None
+    hit = entry["results"] if entry is not None and entry.get("generation") == generation else None
+    _record(path, b"m" if hit is None else b"h")
+    if hit is None:
+        return None
+    return [(chunk, float(score)) for chunk, score in hit]
+
+
+def _entry_files(path: Path) -> list[os.DirEntry]:
+    try:
+        with os.scandir(_entries_dir(path)) as it:
+            return [e for e in it if e.name.endswith(".json")]
+    except OSError:
+        return []
+
+
+def store(
+    path: Path,
+    key: str,
+    generation: str,
+    results: list[tuple[dict, float]],
+    max_entries: int = DEFAULT_MAX_ENTRIES,
+) -> None:
+    if max_entries <= 0:
+        return
+    entry = {"generation": generation, "results": [[chunk, score] for chunk, score in results]}
+    _write(_entries_dir(path) / f"{key}.json", json.dumps(entry))
+    files = _entry_files(path)
+    if len(files) <= max_entries:
+        return
+    # Evict the oldest entries; a concurrent store may already have removed some.
+    def _mtime(e: os.DirEntry) -> int:
+        try:
+            return e.stat().st_mtime_ns
+        except OSError:
+            return 0
+
+    for stale in sorted(files, key=_mtime)[: len(files) - max_entries]:
+        Path(stale.path).unlink(missing_ok=True)
+
+
+def clear(path: Path, reset_stats: bool = False) -> None:
+    for entry in _entry_files(path):
+        Path(entry.path).unlink(missing_ok=True)
+    if reset_stats:
+        _events_path(path).unlink(missing_ok=True)
+        path.unlink(missing_ok=True)
+    elif path.exists() and "entries" in _read(path):
+        # Cache files from before per-entry storage held the entries themselves.
+        data = _read(path)
+        _write(path, json.dumps({"hits": int(data.get("hits", 0)), "misses": int(data.get("misses", 0))}))
+
+
+def stats(path: Path) -> CacheStats:
+    data = _read(path)
+    try:
+        hits, misses = _count_events(_events_path(path).read_bytes())
+    except OSError:
+        hits, misses = 0, 0
+    return CacheStats(
+        hits=int(data.get("hits", 0)) + hits,
+        misses=int(data.get("misses", 0)) + misses,
+        entries=len(_entry_files(path)),
+    )
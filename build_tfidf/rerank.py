@@ -1,19 +1,49 @@
-"""Optional LLM re-ranking."""
+"""Optional re-ranking: local MMR diversification or an LLM."""
 
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Iterable
+from typing import Iterable, Sequence
 
+import numpy as np
 from openai import OpenAI
 
 
+# Weight on relevance versus novelty when MMR is selected without a value.
+DEFAULT_MMR_LAMBDA = 0.7
+
+
 @dataclass(frozen=True)
 class RerankConfig:
     model: str
     top_n: int
 
 
+def mmr(relevance: Sequence[float], vectors: np.ndarray, lambda_: float = DEFAULT_MMR_LAMBDA) -> list[int]:
+    # Maximal Marginal Relevance: repeatedly take the candidate maximizing
+    # lambda * relevance - (1 - lambda) * its highest cosine similarity to those
+    # already taken. Returns candidate indices in pick order.
+    rel = np.asarray(relevance, dtype=np.float64)
+    if not len(rel):
+        return []
+    span = rel.max() - rel.min()
+    rel = (rel - rel.min()) / span if span else np.zeros_like(rel)
+    unit = np.array(vectors, dtype=np.float32)
+    unit /= np.maximum(np.linalg.norm(unit, axis=1, keepdims=True), 1e-12)
+    sim = unit @ unit.T
+    closest = np.zeros(len(rel))
+    taken = np.zeros(len(rel), dtype=bool)
+    order: list[int] = []
+    for _ in range(len(rel)):
+        gain = lambda_ * rel - (1 - lambda_) * closest
+        gain[taken] = -np.inf
+        pick = int(np.argmax(gain))
+        order.append(pick)
+        taken[pick] = True
+        closest = np.maximum(closest, sim[pick])
+    return order
+
+
 def rerank(query: str, candidates: Iterable[dict], config: RerankConfig) -> list[dict]:
     client = OpenAI()
     payload = []
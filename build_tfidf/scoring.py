@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from typing import Iterable
+
 
 def minmax_normalize(scores: list[float]) -> list[float]:
     if not scores:
@@ -31,3 +33,30 @@ def fuse_scores(
         score = weight_semantic * sem_norm[idx] + weight_lexical * lex_norm[idx]
         fused.append((doc_id, score))
     return sorted(fused, key=lambda x: x[1], reverse=True)
+
+
+def rrf_scores(
+    semantic: dict[int, float],
+    lexical: dict[int, float],
+    weight_semantic: float = 0.7,
+    weight_lexical: float = 0.3,
+    k: int = 60,
+) -> list[tuple[int, float]]:
+    # Reciprocal rank fusion: uses ranks only, so score scales never need calibrating.
+    scores = {doc_id: 0.0 for doc_id in sorted(set(semantic) | set(lexical))}
+    for weight, ranked in ((weight_semantic, semantic), (weight_lexical, lexical)):
+        order = sorted(ranked, key=lambda doc_id: ranked[doc_id], reverse=True)
+        for rank, doc_id in enumerate(order, start=1):
+            scores[doc_id] += weight / (k + rank)
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+
+def boost_scores(
+    fused: list[tuple[int, float]],
+    boosted: Iterable[int],
+    boost: float,
+) -> list[tuple[int, float]]:
+    scores = dict(fused)
+    for doc_id in boosted:
+        scores[doc_id] = scores.get(doc_id, 0.0) + boost
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
@@ -0,0 +1,138 @@
+"""In-process search over one index directory, loaded once and shared across threads."""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Sequence
+
+from . import query_cache
+from .embeddings import EmbeddingConfig, load_config_from_env
+from .index import (
+    DATA_DIR,
+    LoadedIndex,
+    RankingConfig,
+    artifact_paths,
+    index_config,
+    load_bundle,
+    load_index,
+    plan_queries,
+    search_plan,
+)
+
+
+class Searcher:
+    def __init__(self, directory: Path | str = DATA_DIR, embed_config: EmbeddingConfig | None = None) -> None:
+        self.directory = Path(directory)
+        self._base_config = embed_config or load_config_from_env()
+        self._lock = threading.Lock()
+        # The index and the config it is queried with are swapped together, in
+        # one assignment, so a search never pairs one with the other's successor.
+        self._state = self._open()
+
+    def _open(self) -> tuple[LoadedIndex, EmbeddingConfig]:
+        # A file is a packed bundle served in place; a directory holds loose artifacts.
+        loaded = load_bundle(self.directory) if self.directory.is_file() else load_index(self.directory)
+        return loaded, index_config(loaded.meta, self._base_config)
+
+    @property
+    def generation(self) -> str:
+        return self._state[0].generation
+
+    def reload(self, force: bool = False) -> bool:
+        # Swap in a newly built index; searches already running keep the old one.
+        with self._lock:
+            if not force:
+                loaded = self._state[0]
+                paths = [self.directory] if self.directory.is_file() else artifact_paths(self.directory)
+                current = query_cache.index_generation(paths, loaded.meta["index_signature"])
+                if current == loaded.generation:
+                    return False
+            self._state = self._open()
+            return True
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        weight_semantic: float | None = None,
+        weight_lexical: float | None = None,
+        rerank_model: str | None = None,
+        rerank_top_n: int = 30,
+        dedupe_by_path: bool = True,
+        collapse_duplicates: bool = False,
+        ranking: RankingConfig | None = None,
+        mode: str = "hybrid",
+        deadline_ms: float | None = None,
+        details: dict | None = None,
+    ) -> list[tuple[dict, float]]:
+        many: dict = {}
+        results = self.search_many(
+            [query],
+            top_k,
+            weight_semantic,
+            weight_lexical,
+            rerank_model,
+            rerank_top_n,
+            dedupe_by_path,
+            collapse_duplicates,
+            ranking,
+            workers=1,
+            mode=mode,
+            deadline_ms=deadline_ms,
+            details=many,
+        )[0]
+        if details is not None:
+            details["tier"] = many["tiers"][0]
+        return results
+
+    def search_many(
+        self,
+        queries: Sequence[str],
+        top_k: int = 10,
+        weight_semantic: float | None = None,
+        weight_lexical: float | None = None,
+        rerank_model: str | None = None,
+        rerank_top_n: int = 30,
+        dedupe_by_path: bool = True,
+        collapse_duplicates: bool = False,
+        ranking: RankingConfig | None = None,
+        workers: int | None = None,
+        mode: str = "hybrid",
+        deadline_ms: float | None = None,
+        details: dict | None = None,
+    ) -> list[list[tuple[dict, float]]]:
+        if not queries:
+            return []
+        started = time.perf_counter()
+        loaded, config = self._state
+        # One embedding call for the queries that need one; ranking runs in
+        # threads since FAISS releases the GIL during search.
+        plans = plan_queries(loaded, list(queries), mode, config, deadline_ms, started=started)
+        if details is not None:
+            details["tiers"] = [plan.describe() for plan in plans]
+
+        def _one(i: int) -> list[tuple[dict, float]]:
+            return search_plan(
+                loaded,
+                queries[i],
+                plans[i],
+                top_k=top_k,
+                weight_semantic=weight_semantic,
+                weight_lexical=weight_lexical,
+                rerank_model=rerank_model,
+                rerank_top_n=rerank_top_n,
+                dedupe_by_path=dedupe_by_path,
+                collapse_duplicates=collapse_duplicates,
+                ranking=ranking,
+            )
+
+        if workers == 1 or len(queries) == 1:
+            return [_one(i) for i in range(len(queries))]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_one, range(len(queries))))
+
+    def get_chunk(self, chunk_id: str) -> dict | None:
+        return self._state[0].get_chunk(chunk_id)
@@ -0,0 +1,179 @@
+"""Capacity and memory accounting for an index, read from artifact headers."""
+
+from __future__ import annotations
+
+import json
+import struct
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+
+from . import chunk_store, index, lexical_store
+
+
+FAISS_TYPES = {b"IxFI": "IndexFlatIP", b"IxF2": "IndexFlatL2", b"IxFl": "IndexFlat"}
+# Interpreter, numpy, faiss and openai imported, before any artifact loads.
+BASE_PROCESS_BYTES = 80 * 2**20
+# Rough cost of one vocabulary term held as a str key with an int value.
+TERM_BYTES = 120
+# Heaps' law exponent: vocabulary grows about as the square root of corpus size.
+VOCAB_GROWTH = 0.5
+
+
+@dataclass(frozen=True)
+class Component:
+    name: str
+    disk: int
+    # Held in memory by a loaded query process; mapped bytes are paged in on demand.
+    resident: int
+    mapped: int = 0
+    # Exponent of growth with corpus size: 1.0 is linear.
+    growth: float = 1.0
+
+
+@dataclass(frozen=True)
+class IndexStats:
+    files: int
+    chunks: int
+    tokens: int
+    slots: int
+    dimensions: int
+    search_dimensions: int
+    vector_dtype: str
+    faiss_type: str
+    vocab: int
+    postings: int
+    components: list[Component]
+
+    @property
+    def disk(self) -> int:
+        return sum(c.disk for c in self.components)
+
+    @property
+    def resident(self) -> int:
+        return BASE_PROCESS_BYTES + sum(c.resident for c in self.components)
+
+    def project(self, factor: float) -> tuple[int, int]:
+        # Disk and resident bytes for a corpus `factor` times this size.
+        disk = sum(c.disk * factor**c.growth for c in self.components)
+        resident = sum(c.resident * factor**c.growth for c in self.components)
+        return int(disk), int(BASE_PROCESS_BYTES + resident)
+
+
+def _size(path: Path) -> int:
+    return path.stat().st_size if path.exists() else 0
+
+
+def _npy_header(fh: BinaryIO) -> tuple[tuple[int, ...], np.dtype]:
+    version = np.lib.format.read_magic(fh)
+    if version == (1, 0):
+        shape, _, dtype = np.lib.format.read_array_header_1_0(fh)
+    else:
+        shape, _, dtype = np.lib.format.read_array_header_2_0(fh)
+    return shape, dtype
+
+
+def _npy_shape(path: Path) -> tuple[tuple[int, ...], np.dtype] | None:
+    if not path.exists():
+        return None
+    with path.open("rb") as fh:
+        return _npy_header(fh)
+
+
+def _nbytes(shape: tuple[int, ...], dtype: np.dtype) -> int:
+    return int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+
+
+def _npz_arrays(path: Path) -> dict[str, tuple[tuple[int, ...], np.dtype]]:
+    # Shape and dtype per member, from the zip directory and each .npy header.
+    out = {}
+    with zipfile.ZipFile(path) as zf:
+        for name in zf.namelist():
+            with zf.open(name) as fh:
+                out[name.removesuffix(".npy")] = _npy_header(fh)
+    return out
+
+
+def _faiss_header(path: Path) -> tuple[str, int, int]:
+    # Flat indexes start with a fourcc, then d (int32) and ntotal (int64).
+    with path.open("rb") as fh:
+        raw = fh.read(16)
+    fourcc = raw[:4]
+    d, ntotal = struct.unpack("<iq", raw[4:16])
+    return FAISS_TYPES.get(fourcc, fourcc.decode("ascii", "replace")), d, ntotal
+
+
+def collect(directory: Path | None = None) -> IndexStats:
+    def _path(p: Path) -> Path:
+        return p if directory is None else directory / p.name
+
+    meta = json.loads(_path(index.META_PATH).read_text(encoding="utf-8"))
+    manifest_path = _path(index.MANIFEST_PATH)
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    chunks = manifest.get("chunks", [])
+    components = [Component("metadata + manifest", _size(_path(index.META_PATH)) + _size(manifest_path), 0)]
+
+    vectors_path = _path(index.VECTORS_PATH)
+    header = _npy_shape(vectors_path)
+    shape, dtype = header if header is not None else ((0, 0), np.dtype("float32"))
+    components.append(Component("vectors.npy", _size(vectors_path), 0, mapped=_nbytes(shape, dtype)))
+
+    faiss_path = _path(index.VEC_PATH)
+    faiss_type, search_dim, n_slots = _faiss_header(faiss_path)
+    # Flat indexes hold every vector in RAM; for others the file size is the best guess.
+    faiss_ram = search_dim * n_slots * 4 if faiss_type in FAISS_TYPES.values() else _size(faiss_path)
+    components.append(Component("index.faiss", _size(faiss_path), faiss_ram))
+
+    lex_path = _path(index.LEX_PATH)
+    lex_manifest = json.loads(lex_path.read_text(encoding="utf-8"))
+    vocab = len(lex_manifest.get("df", {}))
+    postings = 0
+    arrays = 0
+    for part in lexical_store.files(lex_path):
+        if part.suffix == ".npz":
+            members = _npz_arrays(part)
+            postings += members["post_docs"][0][0]
+            arrays += sum(_nbytes(*header) for name, header in members.items() if name != "vocab")
+        else:
+            arrays += _size(part)
+    lex_disk = _size(lex_path) + sum(_size(p) for p in lexical_store.files(lex_path))
+    # Each segment keeps its own term lookup next to the corpus-wide document frequencies.
+    n_segments = max(len(lex_manifest.get("segments", [])), 1)
+    components.append(Component("lexical postings", lex_disk, arrays))
+    components.append(Component("lexical vocabulary", 0, vocab * TERM_BYTES * (n_segments + 1), growth=VOCAB_GROWTH))
+
+    records = _path(index.CHUNKS_PATH)
+    store_files = [*chunk_store.sidecars(records), chunk_store.files_path(records)]
+    components.append(
+        Component(
+            "chunk store",
+            _size(records) + sum(_size(p) for p in store_files),
+            0,
+            mapped=sum(_size(p) for p in store_files),
+        )
+    )
+
+    slots_path = _path(index.SLOTS_PATH)
+    # Per-chunk aliases plus the grouped slot order and bounds built at load time.
+    slot_groups = (2 * len(chunks) + n_slots + 1) * 8 if slots_path.exists() else 0
+    components.append(Component("slots.npz", _size(slots_path), slot_groups))
+    model_path = _path(index.LOCAL_MODEL_PATH)
+    if model_path.exists():
+        components.append(Component("local_model.npz", _size(model_path), _size(model_path), growth=0.0))
+
+    return IndexStats(
+        files=len(manifest.get("entries", [])),
+        chunks=len(chunks),
+        tokens=sum(int(c.get("token_count", 0)) for c in chunks),
+        slots=n_slots,
+        dimensions=int(meta["embedding_dimensions"]),
+        search_dimensions=search_dim,
+        vector_dtype=str(dtype),
+        faiss_type=faiss_type,
+        vocab=vocab,
+        postings=postings,
+        components=components,
+    )
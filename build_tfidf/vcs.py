@@ -0,0 +1,160 @@
+"""Git-based change detection for incremental updates."""
+
+from __future__ import annotations
+
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class GitChanges:
+    commit: str
+    changed: set[Path] = field(default_factory=set)
+    deleted: set[Path] = field(default_factory=set)
+    renamed: dict[Path, Path] = field(default_factory=dict)
+
+
+def _git(cwd: Path, *args: str) -> str | None:
+    try:
+        proc = subprocess.run(
+            ["git", "-C", str(cwd), *args],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError:
+        return None
+    if proc.returncode != 0:
+        return None
+    return proc.stdout
+
+
+def head_commit(root: Path) -> str | None:
+    out = _git(root, "rev-parse", "HEAD")
+    return out.strip() if out else None
+
+
+def dirty_paths(root: Path) -> list[str]:
+    changes = diff_since(root, None)
+    if changes is None:
+        return []
+    paths = changes.changed | changes.deleted | set(changes.renamed) | set(changes.renamed.values())
+    return sorted(str(p) for p in paths)
+
+
+def _split_z(out: str) -> list[str]:
+    return [part for part in out.split("\0") if part]
+
+
+def _parse_name_status(out: str) -> list[tuple[str, list[str]]]:
+    parts = _split_z(out)
+    records: list[tuple[str, list[str]]] = []
+    i = 0
+    while i < len(parts):
+        status = parts[i]
+        width = 2 if status[0] in "RC" else 1
+        records.append((status[0], parts[i + 1 : i + 1 + width]))
+        i += 1 + width
+    return records
+
+
+def _parse_porcelain(out: str) -> list[tuple[str, list[str]]]:
+    parts = _split_z(out)
+    records: list[tuple[str, list[str]]] = []
+    i = 0
+    while i < len(parts):
+        xy, path = parts[i][:2], parts[i][3:]
+        if "R" in xy or "C" in xy:
+            # Porcelain -z prints the new path first, then the original.
+            records.append((xy, [parts[i + 1], path]))
+            i += 2
+        else:
+            records.append((xy, [path]))
+            i += 1
+    return records
+
+
+# Returns None when root is not a git checkout or commit is unknown, so callers
+# can fall back to a full scan. With commit=None only uncommitted edits are reported.
+def diff_since(root: Path, commit: str | None) -> GitChanges | None:
+    toplevel_raw = _git(root, "rev-parse", "--show-toplevel")
+    head = head_commit(root)
+    if not toplevel_raw or not head:
+        return None
+    toplevel = Path(toplevel_raw.strip())
+
+    changed: set[str] = set()
+    deleted: set[str] = set()
+    renamed: dict[str, str] = {}
+
+    def _rename(old: str, new: str) -> None:
+        for src, dst in list(renamed.items()):
+            if dst == old:
+                renamed[src] = new
+                return
+        renamed[old] = new
+
+    if commit is not None:
+        out = _git(toplevel, "diff", "--name-status", "-z", "-M", commit, "HEAD", "--")
+        if out is None:
+            return None
+        for status, paths in _parse_name_status(out):
+            if status == "R":
+                _rename(paths[0], paths[1])
+            elif status == "D":
+                deleted.add(paths[0])
+            else:
+                changed.add(paths[-1])
+
+    out = _git(toplevel, "status", "--porcelain=v1", "-z", "--untracked-files=all")
+    if out is None:
+        return None
+    for xy, paths in _parse_porcelain(out):
+        if "R" in xy:
+            _rename(paths[0], paths[1])
+            if xy[1] == "M":
+                changed.add(paths[1])
+        elif "C" in xy:
+            changed.add(paths[1])
+        elif "D" in xy:
+            deleted.add(paths[0])
+            changed.discard(paths[0])
+        else:
+            changed.add(paths[0])
+
+    # A renamed file that was edited or removed afterwards is not a pure rename.
+    for old, new in list(renamed.items()):
+        if new in changed or new in deleted:
+            del renamed[old]
+            deleted.add(old)
+
+    root_abs = root.resolve()
+
+    def _local(rel: str) -> Path | None:
+        if not rel.endswith(".md"):
+            return None
+        try:
+            sub = (toplevel / rel).resolve().relative_to(root_abs)
+        except ValueError:
+            return None
+        return root / sub
+
+    result = GitChanges(commit=head)
+    for rel in changed:
+        path = _local(rel)
+        if path is not None:
+            result.changed.add(path)
+    for rel in deleted:
+        path = _local(rel)
+        if path is not None:
+            result.deleted.add(path)
+    for old, new in renamed.items():
+        old_path, new_path = _local(old), _local(new)
+        if old_path is not None and new_path is not None:
+            result.renamed[old_path] = new_path
+        elif old_path is not None:
+            result.deleted.add(old_path)
+        elif new_path is not None:
+            result.changed.add(new_path)
+    return result
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable
+from typing import Sequence
 
 import faiss
 import numpy as np
@@ -16,10 +16,17 @@ class VectorIndex:
     dim: int
 
 
-def build_index(vectors: Iterable[list[float]]) -> VectorIndex:
-    arr = np.array(list(vectors), dtype="float32")
+def build_index(
+    vectors: np.ndarray | Sequence[Sequence[float]],
+    prefix_dim: int | None = None,
+) -> VectorIndex:
+    # Copy: normalize_L2 works in place and the input may be a read-only memmap.
+    arr = np.array(vectors, dtype="float32")
     if arr.ndim != 2:
         raise ValueError("Vectors must be 2D")
+    if prefix_dim and prefix_dim < arr.shape[1]:
+        # Matryoshka models keep most of their quality in a renormalized prefix.
+        arr = np.ascontiguousarray(arr[:, :prefix_dim])
     dim = arr.shape[1]
     index = faiss.IndexFlatIP(dim)
     faiss.normalize_L2(arr)
@@ -27,13 +34,29 @@ def build_index(vectors: Iterable[list[float]]) -> VectorIndex:
     return VectorIndex(index=index, dim=dim)
 
 
-def search(index: VectorIndex, query_vec: list[float], top_k: int) -> list[tuple[int, float]]:
+def search(index: VectorIndex, query_vec: Sequence[float], top_k: int) -> list[tuple[int, float]]:
     vec = np.array([query_vec], dtype="float32")
+    if vec.shape[1] > index.dim:
+        vec = np.ascontiguousarray(vec[:, : index.dim])
     faiss.normalize_L2(vec)
     scores, ids = index.index.search(vec, top_k)
     return list(zip(ids[0].tolist(), scores[0].tolist()))
 
 
+def rescore(full_vectors: np.ndarray, query_vec: Sequence[float], ids: Sequence[int]) -> list[tuple[int, float]]:
+    ids = sorted({int(i) for i in ids if i >= 0})
+    if not ids:
+        return []
+    # Fancy indexing on a memmap only pages in the candidate rows.
+    rows = np.array(full_vectors[ids], dtype="float32")
+    faiss.normalize_L2(rows)
+    vec = np.array([query_vec], dtype="float32")
+    faiss.normalize_L2(vec)
+    scores = rows @ vec[0]
+    order = np.argsort(-scores, kind="stable")
+    return [(ids[i], float(scores[i])) for i in order]
+
+
 def save(index: VectorIndex, path: Path) -> None:
     faiss.write_index(index.index, str(path))
 
@@ -41,3 +64,8 @@ def save(index: VectorIndex, path: Path) -> None:
 def load(path: Path) -> VectorIndex:
     idx = faiss.read_index(str(path))
     return VectorIndex(index=idx, dim=idx.d)
+
+
+def load_bytes(data: bytes) -> VectorIndex:
+    idx = faiss.deserialize_index(np.frombuffer(data, dtype="uint8"))
+    return VectorIndex(index=idx, dim=idx.d)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+import build_tfidf.index as index
+from build_tfidf.embeddings import EmbeddingConfig
+
+
+# Module-level artifact locations in build_tfidf.index, all under DATA_DIR.
+ARTIFACTS = (
+    "VEC_PATH",
+    "VECTORS_PATH",
+    "META_PATH",
+    "MANIFEST_PATH",
+    "LEX_PATH",
+    "CHUNKS_PATH",
+    "QUERY_CACHE_PATH",
+    "LOCAL_MODEL_PATH",
+    "SLOTS_PATH",
+    "BATCH_DIR",
+)
+
+EMBED_CONFIG = EmbeddingConfig(
+    provider="openai",
+    model="text-embedding-3-large",
+    dimensions=None,
+    batch_size=32,
+    rpm_limit=60,
+    fallback_to_ollama=False,
+    ollama_model="nomic-embed-text",
+)
+
+
+@pytest.fixture
+def use_data_dir(monkeypatch) -> Callable[[Path], Path]:
+    # Call with a directory to point every index artifact into it.
+    names = {name: getattr(index, name).name for name in ARTIFACTS}
+
+    def _use(data_dir: Path) -> Path:
+        monkeypatch.setattr(index, "DATA_DIR", data_dir)
+        for name, filename in names.items():
+            monkeypatch.setattr(index, name, data_dir / filename)
+        return data_dir
+
+    return _use
+
+
+@pytest.fixture
+def embed_config(use_data_dir, tmp_path: Path) -> EmbeddingConfig:
+    # The index lives in tmp_path / "data"; queries and builds use this config.
+    use_data_dir(tmp_path / "data")
+    return EMBED_CONFIG
+
+
+@pytest.fixture
+def embedded(monkeypatch) -> list[list[str]]:
+    # Embeds texts as alpha/beta/gamma counts, cut to any requested width, and
+    # records the texts of each call.
+    calls: list[list[str]] = []
+
+    def _fake_embed(texts, cfg=None, **_kwargs):
+        calls.append(list(texts))
+        width = cfg.dimensions if cfg is not None and cfg.dimensions else 3
+        return [[float(t.count(w)) for w in ("alpha", "beta", "gamma")][:width] for t in calls[-1]]
+
+    monkeypatch.setattr(index, "embed_texts", _fake_embed)
+    return calls
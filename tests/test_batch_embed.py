@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import base64
+import json
+import threading
+from dataclasses import replace
+from email.parser import BytesParser
+from email.policy import default
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import build_tfidf.index as index
+from build_tfidf import batch_embed
+
+
+def _vector(text: str) -> list[float]:
+    return [float(text.count("alpha")), float(text.count("beta")), float(text.count("gamma")), 1.0]
+
+
+def _b64(text: str) -> str:
+    return base64.b64encode(np.asarray(_vector(text), dtype="<f4").tobytes()).decode("ascii")
+
+
+class _FakeOpenAI:
+    # Just enough of the files, batches and embeddings endpoints for the SDK.
+    def __init__(self, reject: set[str]) -> None:
+        self.files: dict[str, bytes] = {}
+        self.batches: dict[str, dict] = {}
+        self.reject = reject
+        self.calls = {"upload": 0, "batch": 0, "embeddings": 0}
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *_args) -> None:
+                pass
+
+            def _send(self, payload: dict | bytes) -> None:
+                body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self) -> None:
+                raw = self.rfile.read(int(self.headers["Content-Length"]))
+                if self.path.endswith("/files"):
+                    self._send(fake.upload(self.headers["Content-Type"], raw))
+                elif self.path.endswith("/batches"):
+                    self._send(fake.create(json.loads(raw)))
+                else:
+                    self._send(fake.embed(json.loads(raw)))
+
+            def do_GET(self) -> None:
+                if self.path.endswith("/content"):
+                    self._send(fake.files[self.path.split("/")[-2]])
+                else:
+                    self._send(fake.retrieve(self.path.split("/")[-1]))
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def upload(self, content_type: str, raw: bytes) -> dict:
+        self.calls["upload"] += 1
+        msg = BytesParser(policy=default).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + raw)
+        content = next(p for p in msg.iter_parts() if p.get_param("name", header="content-disposition") == "file")
+        file_id = f"file-{len(self.files)}"
+        self.files[file_id] = content.get_payload(decode=True)
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(self.files[file_id]),
+            "created_at": 0,
+            "filename": "requests.jsonl",
+            "purpose": "batch",
+            "status": "processed",
+        }
+
+    def create(self, body: dict) -> dict:
+        self.calls["batch"] += 1
+        batch_id = f"batch-{len(self.batches)}"
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"],
+            "completion_window": "24h",
+            "created_at": 0,
+            "status": "validating",
+            "output_file_id": None,
+        }
+        return self.batches[batch_id]
+
+    def retrieve(self, batch_id: str) -> dict:
+        batch = self.batches[batch_id]
+        if batch["status"] == "validating":
+            batch["status"] = "in_progress"
+        elif batch["status"] == "in_progress":
+            lines = []
+            for line in self.files[batch["input_file_id"]].decode("utf-8").splitlines():
+                request = json.loads(line)
+                if request["custom_id"] in self.reject:
+                    response = {"status_code": 500, "body": {"error": {"message": "server error"}}}
+                else:
+                    inputs = request["body"]["input"]
+                    data = [{"object": "embedding", "index": i, "embedding": _b64(t)} for i, t in enumerate(inputs)]
+                    response = {"status_code": 200, "body": {"object": "list", "data": data}}
+                lines.append(json.dumps({"custom_id": request["custom_id"], "response": response, "error": None}))
+            output_id = f"file-{len(self.files)}"
+            self.files[output_id] = "\n".join(lines).encode("utf-8")
+            batch.update(status="completed", output_file_id=output_id)
+        return batch
+
+    def embed(self, body: dict) -> dict:
+        self.calls["embeddings"] += 1
+        data = [{"object": "embedding", "index": i, "embedding": _b64(t)} for i, t in enumerate(body["input"])]
+        usage = {"prompt_tokens": 0, "total_tokens": 0}
+        return {"object": "list", "data": data, "model": body["model"], "usage": usage}
+
+
+class _Interrupted(Exception):
+    pass
+
+
+def test_batch_submit_build_resumes_and_fills_rejected(monkeypatch, embed_config, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for word in ["alpha", "beta", "gamma"]:
+        (corpus / f"{word}.md").write_text(f"# {word}\n\n{word} note", encoding="utf-8")
+
+    fake = _FakeOpenAI(reject={"1-2"})
+    monkeypatch.setenv("OPENAI_BASE_URL", fake.url)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    cfg = replace(embed_config, batch_size=1, rpm_limit=0, max_retries=0)
+
+    def _interrupt(_seconds):
+        raise _Interrupted
+
+    # The first run is stopped while the batch is still in progress.
+    monkeypatch.setattr(batch_embed.time, "sleep", _interrupt)
+    with pytest.raises(_Interrupted):
+        index.build(corpus, cfg, batch_submit=True, batch_poll=0)
+    state = json.loads((index.BATCH_DIR / "state.json").read_text())
+    assert [job["batch_id"] for job in state["jobs"]] == ["batch-0"]
+    assert not index.META_PATH.exists()
+
+    monkeypatch.setattr(batch_embed.time, "sleep", lambda _seconds: None)
+    index.build(corpus, cfg, batch_submit=True, batch_poll=0)
+    # Resumed from state: nothing uploaded or submitted twice, and only the
+    # rejected request went through the synchronous endpoint.
+    assert fake.calls == {"upload": 1, "batch": 1, "embeddings": 1}
+    assert not index.BATCH_DIR.exists()
+
+    chunks = [json.loads(line) for line in index.CHUNKS_PATH.read_text().splitlines()]
+    assert np.array_equal(np.load(index.VECTORS_PATH), [_vector(c["text"]) for c in chunks])
+    hits = index.query("gamma", cfg, top_k=1, mode="semantic", use_cache=False)
+    assert hits[0][0]["path"].endswith("gamma.md")
+    fake.server.shutdown()
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import build_tfidf.index as index
+from build_tfidf import bundle
+from build_tfidf.searcher import Searcher
+
+
+def test_bundle_round_trip_and_serving(embedded, embed_config, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "alpha.md").write_text("# Alpha\n\nalpha note", encoding="utf-8")
+    (corpus / "beta.md").write_text("# Beta\n\nbeta note", encoding="utf-8")
+
+    cfg = embed_config
+    index.build(corpus, cfg)
+    expected = index.query('"beta note"', cfg, top_k=2, use_cache=False)
+
+    packed = tmp_path / "index.tfpack"
+    header = index.export_bundle(packed)
+    assert bundle.read_header(packed).meta["index_signature"] == header.meta["index_signature"]
+    assert all(s.offset % bundle.ALIGN == 0 for s in header.sections.values())
+    assert bundle.verify(packed) == []
+
+    loaded = index.load_bundle(packed)
+    assert isinstance(loaded.vectors, np.memmap)
+    assert np.array_equal(loaded.vectors, index._load_vectors())
+    assert Searcher(packed, cfg).search('"beta note"', top_k=2) == expected
+
+    host = tmp_path / "host"
+    index.import_bundle(packed, host)
+    assert Searcher(host, cfg).search('"beta note"', top_k=2) == expected
+
+    raw = bytearray(packed.read_bytes())
+    raw[header.sections["lexical.json"].offset] ^= 0xFF
+    packed.write_bytes(bytes(raw))
+    assert bundle.verify(packed) == ["lexical.json"]
+    with pytest.raises(SystemExit):
+        index.import_bundle(packed, tmp_path / "other")
+
+
+def test_import_removes_artifacts_the_bundle_lacks(embedded, embed_config, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for word in ["alpha", "beta", "gamma"]:
+        (corpus / f"{word}.md").write_text(f"# {word}\n\n{word} note", encoding="utf-8")
+    cfg = embed_config
+    index.build(corpus, cfg)
+    # Indexes from before slots were recorded have no slots.npz and bundle without one.
+    index.SLOTS_PATH.unlink()
+    expected = index.query("gamma", cfg, top_k=3, use_cache=False)
+    packed = tmp_path / "index.tfpack"
+    index.export_bundle(packed)
+    assert "slots.npz" not in bundle.read_header(packed).sections
+
+    # The host still holds an older index whose slots map every chunk to slot 0.
+    host = tmp_path / "host"
+    host.mkdir()
+    np.savez(host / "slots.npz", aliases=np.zeros(3, dtype="<i8"), fingerprints=np.zeros(1, dtype="<u8"))
+    (host / "lexical.00042.npz").write_bytes(b"stale segment")
+    index.import_bundle(packed, host)
+    assert not (host / "slots.npz").exists()
+    assert not (host / "lexical.00042.npz").exists()
+    assert not [p for p in host.iterdir() if p.name.startswith(".import-")]
+    assert Searcher(host, cfg).search("gamma", top_k=3) == expected
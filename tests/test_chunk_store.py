@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from build_tfidf import chunk_store
+from build_tfidf.chunking import chunk_id
+
+
+def _chunks(n: int) -> list[dict]:
+    out = []
+    for i in range(n):
+        text = f"chunk {i} é"
+        out.append({"path": f"doc{i % 3}.md", "heading": "", "chunk_index": i, "text": text, "sha256": chunk_id("x", i, text)})
+    return out
+
+
+def test_chunk_store_lookup(tmp_path: Path):
+    chunks = _chunks(50)
+    path = tmp_path / "chunks.jsonl"
+    chunk_store.save(chunks, path)
+
+    store = chunk_store.load(path)
+    assert store is not None
+    assert len(store) == 50
+    assert chunk_store.get(store, 7) == chunks[7]
+    assert chunk_store.get_many(store, [3, 0, 49]) == [chunks[3], chunks[0], chunks[49]]
+    for pos in (0, 21, 49):
+        assert chunk_store.find(store, chunks[pos]["sha256"]) == pos
+    assert chunk_store.find(store, "0" * 64) is None
+    assert chunk_store.find(store, "not-hex") is None
+
+
+def test_cli_inspect_uses_chunk_store(monkeypatch, tmp_path: Path, capsys):
+    import build_tfidf.cli as cli
+    import build_tfidf.index as index
+
+    chunks = _chunks(5)
+    monkeypatch.setattr(index, "CHUNKS_PATH", tmp_path / "chunks.jsonl")
+    monkeypatch.setattr(index, "MANIFEST_PATH", tmp_path / "missing.json")
+    chunk_store.save(chunks, index.CHUNKS_PATH)
+
+    rc = cli.main(["inspect", chunks[2]["sha256"]])
+    assert rc == 0
+    assert json.loads(capsys.readouterr().out) == chunks[2]
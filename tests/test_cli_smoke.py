@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import pytest
+
 import build_tfidf.cli as cli
 
 
@@ -81,3 +83,11 @@ def test_cli_query_pbcopy_invalid(monkeypatch):
         assert True
     else:
         assert False
+
+
+def test_cli_build_rejects_non_positive_search_dims(monkeypatch, capsys):
+    monkeypatch.setattr(cli, "build_index", lambda *args, **kwargs: pytest.fail("build must not run"))
+    for value in ["0", "-2"]:
+        with pytest.raises(SystemExit):
+            cli.main(["build", "--search-dims", value])
+    assert "positive integer" in capsys.readouterr().err
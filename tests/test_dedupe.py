@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+import build_tfidf.index as index
+from build_tfidf.dedupe import assign_slots, assign_texts, simhash
+
+
+LICENSE = (
+    "# License\n\nPermission is hereby granted, free of charge, to any person obtaining a copy "
+    "of this software and associated documentation files, to deal in the software without "
+    "restriction, including without limitation the rights to use, copy, modify, merge, publish, "
+    "distribute, sublicense, and or sell copies of the software, subject to the following conditions."
+)
+
+
+def test_simhash_groups_near_duplicates():
+    near = LICENSE.replace("following conditions", "following condition")
+    prints = [simhash(LICENSE), simhash(near), simhash("# Alpha\n\nalpha note about rivers")]
+    slots, new = assign_slots(prints, [], max_distance=3)
+    assert slots == [0, 0, 1]
+    assert len(new) == 2
+    assert assign_slots(prints, [], max_distance=-1)[0] == [0, 1, 2]
+
+
+def test_duplicates_share_vector_slots(monkeypatch, embed_config, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for name in ["a", "b", "c"]:
+        (corpus / f"{name}.md").write_text(LICENSE, encoding="utf-8")
+    (corpus / "alpha.md").write_text("# Alpha\n\nalpha note", encoding="utf-8")
+
+    embedded: list[str] = []
+
+    def _fake_embed(texts, _cfg=None, **_kwargs):
+        embedded.extend(texts)
+        return [[float(t.count("alpha")), float(t.count("License")), 1.0] for t in texts]
+
+    monkeypatch.setattr(index, "embed_texts", _fake_embed)
+    cfg = embed_config
+    index.build(corpus, cfg)
+    assert len(embedded) == 2
+    assert index._load_vectors().shape[0] == 2
+
+    results = index.query("License permission", cfg, top_k=5, use_cache=False)
+    assert {Path(c["path"]).name for c, _ in results} == {"a.md", "b.md", "c.md", "alpha.md"}
+    collapsed = index.query("License permission", cfg, top_k=5, use_cache=False, collapse_duplicates=True)
+    assert [Path(c["path"]).name for c, _ in collapsed] == ["a.md", "alpha.md"]
+    assert sorted(Path(p).name for p in collapsed[0][0]["duplicates"]) == ["b.md", "c.md"]
+
+    # A new copy reuses the slot; removing the first copy keeps it alive.
+    embedded.clear()
+    (corpus / "d.md").write_text(LICENSE, encoding="utf-8")
+    (corpus / "a.md").unlink()
+    index.update(corpus, cfg)
+    assert embedded == []
+    assert index._load_vectors().shape[0] == 2
+    aliases, _ = index._load_slots(index.SLOTS_PATH)
+    assert sorted(np.bincount(aliases).tolist()) == [1, 3]
+    names = {Path(c["path"]).name for c, _ in index.query("License", cfg, top_k=5, use_cache=False)}
+    assert names == {"b.md", "c.md", "d.md", "alpha.md"}
+
+
+def test_near_duplicates_keep_their_own_lexical_rows(monkeypatch, embed_config, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "a.md").write_text(LICENSE, encoding="utf-8")
+    (corpus / "b.md").write_text(LICENSE.replace("conditions", "zanzibar"), encoding="utf-8")
+    (corpus / "alpha.md").write_text("# Alpha\n\nalpha note", encoding="utf-8")
+
+    monkeypatch.setattr(index, "embed_texts", lambda texts, _cfg=None, **_kwargs: [[1.0, 0.0]] * len(texts))
+    cfg = embed_config
+
+    # By default only exact duplicates share a slot.
+    index.build(corpus, cfg)
+    assert index._load_vectors().shape[0] == 3
+
+    # Grouped near-duplicates share a vector, but the later copy's own words still match.
+    index.build(corpus, cfg, dedupe_distance=3)
+    assert index._load_vectors().shape[0] == 2
+    hits = index.query("zanzibar", cfg, top_k=1, mode="lexical", use_cache=False)
+    assert Path(hits[0][0]["path"]).name == "b.md"
+
+    (corpus / "c.md").write_text(LICENSE.replace("conditions", "quokka"), encoding="utf-8")
+    index.update(corpus, cfg, dedupe_distance=3)
+    assert index._load_vectors().shape[0] == 2
+    hits = index.query("quokka", cfg, top_k=1, mode="lexical", use_cache=False)
+    assert Path(hits[0][0]["path"]).name == "c.md"
+
+
+def test_default_groups_identical_text_only():
+    # Case is invisible to SimHash, so these collide without being duplicates.
+    edited = LICENSE.replace("Permission", "PERMISSION")
+    assert simhash(edited) == simhash(LICENSE)
+    slots, prints = assign_texts([LICENSE, edited, LICENSE], [], [])
+    assert slots == [0, 1, 0]
+    assert len(prints) == 2
+    # Existing slots are matched by their text as well.
+    assert assign_texts([edited, LICENSE], prints[:1], [LICENSE])[0] == [1, 0]
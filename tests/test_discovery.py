@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from build_tfidf.ingest import discover_markdown_files, iter_markdown_files
+
+
+def _make_tree(root: Path) -> None:
+    for rel in [
+        "a.md",
+        "notes/b.md",
+        "notes/deep/c.md",
+        "notes/deep/skip.txt",
+        "node_modules/pkg/readme.md",
+        ".git/info.md",
+        "drafts/d.md",
+        "logs/keep.md",
+        "logs/e.md",
+    ]:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"# {rel}\n", encoding="utf-8")
+    (root / ".gitignore").write_text("drafts/\nlogs/*.md\n!logs/keep.md\n", encoding="utf-8")
+
+
+def test_discovery_prunes_excludes_and_gitignore(tmp_path: Path):
+    _make_tree(tmp_path)
+    found = [f.path.relative_to(tmp_path).as_posix() for f in discover_markdown_files(tmp_path)]
+    assert found == ["a.md", "logs/keep.md", "notes/b.md", "notes/deep/c.md"]
+
+
+def test_discovery_without_gitignore(tmp_path: Path):
+    _make_tree(tmp_path)
+    found = {f.path.relative_to(tmp_path).as_posix() for f in discover_markdown_files(tmp_path, respect_gitignore=False)}
+    assert "drafts/d.md" in found
+    assert "logs/e.md" in found
+    assert "node_modules/pkg/readme.md" not in found
+
+
+def test_discovery_parallel_matches_serial(tmp_path: Path):
+    _make_tree(tmp_path)
+    serial = discover_markdown_files(tmp_path)
+    parallel = discover_markdown_files(tmp_path, workers=4)
+    assert serial == parallel
+    for f in serial:
+        st = f.path.stat()
+        assert f.mtime == st.st_mtime
+        assert f.size == st.st_size
+    assert iter_markdown_files(tmp_path) == [f.path for f in serial]
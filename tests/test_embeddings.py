@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import base64
+from pathlib import Path
+
+import numpy as np
+import openai
+import pytest
+
+import build_tfidf.embeddings as embeddings
+import build_tfidf.index as index
+from build_tfidf.chunking import chunk_text
+from build_tfidf.embeddings import EmbeddingConfig, EmbeddingError, pack_batches
+
+
+def _config(**overrides) -> EmbeddingConfig:
+    fields = dict(
+        provider="openai",
+        model="text-embedding-3-large",
+        dimensions=None,
+        batch_size=100,
+        rpm_limit=0,
+        fallback_to_ollama=False,
+        ollama_model="nomic-embed-text",
+        batch_tokens=1000,
+    )
+    fields.update(overrides)
+    return EmbeddingConfig(**fields)
+
+
+def _fake_client(monkeypatch, fail_on: dict[int, Exception], reshape=lambda rows: rows) -> list[list[str]]:
+    # Records every request; the request numbers in `fail_on` raise instead,
+    # and `reshape` edits the rows of every response.
+    requests: list[list[str]] = []
+
+    class _Row:
+        def __init__(self, i: int, encoding_format: str | None) -> None:
+            self.index = i
+            vec = np.array([float(i), 1.0], dtype="<f4")
+            self.embedding = base64.b64encode(vec.tobytes()).decode() if encoding_format == "base64" else vec.tolist()
+
+    class _Resp:
+        def __init__(self, n: int, encoding_format: str | None) -> None:
+            self.data = reshape([_Row(i, encoding_format) for i in range(n)])
+
+    class _Embeddings:
+        def create(self, model, input, dimensions, encoding_format=None):
+            requests.append(list(input))
+            exc = fail_on.pop(len(requests), None)
+            if exc is not None:
+                raise exc
+            return _Resp(len(input), encoding_format)
+
+    class _Client:
+        def __init__(self, **_kwargs) -> None:
+            self.embeddings = _Embeddings()
+
+    monkeypatch.setattr(embeddings, "OpenAI", _Client)
+    monkeypatch.setattr(embeddings.time, "sleep", lambda _s: None)
+    return requests
+
+
+def _rate_limited() -> openai.RateLimitError:
+    # Built without an HTTP response; only the type matters to the retry loop.
+    exc = openai.RateLimitError.__new__(openai.RateLimitError)
+    Exception.__init__(exc, "rate limited")
+    return exc
+
+
+def test_pack_batches_respects_token_budget_and_input_cap():
+    assert pack_batches([10, 10, 10, 10], max_inputs=3, max_tokens=100) == [(0, 3), (3, 4)]
+    assert pack_batches([60, 50, 10, 500, 5], max_inputs=10, max_tokens=100) == [(0, 1), (1, 3), (3, 4), (4, 5)]
+    assert pack_batches([], max_inputs=4, max_tokens=100) == []
+
+
+def test_chunks_carry_token_counts():
+    chunks = chunk_text(Path("a.md"), "# Title\n\n" + "word " * 50, max_tokens=20, overlap=0)
+    assert chunks
+    assert all(0 < c.token_count <= 20 + 5 for c in chunks)
+
+
+def test_embed_openai_packs_requests(monkeypatch):
+    requests = _fake_client(monkeypatch, {})
+    texts = [f"t{i}" for i in range(10)]
+    out = embeddings.embed_texts(texts, _config(), token_counts=[400] * 10)
+    assert [len(r) for r in requests] == [2, 2, 2, 2, 2]
+    # base64 rows land in one float32 matrix in input order.
+    assert isinstance(out, np.ndarray) and out.dtype == np.float32
+    assert out.tolist() == [[float(i % 2), 1.0] for i in range(10)]
+
+
+def test_rows_are_placed_by_index_and_counted(monkeypatch):
+    _fake_client(monkeypatch, {}, reshape=lambda rows: rows[::-1])
+    out = embeddings.embed_texts([f"t{i}" for i in range(4)], _config(), token_counts=[400] * 4)
+    assert out.tolist() == [[float(i % 2), 1.0] for i in range(4)]
+
+    _fake_client(monkeypatch, {}, reshape=lambda rows: rows[:-1])
+    with pytest.raises(EmbeddingError, match="expected 2 embeddings"):
+        embeddings.embed_texts([f"t{i}" for i in range(4)], _config(), token_counts=[400] * 4)
+
+
+def test_transient_error_retries_only_that_batch(monkeypatch):
+    requests = _fake_client(monkeypatch, {3: _rate_limited()})
+    out = embeddings.embed_texts([f"t{i}" for i in range(10)], _config(), token_counts=[400] * 10)
+    assert len(out) == 10
+    assert len(requests) == 6
+    assert requests[2] == requests[3]
+
+
+def test_exhausted_retries_keep_completed_vectors(monkeypatch):
+    _fake_client(monkeypatch, {n: _rate_limited() for n in range(3, 10)})
+    with pytest.raises(EmbeddingError) as info:
+        embeddings.embed_texts([f"t{i}" for i in range(10)], _config(max_retries=2), token_counts=[400] * 10)
+    assert len(info.value.vectors) == 4
+
+
+def test_failover_is_reported(monkeypatch):
+    _fake_client(monkeypatch, {2: ValueError("bad request")})
+    monkeypatch.setattr(embeddings, "embed_ollama", lambda texts, _cfg: [[1.0]] * len(texts))
+    failovers = []
+    out = embeddings.embed_texts(
+        [f"t{i}" for i in range(10)],
+        _config(fallback_to_ollama=True),
+        token_counts=[400] * 10,
+        on_failover=failovers.append,
+    )
+    assert out == [[1.0]] * 10
+    assert [(f.to_provider, f.model, f.completed) for f in failovers] == [("ollama", "nomic-embed-text", 2)]
+
+    cfg = index.index_config({"failover": {"to_provider": "ollama"}, "embedding_model": "nomic-embed-text"}, _config())
+    assert (cfg.provider, cfg.ollama_model, cfg.fallback_to_ollama) == ("ollama", "nomic-embed-text", False)
+
+
+def test_missing_api_key_fails_over(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr(embeddings, "embed_ollama", lambda texts, _cfg: [[1.0]] * len(texts))
+    failovers = []
+    out = embeddings.embed_texts(["a", "b"], _config(fallback_to_ollama=True), on_failover=failovers.append)
+    assert out == [[1.0], [1.0]]
+    assert [(f.to_provider, f.completed) for f in failovers] == [("ollama", 0)]
+    with pytest.raises(EmbeddingError):
+        embeddings.embed_texts(["a"], _config())
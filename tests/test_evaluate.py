@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import build_tfidf.cli as cli
+import build_tfidf.index as index
+from build_tfidf import evaluate
+from build_tfidf.scoring import rrf_scores
+
+
+def test_score_query_metrics():
+    recall, rr, ndcg = evaluate.score_query(["x/b.md", "x/a.md", "x/c.md"], ["a.md", "c.md"], k=2)
+    assert (recall, rr) == (0.5, 0.5)
+    assert abs(ndcg - (1 / 1.5849625) / (1 + 1 / 1.5849625)) < 1e-6
+    assert evaluate.score_query(["a.md"], ["a.md"], k=5) == (1.0, 1.0, 1.0)
+
+
+def test_rrf_uses_ranks():
+    fused = rrf_scores({1: 0.9, 2: 0.1}, {2: 50.0, 3: 1.0}, 0.5, 0.5, k=1)
+    assert [doc for doc, _ in fused] == [2, 1, 3]
+
+
+def test_eval_sweep_on_gold_queries(monkeypatch, embedded, embed_config, tmp_path: Path, capsys):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "alpha.md").write_text("# Alpha\n\nalpha note", encoding="utf-8")
+    (corpus / "beta.md").write_text("# Beta\n\nbeta note", encoding="utf-8")
+
+    cfg = embed_config
+    index.build(corpus, cfg)
+
+    gold_path = Path(__file__).parent / "data" / "gold_queries.jsonl"
+    gold = evaluate.load_gold(gold_path)
+    [report] = evaluate.run(gold, cfg)
+    assert (report.queries, report.hit_rate, report.mrr) == (2, 1.0, 1.0)
+    assert set(report.latency) == set(evaluate.STAGES)
+
+    reports = evaluate.run(gold, cfg, sweep=True)
+    assert len(reports) == len(evaluate.sweep_settings(index.load_index()))
+    best = evaluate.cheapest(reports, 0.8)
+    assert best is not None and best.settings.ranking.candidate_multiplier == 2
+
+    monkeypatch.setattr(cli, "load_config_from_env", lambda: cfg)
+    assert cli.main(["eval", str(gold_path), "--sweep"]) == 0
+    assert "Cheapest meeting hit@5 >= 80%" in capsys.readouterr().out
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import build_tfidf.index as index
+
+
+def test_fresh_query_overlays_edited_and_deleted_files(monkeypatch, embed_config, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    license_text = "license permission notice granted to copy and modify"
+    (corpus / "alpha.md").write_text("# Alpha\n\nalpha note", encoding="utf-8")
+    (corpus / "beta.md").write_text("# Beta\n\nbeta note", encoding="utf-8")
+    (corpus / "one.md").write_text(license_text, encoding="utf-8")
+    (corpus / "two.md").write_text(license_text, encoding="utf-8")
+
+    calls = {"texts": 0}
+
+    def _fake_embed(texts, _cfg=None, **_kwargs):
+        calls["texts"] += len(texts)
+        return [[float(t.count("alpha")), float(t.count("beta")), float(t.count("gamma")), 0.1] for t in texts]
+
+    monkeypatch.setattr(index, "embed_texts", _fake_embed)
+    cfg = embed_config
+    index.build(corpus, cfg)
+
+    (corpus / "alpha.md").write_text("# Alpha\n\ngamma rewrite", encoding="utf-8")
+    (corpus / "beta.md").unlink()
+    (corpus / "one.md").write_text("unrelated words", encoding="utf-8")
+    # A touch without a content change is not re-embedded.
+    (corpus / "two.md").write_text(license_text, encoding="utf-8")
+
+    def _names(hits):
+        return [Path(c["path"]).name for c, _ in hits]
+
+    stale = index.query("gamma beta", cfg, top_k=4, use_cache=False)
+    assert "beta.md" in _names(stale)
+
+    calls["texts"] = 0
+    hits = index.query("gamma beta", cfg, top_k=4, fresh=True)
+    names = _names(hits)
+    assert names[0] == "alpha.md"
+    assert "gamma rewrite" in hits[0][0]["text"]
+    assert "beta.md" not in names
+    # One query embedding plus the two edited files' chunks.
+    assert calls["texts"] == 3
+
+    # two.md still holds the slot it shared with the edited one.md.
+    hits = index.query("license permission", cfg, top_k=4, fresh=True, mode="lexical")
+    assert _names(hits)[0] == "two.md"
+    assert "one.md" not in _names(hits)[:1]
+    assert all("license" not in c["text"] for c, _ in hits if c["path"].endswith("one.md"))
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from build_tfidf.lexical import build_index, match_constraints, parse_query, search
+from build_tfidf.scoring import boost_scores
+
+
+TEXTS = [
+    "connection refused by upstream while the retry loop waited",
+    "the upstream refused a connection attempt",
+    "set max_retries in config before the retry error",
+]
+
+
+def test_parse_query_extracts_phrases_and_near():
+    c = parse_query('"connection refused" upstream NEAR/2 retry')
+    assert c.phrases == [["connection", "refused"]]
+    assert c.near == [("upstream", "retry", 2)]
+    assert "NEAR" not in c.text
+    assert not parse_query("plain words only")
+
+
+def test_phrase_and_near_use_positions():
+    index = build_index(TEXTS)
+    assert match_constraints(index, parse_query('"connection refused"')) == {0}
+    assert match_constraints(index, parse_query('"refused a connection"')) == {1}
+    assert match_constraints(index, parse_query("config NEAR/3 retry")) == {2}
+    assert match_constraints(index, parse_query("config NEAR/1 retry")) == set()
+    assert match_constraints(index, parse_query('"connection refused" upstream NEAR/1 retry')) == set()
+
+
+def test_operators_do_not_leak_into_bm25():
+    index = build_index(TEXTS)
+    assert search(index, "upstream NEAR/5 retry", top_k=3) == search(index, "upstream retry", top_k=3)
+
+
+def test_boost_promotes_exact_matches():
+    fused = [(1, 0.9), (2, 0.5)]
+    assert boost_scores(fused, {0, 2}, 1.0) == [(2, 1.5), (0, 1.0), (1, 0.9)]
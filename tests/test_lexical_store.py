@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import pytest
+
+from build_tfidf import lexical_store
+from build_tfidf.lexical import build_index, match_constraints, parse_query, search
+
+
+TEXTS = [
+    "connection refused by upstream while the retry loop waited",
+    "the upstream refused a connection attempt",
+    "set max_retries in config before the retry error",
+    "license terms and permission notice",
+]
+
+
+def _apply(texts, path, keep, new):
+    # Mirror index.update: survivors renumbered in order, new slots appended.
+    renumber = np.full(len(texts), -1, dtype=np.int64)
+    renumber[keep] = np.arange(len(keep))
+    lexical_store.update(path, renumber, new)
+    return [texts[i] for i in keep] + new
+
+
+def _assert_same_scores(path, texts):
+    index = lexical_store.load(path)
+    fresh = build_index(texts)
+    assert index.stats.n_docs == len(texts)
+    for q in ["upstream retry", "connection", "the", "license permission", "config error notice"]:
+        got = search(index, q, top_k=len(texts))
+        want = search(fresh, q, top_k=len(texts))
+        assert [doc for doc, _ in got] == [doc for doc, _ in want]
+        assert np.allclose([s for _, s in got], [s for _, s in want])
+
+
+def test_update_appends_segment_and_tombstones(tmp_path):
+    path = tmp_path / "lexical.json"
+    lexical_store.write(path, TEXTS)
+    texts = _apply(TEXTS, path, [0, 2, 3], ["retry budget exceeded upstream"])
+
+    manifest = json.loads(path.read_text())
+    assert [s["docs"] for s in manifest["segments"]] == [4, 1]
+    assert [s["dead"] for s in manifest["segments"]] == [1, 0]
+    _assert_same_scores(path, texts)
+
+    positional = lexical_store.load(path)
+    assert match_constraints(positional, parse_query('"retry budget"')) == {3}
+    assert match_constraints(positional, parse_query('"refused a connection"')) == set()
+
+
+def test_threshold_merges_keep_scores(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical_store, "MAX_SEGMENTS", 2)
+    path = tmp_path / "lexical.json"
+    lexical_store.write(path, TEXTS)
+    texts = list(TEXTS)
+    for i in range(4):
+        texts = _apply(texts, path, list(range(len(texts))), [f"note {i} about upstream config"])
+        assert len(json.loads(path.read_text())["segments"]) <= 2
+    previous = {p.name for p in lexical_store.files(path)}
+    texts = _apply(texts, path, [1, 3, 5], [])
+    _assert_same_scores(path, texts)
+
+    manifest = json.loads(path.read_text())
+    assert [s["dead"] for s in manifest["segments"]] == [0]
+    # The previous generation's files stay for readers of the old manifest;
+    # anything older is gone.
+    on_disk = {p.name for p in tmp_path.iterdir()}
+    assert on_disk == {path.name, *(p.name for p in lexical_store.files(path))} | previous
+
+
+def test_positions_are_stored_with_segments(tmp_path, monkeypatch):
+    path = tmp_path / "lexical.json"
+    lexical_store.write(path, TEXTS)
+    _apply(TEXTS, path, [0, 1, 2, 3], ["retry budget exceeded upstream"])
+    queries = {'"connection refused"': {0}, '"retry budget"': {4}, "budget NEAR/2 upstream": {4}}
+
+    # Phrase and NEAR queries read the stored positions instead of rebuilding them.
+    with monkeypatch.context() as m:
+        m.setattr(lexical_store, "posting_positions", lambda *_args: pytest.fail("positions rebuilt"))
+        index = lexical_store.load(path)
+        assert {q: match_constraints(index, parse_query(q)) for q in queries} == queries
+
+    # Segments written without positions still answer the same.
+    for part in lexical_store.files(path):
+        if part.suffix == ".npz":
+            with np.load(part) as data:
+                arrays = {name: data[name] for name in data.files if name != "post_pos"}
+            with part.open("wb") as fh:
+                np.savez(fh, **arrays)
+    index = lexical_store.load(path)
+    assert {q: match_constraints(index, parse_query(q)) for q in queries} == queries
+
+
+def test_previous_manifest_stays_readable_for_one_commit(tmp_path):
+    path = tmp_path / "lexical.json"
+    lexical_store.write(path, TEXTS)
+    old = json.loads(path.read_text())
+    # Dropping half the docs merges them into a new segment the old manifest does not name.
+    texts = _apply(TEXTS, path, [0, 1], [])
+    index = lexical_store.load_from(old, lambda name: path.with_name(name).read_bytes())
+    assert index.stats.n_docs == len(TEXTS)
+
+    _apply(texts, path, [0, 1], ["retry budget"])
+    with pytest.raises(FileNotFoundError):
+        lexical_store.load_from(old, lambda name: path.with_name(name).read_bytes())
+
+
+def test_legacy_texts_manifest_migrates(tmp_path):
+    path = tmp_path / "lexical.json"
+    path.write_text(json.dumps({"texts": TEXTS}))
+    assert search(lexical_store.load(path), "upstream", top_k=2) == search(build_index(TEXTS), "upstream", top_k=2)
+    texts = _apply(TEXTS, path, [1, 2], ["upstream mirror"])
+    _assert_same_scores(path, texts)
+
+
+def test_scores_match_okapi_reference():
+    rank_bm25 = pytest.importorskip("rank_bm25")
+    tokens = [t.lower().replace("_", " ").split() for t in TEXTS]
+    reference = rank_bm25.BM25Okapi(tokens).get_scores(["upstream", "retry", "the"])
+    scores = dict(search(build_index(TEXTS), "upstream retry the", top_k=len(TEXTS)))
+    assert np.allclose([scores[i] for i in range(len(TEXTS))], reference)
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+
+import build_tfidf.index as index
+from build_tfidf import local_embed
+from build_tfidf.embeddings import load_config_from_env
+
+
+def test_local_model_is_deterministic(tmp_path: Path):
+    texts = [f"note {i} about alpha beta {'gamma ' * (i % 4)}" for i in range(40)]
+    model = local_embed.fit(texts, n_features=256, dimensions=16)
+    again = local_embed.fit(texts, n_features=256, dimensions=16)
+    vecs = local_embed.embed(texts, model)
+    assert vecs.shape == (40, 16)
+    assert np.array_equal(vecs, local_embed.embed(texts, again))
+    assert np.allclose(np.linalg.norm(vecs, axis=1), 1.0, atol=1e-5)
+
+    path = tmp_path / "local_model.npz"
+    local_embed.save(model, path)
+    assert np.array_equal(local_embed.embed(texts, local_embed.load(path)), vecs)
+
+
+def test_bucket_caches_stay_bounded(monkeypatch):
+    model = local_embed.unfitted(256)
+    texts = [f"token{i} shared words" for i in range(50)]
+    expected = local_embed.embed(texts, model)
+    monkeypatch.setattr(local_embed, "MAX_CACHED_TOKENS", 8)
+    monkeypatch.setattr(local_embed, "MAX_CACHES", 2)
+    monkeypatch.setattr(local_embed, "_CACHES", {})
+    assert np.array_equal(local_embed.embed(texts, model), expected)
+    assert len(local_embed._cache(256)) <= 8
+    for n_features in (64, 128, 512):
+        local_embed.embed(texts, local_embed.unfitted(n_features))
+    assert len(local_embed._CACHES) <= 2
+
+
+def test_local_provider_names_model(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_PROVIDER", "local")
+    monkeypatch.setenv("LOCAL_FEATURES", "1024")
+    cfg = load_config_from_env()
+    assert cfg.model == "hash-tfidf-v1-f1024"
+    assert cfg.local_features == 1024
+
+
+def test_local_provider_end_to_end(embed_config, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "alpha.md").write_text("# Alpha\n\nalpha note about rivers", encoding="utf-8")
+    (corpus / "beta.md").write_text("# Beta\n\nbeta note about mountains", encoding="utf-8")
+
+    cfg = replace(embed_config, provider="local", model=local_embed.model_name(512), local_features=512)
+    index.build(corpus, cfg)
+    assert index.LOCAL_MODEL_PATH.exists()
+
+    results = index.query("mountains", cfg, top_k=1)
+    assert results[0][0]["path"].endswith("beta.md")
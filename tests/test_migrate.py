@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import build_tfidf.index as index
+from build_tfidf.cli import build_parser
+from build_tfidf.metadata import validate_signature
+
+
+WORDS = ["alpha", "beta", "gamma", "delta"]
+
+
+def _fake_embed(texts, cfg=None, **_kwargs):
+    # Like text-embedding-3: a shorter request returns the renormalized prefix.
+    full = np.array([[1.0 + t.count(w) for w in WORDS] for t in texts], dtype="float32")
+    out = full[:, : cfg.dimensions] if cfg is not None and cfg.dimensions else full
+    return (out / np.linalg.norm(out, axis=1, keepdims=True)).tolist()
+
+
+def test_migrate_truncates_without_re_embedding(monkeypatch, use_data_dir, embed_config, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for word in WORDS[:3]:
+        (corpus / f"{word}.md").write_text(f"# {word.title()}\n\n{word} {word} note", encoding="utf-8")
+    cfg = embed_config
+    monkeypatch.setattr(index, "embed_texts", _fake_embed)
+    use_data_dir(tmp_path / "direct")
+    index.build(corpus, replace(cfg, dimensions=2))
+    direct = np.load(index.VECTORS_PATH)
+
+    use_data_dir(tmp_path / "data")
+    index.build(corpus, cfg, search_dimensions=3)
+    monkeypatch.setattr(index, "embed_texts", lambda *_a, **_k: pytest.fail("migrate must not embed"))
+    assert index.migrate(2) == 4
+
+    meta = json.loads(index.META_PATH.read_text())
+    validate_signature(meta)
+    assert meta["embedding_dimensions"] == 2
+    # The prefix search no longer fits inside the new width.
+    assert meta["vector_backend"] == "faiss"
+    assert np.allclose(np.load(index.VECTORS_PATH), direct, atol=1e-6)
+
+    # Queries and updates now ask the provider for the migrated width.
+    monkeypatch.setattr(index, "embed_texts", _fake_embed)
+    hits = index.query("gamma", cfg, top_k=1, mode="semantic")
+    assert hits[0][0]["path"].endswith("gamma.md")
+    (corpus / "delta.md").write_text("# Delta\n\ndelta note", encoding="utf-8")
+    index.update(corpus, cfg)
+    assert np.load(index.VECTORS_PATH).shape == (4, 2)
+
+    with pytest.raises(SystemExit):
+        index.migrate(2)
+    index.META_PATH.write_text(json.dumps({**meta, "failover": {"to_provider": "ollama"}}))
+    with pytest.raises(SystemExit):
+        index.migrate(1)
+
+
+def test_migrate_refuses_vectors_from_another_provider(monkeypatch, embed_config, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "alpha.md").write_text("# Alpha\n\nalpha note", encoding="utf-8")
+    monkeypatch.setattr(index, "embed_texts", _fake_embed)
+    # Ollama builds still carry OPENAI_MODEL as the configured model name.
+    index.build(corpus, replace(embed_config, provider="ollama"))
+    meta = json.loads(index.META_PATH.read_text())
+    assert meta["embedding_provider"] == "ollama"
+    with pytest.raises(SystemExit):
+        index.migrate(2)
+
+    # Without a recorded provider, only the model's native width passes as OpenAI's.
+    legacy = {k: v for k, v in meta.items() if k != "embedding_provider"}
+    index.META_PATH.write_text(json.dumps(legacy))
+    with pytest.raises(SystemExit):
+        index.migrate(2)
+    assert index._truncatable({**legacy, "embedding_dimensions": 3072})
+
+
+def test_migrate_dimensions_must_be_positive():
+    parser = build_parser()
+    with pytest.raises(SystemExit):
+        parser.parse_args(["migrate", "--dimensions", "0"])
+    assert parser.parse_args(["migrate", "--dimensions", "256"]).dimensions == 256
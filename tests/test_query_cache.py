@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+
+import build_tfidf.index as index
+from build_tfidf import query_cache
+
+
+def test_query_cache_hits_and_invalidates(embedded, embed_config, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "alpha.md").write_text("# Alpha\n\nalpha note", encoding="utf-8")
+    (corpus / "beta.md").write_text("# Beta\n\nbeta note", encoding="utf-8")
+
+    cfg = embed_config
+    index.build(corpus, cfg)
+
+    embedded.clear()
+    first = index.query("alpha", cfg, top_k=2)
+    second = index.query("alpha", cfg, top_k=2)
+    assert len(embedded) == 1
+    assert first == second
+
+    index.query("alpha", cfg, top_k=1)
+    assert len(embedded) == 2
+
+    stats = query_cache.stats(index.QUERY_CACHE_PATH)
+    assert (stats.hits, stats.misses, stats.entries) == (1, 2, 2)
+    assert abs(stats.hit_rate - 1 / 3) < 1e-9
+
+    (corpus / "alpha.md").write_text("# Alpha\n\nalpha note changed", encoding="utf-8")
+    index.update(corpus, cfg)
+    embedded.clear()
+    index.query("alpha", cfg, top_k=2)
+    assert len(embedded) == 1
+
+
+def test_concurrent_lookups_keep_counts_and_hits_do_not_rewrite(monkeypatch, tmp_path: Path):
+    path = tmp_path / "query_cache.json"
+    result = [({"path": "a.md"}, 0.5)]
+    query_cache.store(path, "warm", "g1", result)
+    errors = []
+
+    def _worker(n: int) -> None:
+        try:
+            for i in range(25):
+                if query_cache.lookup(path, f"k{n}-{i}", "g1") is None:
+                    query_cache.store(path, f"k{n}-{i}", "g1", result)
+                query_cache.lookup(path, "warm", "g1")
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=_worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    stats = query_cache.stats(path)
+    assert (stats.hits, stats.misses, stats.entries) == (200, 200, 201)
+    assert not list(tmp_path.rglob("*.tmp"))
+
+    # A hit reads its own entry and writes nothing else; a miss writes only its entry.
+    entry = tmp_path / "query_cache" / "warm.json"
+    before = entry.stat().st_mtime_ns, entry.stat().st_ino
+    assert query_cache.lookup(path, "warm", "g1") == result
+    assert query_cache.lookup(path, "warm", "g2") is None
+    query_cache.store(path, "other", "g1", result)
+    assert (entry.stat().st_mtime_ns, entry.stat().st_ino) == before
+    assert not path.exists()
+
+    # A cache that cannot be written never fails the query that uses it.
+    def _fail(*_args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", _fail)
+    query_cache.store(path, "another", "g1", result)
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_store_evicts_oldest_and_events_log_is_folded(monkeypatch, tmp_path: Path):
+    path = tmp_path / "query_cache.json"
+    result = [({"path": "a.md"}, 0.5)]
+    for i in range(4):
+        query_cache.store(path, f"k{i}", "g1", result, max_entries=3)
+        os.utime(tmp_path / "query_cache" / f"k{i}.json", ns=(i, i))
+    assert sorted(p.name for p in (tmp_path / "query_cache").iterdir()) == ["k1.json", "k2.json", "k3.json"]
+
+    monkeypatch.setattr(query_cache, "MAX_EVENT_BYTES", 8)
+    for i in range(20):
+        query_cache.lookup(path, f"k{i % 5}", "g1")
+    # The log never outgrows its cap, and no count is lost in the fold.
+    assert (tmp_path / "query_cache.json.events").stat().st_size < 8
+    stats = query_cache.stats(path)
+    assert (stats.hits, stats.misses, stats.entries) == (12, 8, 3)
+
+    query_cache.clear(path, reset_stats=True)
+    assert query_cache.stats(path) == query_cache.CacheStats(0, 0, 0)
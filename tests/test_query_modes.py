@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+import build_tfidf.index as index
+
+
+def _build(tmp_path: Path, cfg) -> None:
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "alpha.md").write_text("# Alpha\n\nalpha note about max_retries", encoding="utf-8")
+    (corpus / "beta.md").write_text("# Beta\n\nbeta note", encoding="utf-8")
+    (corpus / "gamma.md").write_text("# Gamma\n\ngamma note", encoding="utf-8")
+    index.build(corpus, cfg)
+
+
+def _vectors(texts):
+    return [[float(t.count("alpha")), float(t.count("beta")), float(t.count("gamma"))] for t in texts]
+
+
+def test_auto_mode_and_deadline_fall_back_to_lexical(monkeypatch, embed_config, tmp_path: Path):
+    calls = {"count": 0}
+    release = threading.Event()
+    release.set()
+
+    def _fake_embed(texts, _cfg=None, **_kwargs):
+        calls["count"] += 1
+        release.wait(5)
+        return _vectors(texts)
+
+    monkeypatch.setattr(index, "embed_texts", _fake_embed)
+    cfg = embed_config
+    _build(tmp_path, cfg)
+
+    # An exact identifier hits one chunk decisively: no embedding call at all.
+    calls["count"] = 0
+    details: dict = {}
+    hits = index.query("max_retries", cfg, top_k=2, mode="auto", details=details)
+    assert details["tier"] == "lexical (decisive)"
+    assert calls["count"] == 0
+    assert hits[0][0]["path"].endswith("alpha.md")
+
+    # "note" matches every chunk equally, so auto falls through to hybrid.
+    details = {}
+    index.query("note", cfg, top_k=2, mode="auto", use_cache=False, details=details)
+    assert details["tier"] == "hybrid"
+    assert calls["count"] == 1
+
+    # A provider slower than the deadline degrades to lexical and is not cached.
+    release.clear()
+    details = {}
+    hits = index.query("beta note", cfg, top_k=1, deadline_ms=20, details=details)
+    assert details["tier"] == "lexical (deadline)"
+    assert hits[0][0]["path"].endswith("beta.md")
+    release.set()
+    details = {}
+    index.query("beta note", cfg, top_k=1, deadline_ms=5000, details=details)
+    assert details["tier"] == "hybrid"
+
+    details = {}
+    index.query("gamma", cfg, top_k=1, mode="semantic", use_cache=False, details=details)
+    assert details["tier"] == "semantic"
+
+
+def test_deadline_counts_from_the_start_of_the_query(monkeypatch, embed_config, tmp_path: Path):
+    def _fake_embed(texts, _cfg=None, **_kwargs):
+        time.sleep(0.05)
+        return _vectors(texts)
+
+    monkeypatch.setattr(index, "embed_texts", _fake_embed)
+    cfg = embed_config
+    _build(tmp_path, cfg)
+    rank_lexical = index._rank_lexical
+
+    def _slow_rank_lexical(*args):
+        time.sleep(0.15)
+        return rank_lexical(*args)
+
+    # Auto mode only starts embedding after BM25, which here spends the whole budget.
+    monkeypatch.setattr(index, "_rank_lexical", _slow_rank_lexical)
+    details: dict = {}
+    index.query("note", cfg, top_k=1, mode="auto", use_cache=False, deadline_ms=100, details=details)
+    assert details["tier"] == "lexical (deadline)"
+
+
+def test_query_embedding_overlaps_index_loading(monkeypatch, embed_config, tmp_path: Path):
+    started = threading.Event()
+
+    def _fake_embed(texts, _cfg=None, **_kwargs):
+        started.set()
+        return _vectors(texts)
+
+    monkeypatch.setattr(index, "embed_texts", _fake_embed)
+    cfg = embed_config
+    _build(tmp_path, cfg)
+    started.clear()
+    load_index = index.load_index
+
+    def _load_index(*args, **kwargs):
+        # Sequential code would only embed after loading, so this would time out.
+        assert started.wait(5)
+        return load_index(*args, **kwargs)
+
+    monkeypatch.setattr(index, "load_index", _load_index)
+    hits = index.query("alpha", cfg, top_k=1, use_cache=False)
+    assert hits[0][0]["path"].endswith("alpha.md")
+
+
+def test_mmr_rerank_runs_locally(embedded, embed_config, tmp_path: Path):
+    cfg = embed_config
+    _build(tmp_path, cfg)
+    ranking = index.RankingConfig(mmr_lambda=0.5)
+    hits = index.query("note", cfg, top_k=3, use_cache=False, ranking=ranking)
+    assert sorted(Path(c["path"]).name for c, _ in hits) == ["alpha.md", "beta.md", "gamma.md"]
@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+import numpy as np
+
+from build_tfidf.rerank import mmr
+
+
+def test_mmr_demotes_near_duplicates():
+    vectors = np.array([[1.0, 0.0], [0.99, 0.05], [0.0, 1.0], [0.7, 0.7]], dtype="float32")
+    relevance = [0.9, 0.85, 0.6, 0.5]
+    assert mmr(relevance, vectors, lambda_=1.0) == [0, 1, 2, 3]
+    # The runner-up nearly repeats the top hit, so a different direction goes second.
+    assert mmr(relevance, vectors, lambda_=0.5) == [0, 2, 1, 3]
+    assert mmr([], np.zeros((0, 2)), lambda_=0.5) == []
@@ -3,11 +3,13 @@ from __future__ import annotations
 import json
 from pathlib import Path
 
+import pytest
+
 import build_tfidf.index as index
 from build_tfidf.embeddings import EmbeddingConfig
 
 
-def _fake_embed(texts, _cfg=None):
+def _fake_embed(texts, _cfg=None, **_kwargs):
     def vec(t: str) -> list[float]:
         t = t.lower()
         return [
@@ -23,12 +25,17 @@ def _patch_paths(monkeypatch, tmp_path: Path):
     data_dir = tmp_path / "data"
     monkeypatch.setattr(index, "DATA_DIR", data_dir)
     monkeypatch.setattr(index, "VEC_PATH", data_dir / "index.faiss")
+    monkeypatch.setattr(index, "VECTORS_PATH", data_dir / "vectors.npy")
     monkeypatch.setattr(index, "META_PATH", data_dir / "metadata.json")
     monkeypatch.setattr(index, "MANIFEST_PATH", data_dir / "manifest.json")
     monkeypatch.setattr(index, "LEX_PATH", data_dir / "lexical.json")
+    monkeypatch.setattr(index, "CHUNKS_PATH", data_dir / "chunks.jsonl")
+    monkeypatch.setattr(index, "SLOTS_PATH", data_dir / "slots.npz")
+    monkeypatch.setattr(index, "QUERY_CACHE_PATH", data_dir / "query_cache.json")
 
 
-def test_retrieval_quality(monkeypatch, tmp_path: Path):
+@pytest.mark.parametrize("search_dimensions", [None, 2])
+def test_retrieval_quality(monkeypatch, tmp_path: Path, search_dimensions):
     corpus = tmp_path / "corpus"
     corpus.mkdir()
     (corpus / "alpha.md").write_text("# Alpha\n\nalpha note", encoding="utf-8")
@@ -47,7 +54,7 @@ def test_retrieval_quality(monkeypatch, tmp_path: Path):
         ollama_model="nomic-embed-text",
     )
 
-    index.build(corpus, cfg)
+    index.build(corpus, cfg, search_dimensions=search_dimensions)
 
     gold_path = Path(__file__).parent / "data" / "gold_queries.jsonl"
     records = [json.loads(line) for line in gold_path.read_text(encoding="utf-8").splitlines()]
@@ -56,3 +63,43 @@ def test_retrieval_quality(monkeypatch, tmp_path: Path):
         got_paths = [Path(r[0]["path"]).as_posix() for r in results]
         expected = rec["expected_paths"]
         assert any(any(p.endswith(e) for p in got_paths) for e in expected)
+
+
+def test_query_returns_top_k_distinct_files(monkeypatch, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    long_text = "\n".join(f"alpha alpha alpha entry{i} detail{i}" for i in range(60))
+    (corpus / "long.md").write_text(f"# Long\n\n{long_text}", encoding="utf-8")
+    for name in ["one", "two", "three"]:
+        (corpus / f"{name}.md").write_text(f"# {name}\n\nalpha beta {name}", encoding="utf-8")
+
+    monkeypatch.setattr(index, "embed_texts", _fake_embed)
+    _patch_paths(monkeypatch, tmp_path)
+    cfg = EmbeddingConfig(
+        provider="openai",
+        model="text-embedding-3-large",
+        dimensions=None,
+        batch_size=32,
+        rpm_limit=60,
+        fallback_to_ollama=False,
+        ollama_model="nomic-embed-text",
+    )
+    index.build(corpus, cfg, chunk_size=20, chunk_overlap=0)
+
+    ranking = index.RankingConfig(candidate_multiplier=1)
+    results = index.query("alpha", cfg, top_k=3, use_cache=False, ranking=ranking)
+    paths = [Path(c["path"]).name for c, _ in results]
+    assert len(paths) == len(set(paths)) == 3
+    assert paths[0] == "long.md"
+
+    everything = index.query("alpha", cfg, top_k=10, use_cache=False, ranking=ranking)
+    assert sorted(Path(c["path"]).name for c, _ in everything) == ["long.md", "one.md", "three.md", "two.md"]
+
+
+@pytest.mark.parametrize("search_dimensions", [0, -1])
+def test_build_rejects_non_positive_search_dimensions(monkeypatch, tmp_path: Path, search_dimensions):
+    _patch_paths(monkeypatch, tmp_path)
+    monkeypatch.setattr(index, "embed_texts", lambda *_a, **_k: pytest.fail("must not embed"))
+    with pytest.raises(SystemExit):
+        index.build(tmp_path, None, search_dimensions=search_dimensions)
+    assert not (tmp_path / "data").exists()
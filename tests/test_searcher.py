@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import build_tfidf.index as index
+from build_tfidf.searcher import Searcher
+
+
+def test_searcher_serves_queries_and_reloads(embedded, embed_config, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "alpha.md").write_text("# Alpha\n\nalpha note", encoding="utf-8")
+    (corpus / "beta.md").write_text("# Beta\n\nbeta note", encoding="utf-8")
+
+    cfg = embed_config
+    index.build(corpus, cfg)
+
+    searcher = Searcher(index.DATA_DIR, cfg)
+    hits = searcher.search("alpha", top_k=1)
+    assert hits == index.query("alpha", cfg, top_k=1, use_cache=False)
+    assert hits[0][0]["path"].endswith("alpha.md")
+    assert searcher.get_chunk(hits[0][0]["sha256"]) == hits[0][0]
+
+    queries = ["alpha", "beta", '"beta note"', "alpha"] * 4
+    assert searcher.search_many(queries, top_k=2, workers=4) == [searcher.search(q, top_k=2) for q in queries]
+
+    assert searcher.reload() is False
+    (corpus / "gamma.md").write_text("# Gamma\n\ngamma note", encoding="utf-8")
+    index.update(corpus, cfg)
+    assert searcher.reload() is True
+    assert searcher.search("gamma", top_k=1)[0][0]["path"].endswith("gamma.md")
+
+    # The reloaded index is queried at its migrated width.
+    index.migrate(2)
+    assert searcher.reload() is True
+    assert searcher.search("beta", top_k=1, mode="semantic")[0][0]["path"].endswith("beta.md")
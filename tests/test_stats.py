@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+import build_tfidf.cli as cli
+import build_tfidf.index as index
+from build_tfidf import lexical_store, stats
+
+
+def test_stats_reads_headers(monkeypatch, embed_config, tmp_path: Path, capsys):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for i, word in enumerate(["alpha", "beta", "gamma", "delta"]):
+        (corpus / f"{word}.md").write_text(f"# {word}\n\n{word} note number {i} " * 3, encoding="utf-8")
+    (corpus / "copy.md").write_text("# alpha\n\nalpha note number 0 " * 3, encoding="utf-8")
+
+    monkeypatch.setattr(index, "embed_texts", lambda texts, _cfg=None, **_kwargs: [[1.0, 0.5, 0.25, 0.0]] * len(texts))
+    cfg = embed_config
+    index.build(corpus, cfg, search_dimensions=2)
+
+    got = stats.collect()
+    assert (got.files, got.chunks, got.slots) == (5, 5, 4)
+    assert got.tokens > 0
+    assert (got.dimensions, got.search_dimensions, got.faiss_type) == (4, 2, "IndexFlatIP")
+    lexical = lexical_store.load(index.LEX_PATH)
+    assert got.postings == sum(len(s.post_docs) for s in lexical.segments)
+    assert got.vocab == len(lexical.stats.df)
+    by_name = {c.name: c for c in got.components}
+    assert by_name["index.faiss"].resident == 4 * 2 * 4
+    assert by_name["vectors.npy"].mapped == np.load(index.VECTORS_PATH).nbytes
+    assert got.disk == sum(p.stat().st_size for p in index.DATA_DIR.iterdir() if p.name != "query_cache.json")
+
+    assert got.project(1) == (got.disk, got.resident)
+    disk, resident = got.project(10)
+    assert disk > 9 * got.disk and resident > got.resident
+
+    assert cli.main(["stats"]) == 0
+    out = capsys.readouterr().out
+    assert "files=5 chunks=5" in out and "x100 corpus" in out
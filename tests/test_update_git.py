@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+import subprocess
+from pathlib import Path
+
+import build_tfidf.index as index
+from build_tfidf.chunking import chunk_id
+
+
+def _git(cwd: Path, *args: str) -> None:
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+def test_update_git_reuses_renamed_vectors(monkeypatch, embed_config, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "alpha.md").write_text("# Alpha\n\nalpha note", encoding="utf-8")
+    (corpus / "beta.md").write_text("# Beta\n\nbeta note", encoding="utf-8")
+    (corpus / "gamma.md").write_text("# Gamma\n\ngamma note", encoding="utf-8")
+    _git(corpus, "init", "-q")
+    _git(corpus, "add", ".")
+    _git(corpus, "commit", "-q", "-m", "init")
+
+    embedded: list[str] = []
+
+    def _fake_embed(texts, _cfg=None, **_kwargs):
+        texts = list(texts)
+        embedded.extend(texts)
+        return [[float(t.count("alpha")), float(t.count("beta")), float(t.count("gamma")) + 0.1] for t in texts]
+
+    monkeypatch.setattr(index, "embed_texts", _fake_embed)
+    cfg = embed_config
+
+    index.build(corpus, cfg, use_git=True)
+    manifest = json.loads(index.MANIFEST_PATH.read_text(encoding="utf-8"))
+    assert manifest["git_commit"]
+
+    _git(corpus, "mv", "alpha.md", "renamed.md")
+    _git(corpus, "commit", "-q", "-m", "rename")
+    (corpus / "beta.md").write_text("# Beta\n\nbeta note edited", encoding="utf-8")
+    (corpus / "delta.md").write_text("# Delta\n\nnew gamma", encoding="utf-8")
+    (corpus / "gamma.md").unlink()
+
+    embedded.clear()
+    index.update(corpus, cfg, use_git=True)
+
+    assert sorted(embedded) == ["Beta\n\n# Beta\n\nbeta note edited", "Delta\n\n# Delta\n\nnew gamma"]
+    manifest = json.loads(index.MANIFEST_PATH.read_text(encoding="utf-8"))
+    paths = sorted(Path(e["path"]).name for e in manifest["entries"])
+    assert paths == ["beta.md", "delta.md", "renamed.md"]
+    renamed = [c for c in manifest["chunks"] if c["path"].endswith("renamed.md")]
+    assert renamed and renamed[0]["sha256"] == chunk_id(renamed[0]["path"], 0, renamed[0]["text"])
+    assert len(manifest["chunks"]) == 3
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from pathlib import Path
 
+import numpy as np
+
 import build_tfidf.index as index
 from build_tfidf.embeddings import EmbeddingConfig
 
@@ -16,7 +18,7 @@ def test_update_incremental(monkeypatch, tmp_path: Path):
 
     calls = {"count": 0}
 
-    def _fake_embed(texts, _cfg=None):
+    def _fake_embed(texts, _cfg=None, **_kwargs):
         calls["count"] += 1
         def vec(t: str) -> list[float]:
             t = t.lower()
@@ -30,6 +32,9 @@ def test_update_incremental(monkeypatch, tmp_path: Path):
     monkeypatch.setattr(index, "META_PATH", index.DATA_DIR / "metadata.json")
     monkeypatch.setattr(index, "MANIFEST_PATH", index.DATA_DIR / "manifest.json")
     monkeypatch.setattr(index, "LEX_PATH", index.DATA_DIR / "lexical.json")
+    monkeypatch.setattr(index, "CHUNKS_PATH", index.DATA_DIR / "chunks.jsonl")
+    monkeypatch.setattr(index, "SLOTS_PATH", index.DATA_DIR / "slots.npz")
+    monkeypatch.setattr(index, "QUERY_CACHE_PATH", index.DATA_DIR / "query_cache.json")
 
     cfg = EmbeddingConfig(
         provider="openai",
@@ -48,3 +53,49 @@ def test_update_incremental(monkeypatch, tmp_path: Path):
     index.update(corpus, cfg)
 
     assert calls["count"] >= first_calls + 1
+
+
+def test_update_keeps_vectors_memmapped(monkeypatch, tmp_path: Path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    f1 = corpus / "alpha.md"
+    f2 = corpus / "beta.md"
+    f1.write_text("# Alpha\n\nalpha note", encoding="utf-8")
+    f2.write_text("# Beta\n\nbeta note", encoding="utf-8")
+
+    def _fake_embed(texts, _cfg=None, **_kwargs):
+        return np.array([[t.count("alpha"), t.count("beta"), t.count("gamma")] for t in texts], dtype="float32")
+
+    monkeypatch.setattr(index, "embed_texts", _fake_embed)
+    monkeypatch.setattr(index, "DATA_DIR", tmp_path / "data")
+    monkeypatch.setattr(index, "VEC_PATH", index.DATA_DIR / "index.faiss")
+    monkeypatch.setattr(index, "VECTORS_PATH", index.DATA_DIR / "vectors.npy")
+    monkeypatch.setattr(index, "META_PATH", index.DATA_DIR / "metadata.json")
+    monkeypatch.setattr(index, "MANIFEST_PATH", index.DATA_DIR / "manifest.json")
+    monkeypatch.setattr(index, "LEX_PATH", index.DATA_DIR / "lexical.json")
+    monkeypatch.setattr(index, "CHUNKS_PATH", index.DATA_DIR / "chunks.jsonl")
+    monkeypatch.setattr(index, "SLOTS_PATH", index.DATA_DIR / "slots.npz")
+    monkeypatch.setattr(index, "QUERY_CACHE_PATH", index.DATA_DIR / "query_cache.json")
+
+    cfg = EmbeddingConfig(
+        provider="openai",
+        model="text-embedding-3-large",
+        dimensions=None,
+        batch_size=32,
+        rpm_limit=60,
+        fallback_to_ollama=False,
+        ollama_model="nomic-embed-text",
+    )
+
+    index.build(corpus, cfg)
+    mapped = index._load_vectors()
+    assert isinstance(mapped, np.memmap)
+
+    f1.write_text("# Alpha\n\nalpha gamma gamma", encoding="utf-8")
+    index.update(corpus, cfg)
+
+    vectors = index._load_vectors()
+    assert vectors.shape == (2, 3)
+    rows = {tuple(r) for r in np.asarray(vectors).tolist()}
+    assert (0.0, 1.0, 0.0) in rows
+    assert (1.0, 0.0, 2.0) in rows
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import numpy as np
+
+from build_tfidf.vector_store import build_index, rescore, search
+
+
+def test_prefix_index_rescored_at_full_dimension():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 32)).astype("float32")
+    query = vectors[17] + 0.01 * rng.normal(size=32).astype("float32")
+
+    prefix = build_index(vectors, prefix_dim=8)
+    assert prefix.dim == 8
+
+    candidates = search(prefix, query, top_k=50)
+    hits = rescore(vectors, query, [idx for idx, _ in candidates])
+    full = search(build_index(vectors), query, top_k=1)
+
+    assert hits[0][0] == full[0][0] == 17
+    assert abs(hits[0][1] - full[0][1]) < 1e-5